@@ -0,0 +1,113 @@
+"""Benchmarks for the Adaptive API client.
+
+Starts a local synthetic server, times decoding, CSV export and end-to-end
+fetches, and writes the results as JSON so runs can be compared:
+
+    python benchmarks/run.py --samples 100000 --output results.json
+"""
+import argparse
+import copy
+import json
+import platform
+import statistics
+import sys
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from server import Scale, SyntheticServer, encode_history, generate_jobs
+
+from adaptive_api import ApiLive, ApiPe, pe
+from adaptive_api.decoders import decode
+
+def measure(name: str, func: Callable[[], Any], repeat: int, items: int = 1,
+            setup: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+    """Time func repeat times; setup runs untimed before each call and its result is passed in."""
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        func(arg) if setup is not None else func()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    result = {
+        "name": name,
+        "repeat": repeat,
+        "items": items,
+        "min": best,
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "items_per_second": items / best if best > 0 else None,
+    }
+    print(f"{name:40s} min {best * 1000:10.2f} ms  median {result['median'] * 1000:10.2f} ms")
+    return result
+
+def run(scale: Scale, repeat: int, history_ids: int, workers: int) -> List[Dict[str, Any]]:
+    results = []
+    wire_history = encode_history("R0000000", scale)
+    samples = scale.samples * (1 + scale.tags)
+
+    def decoded() -> pe.AdaptiveHistory:
+        return pe._decode_history(copy.deepcopy(wire_history))
+
+    def undecoded() -> pe.AdaptiveHistory:
+        # Still in the wire encoding, ready for _fix_history
+        return decode(pe.AdaptiveHistory, copy.deepcopy(wire_history), pe.ApiPe._config)
+
+    results.append(measure("fix_history.python", pe._fix_history_python, repeat, samples, undecoded))
+    if pe.np is not None:
+        results.append(measure("fix_history.numpy", pe._fix_history_numpy, repeat, samples, undecoded))
+    results.append(measure("fix_history.compact", pe._fix_history_compact, repeat, samples, undecoded))
+    history = decoded()
+    results.append(measure("history_to_csv", lambda: pe.history_to_csv(history), repeat, scale.samples))
+
+    wire_jobs = generate_jobs(scale)
+    results.append(measure("decode.jobs_and_stoppages", pe._decode_jobs_and_stoppages, repeat,
+                           len(wire_jobs), lambda: copy.deepcopy(wire_jobs)))
+
+    with SyntheticServer(scale) as server:
+        pe_client = ApiPe(server.url, "benchmark")
+        live_client = ApiLive(server.url, "benchmark")
+        machines = server.machines()
+        results.append(measure("fetch.history", lambda: pe_client.history("R0000000"), repeat, samples))
+        results.append(measure("fetch.jobs_and_stoppages", lambda: pe_client.jobs_and_stoppages(0, 1),
+                               repeat, scale.jobs))
+        results.append(measure("fetch.tag_values_multiple",
+                               lambda: live_client.tag_values_multiple(machines, ["Parent.Running", "Tag1", "Tag2"]),
+                               repeat, len(machines)))
+        ids = [f"R{n:07d}" for n in range(history_ids)]
+        results.append(measure(f"fetch.history_many.{workers}", lambda: list(pe_client.history_many(ids, max_workers=workers)),
+                               max(1, repeat // 2), history_ids))
+    return results
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tags", type=int, default=Scale.tags)
+    parser.add_argument("--samples", type=int, default=Scale.samples)
+    parser.add_argument("--jobs", type=int, default=Scale.jobs)
+    parser.add_argument("--machines", type=int, default=Scale.machines)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--history-ids", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--output", default=None, help="JSON results file (default: bench-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    scale = Scale(args.tags, args.samples, args.jobs, args.machines)
+    started = datetime.now(timezone.utc)
+    results = run(scale, args.repeat, args.history_ids, args.workers)
+    report = {
+        "timestamp": started.isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "numpy": pe.np.__version__ if pe.np is not None else None,
+        "scale": asdict(scale),
+        "results": results,
+    }
+    output = args.output or f"bench-{started.strftime('%Y%m%dT%H%M%SZ')}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
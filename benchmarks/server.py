@@ -0,0 +1,228 @@
+"""Synthetic Adaptive server for benchmarks.
+
+Speaks the /api/v1/live and /api/v1/pe routes used by ApiLive and ApiPe and
+serves generated payloads of configurable size. Run it on its own with
+
+    python benchmarks/server.py --port 8080 --tags 40 --samples 100000
+"""
+import argparse
+import json
+import random
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+@dataclass
+class Scale:
+    """Size of the generated payloads."""
+    tags: int = 20
+    samples: int = 50000
+    jobs: int = 20000
+    machines: int = 50
+    seed: int = 1
+
+def _iso(ms: int) -> str:
+    return (EPOCH + timedelta(milliseconds=ms)).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+def _delta(values: List[int]) -> List[int]:
+    prev = 0
+    result = []
+    for v in values:
+        result.append(v - prev)
+        prev = v
+    return result
+
+def encode_history(job_id: str, scale: Scale) -> Dict[str, Any]:
+    """Generate a history in the delta-encoded wire format."""
+    rng = random.Random(f"{scale.seed}-{job_id}")
+    times = []
+    t = 0
+    for _ in range(scale.samples):
+        t += rng.choice((1000, 1000, 1000, 2000, 5000))
+        times.append(t)
+    tags = []
+    kinds = ("number", "boolean", "number", "string", "date")
+    for n in range(scale.tags):
+        kind = kinds[n % len(kinds)]
+        step = rng.randint(1, 20)
+        indexes = list(range(0, scale.samples, step))
+        if kind == "number":
+            value = rng.randint(0, 1000)
+            values = []
+            for _ in indexes:
+                value += rng.randint(-5, 5)
+                values.append(value)
+            values = _delta(values)
+        elif kind == "date":
+            values = _delta([1735689600000 + i * 60000 for i in range(len(indexes))])
+        elif kind == "boolean":
+            values = [rng.random() < 0.5]
+        else:
+            values = [f"Step {i % 30}" for i in range(len(indexes))]
+        tags.append({"name": f"{n // 5 + 1:02d}.Tag{n}", "type": kind,
+                     "elapsedIndexes": _delta(indexes), "values": values})
+    return {
+        "id": job_id,
+        "start": _iso(0),
+        "end": _iso(times[-1] if times else 0),
+        "elapsedTimes": _delta(_delta(times)),
+        "tags": tags,
+    }
+
+def generate_jobs(scale: Scale) -> List[Dict[str, Any]]:
+    """Generate a mix of jobs and stoppages spread over the machines."""
+    rng = random.Random(scale.seed)
+    items = []
+    cursor = [0] * scale.machines
+    for n in range(scale.jobs):
+        m = n % scale.machines
+        start = cursor[m]
+        end = start + rng.randint(30, 240) * 60000
+        cursor[m] = end
+        item = {"id": f"R{n:07d}", "resource": f"{m + 1:02d}", "start": _iso(start), "end": _iso(end)}
+        if n % 10 == 9:
+            item["stoppage"] = "Maintenance"
+        else:
+            item.update(committed=rng.random() < 0.8, blocked=False, color="#3080ff",
+                        notes=f"Batch {n}", parameters=[{"command": "LD 10"}],
+                        standardTime=rng.randint(3600, 14400), props={"lot": f"L{n}"})
+        items.append(item)
+    return items
+
+def generate_resource_events(scale: Scale) -> List[Dict[str, Any]]:
+    rng = random.Random(scale.seed + 1)
+    events = []
+    for n in range(scale.jobs):
+        start = rng.randint(0, 30 * 86400000)
+        events.append({"resource": f"{n % scale.machines + 1:02d}", "start": _iso(start),
+                       "end": _iso(start + rng.randint(1, 120) * 60000), "alarm": f"Alarm {n % 17}"})
+    return events
+
+class SyntheticServer:
+    """Threaded HTTP server serving generated payloads on a local port."""
+    def __init__(self, scale: Optional[Scale] = None, host: str = "127.0.0.1", port: int = 0):
+        self.scale = scale or Scale()
+        self._payloads: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "SyntheticServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def payload(self, key: str, make: Any) -> bytes:
+        """Generate a payload once and keep its encoded bytes."""
+        with self._lock:
+            body = self._payloads.get(key)
+            if body is None:
+                body = json.dumps(make(), separators=(",", ":")).encode()
+                self._payloads[key] = body
+            return body
+
+    def machines(self) -> List[str]:
+        return [f"{m + 1:02d}" for m in range(self.scale.machines)]
+
+    def route(self, api: str, path: str, query: Dict[str, List[str]]) -> Optional[bytes]:
+        scale = self.scale
+        if api == "pe":
+            if path == "history":
+                # Every ID gets the same shape of history, generate it once
+                return self.payload("history", lambda: encode_history("R0000000", scale))
+            if path == "jobs":
+                return self.payload("jobs", lambda: generate_jobs(scale))
+            if path == "resourceEvents":
+                return self.payload("resourceEvents", lambda: generate_resource_events(scale))
+            if path == "inBoxJobs":
+                return self.payload("inBoxJobs", lambda: [{"group": "Dye", "resources": self.machines(),
+                                                          "jobs": [{"id": f"I{n}", "resource": ""} for n in range(100)]}])
+            if path == "dailyJobCount":
+                return json.dumps([{"day": d, "count": 40} for d in range(30)]).encode()
+            return None
+        if path == "machines":
+            return self.payload("machines", lambda: [{"machine": m, "type": "jet"} for m in self.machines()])
+        if path == "tagValues":
+            tags = query.get("t", [])
+            rng = random.Random()
+            return json.dumps({m: [rng.randint(0, 2) if t == "Parent.Running" else rng.random() * 100 for t in tags]
+                               for m in query.get("m", [])}).encode()
+        if path == "tags":
+            return json.dumps({m: [{"name": f"Tag{n}", "type": "number"} for n in range(scale.tags)]
+                               for m in query.get("m", [])}).encode()
+        if path == "jobs":
+            return json.dumps({m: [{"id": f"R{m}{n}", "start": n * 3600000, "end": (n + 1) * 3600000}
+                                   for n in range(10)] for m in query.get("m", [])}).encode()
+        return None
+
+    def _handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Send headers and body in one segment instead of waiting on delayed ACKs
+            disable_nagle_algorithm = True
+            wbufsize = 65536
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def _reply(self, body: Optional[bytes]) -> None:
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                if len(parts) != 4 or parts[:2] != ["api", "v1"]:
+                    return self._reply(None)
+                self._reply(server.route(parts[2], parts[3], parse_qs(url.query)))
+
+            def do_POST(self) -> None:
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self._reply(b"null")
+
+        return Handler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--tags", type=int, default=Scale.tags)
+    parser.add_argument("--samples", type=int, default=Scale.samples)
+    parser.add_argument("--jobs", type=int, default=Scale.jobs)
+    parser.add_argument("--machines", type=int, default=Scale.machines)
+    args = parser.parse_args()
+    scale = Scale(args.tags, args.samples, args.jobs, args.machines)
+    synthetic = SyntheticServer(scale, args.host, args.port)
+    print(f"Serving synthetic Adaptive API on {synthetic.url}")
+    synthetic.httpd.serve_forever()
@@ -1,6 +1,6 @@
 from datetime import datetime
 from adaptive_api import ApiLive, ApiPe
-from adaptive_api.pe import history_to_csv
+from adaptive_api.pe import write_history_csv
 
 if __name__ == "__main__":
     API_SERVER = "http://localhost"
@@ -16,10 +16,7 @@ if __name__ == "__main__":
     job_id = "R1010006"
     history = client.history(job_id, tags=["01.TargetTemp", "01.State"])
     if history:
-        csv = history_to_csv(history)
-        save_path = f"{job_id}.csv"
-        with open(save_path, "w", encoding="utf-8-sig") as f:
-            f.write(csv)
+        write_history_csv(history, f"{job_id}.csv", encoding="utf-8-sig")
     
     # # Fetch program groups
     # groups = client.program_group_names()
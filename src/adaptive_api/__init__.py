@@ -1,4 +1,17 @@
-from .live import ApiLive
-from .pe import ApiPe
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .live import ApiLive
+    from .pe import ApiPe
 
 __all__ = ["ApiLive", "ApiPe"]
+
+def __getattr__(name: str) -> Any:
+    # Imported on first use so that the command line tool starts without requests and numpy
+    if name == "ApiLive":
+        from .live import ApiLive
+        return ApiLive
+    if name == "ApiPe":
+        from .pe import ApiPe
+        return ApiPe
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
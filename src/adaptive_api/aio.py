@@ -0,0 +1,340 @@
+import asyncio
+import json
+from concurrent.futures import Executor
+from typing import Any, Dict, List, Optional, Tuple, Union, Callable
+
+import aiohttp
+
+from . import live, pe
+from .live import (LiveMachines, DashboardEntries, Tag, Command, ScreenButton, ProgramGroup,
+                   ScheduledJob, RunningProfile, Mode)
+from .pe import (AdaptiveHistory, RescheduleGroup, Job, Stoppage, ResourceEvent,
+                 InBoxGroupAndJobs, SearchResult, DailyJobCount)
+
+# Asyncio variants of ApiLive and ApiPe built on aiohttp. Query building and
+# decoding are shared with the synchronous clients.
+
+def _query_items(query: Optional[Dict[str, Any]]) -> Optional[List[Tuple[str, str]]]:
+    """Flatten a query dict the way requests encodes it (lists repeat the key)."""
+    if query is None:
+        return None
+    items = []
+    for key, value in query.items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for v in values:
+            if v is not None:
+                items.append((key, str(v)))
+    return items
+
+class AsyncBaseApi:
+    """Async counterpart of BaseApi.
+
+    Pass the same aiohttp session to several clients to share one connection
+    pool. max_concurrency bounds the requests this client has in flight.
+    """
+    def __init__(self, server: str, token: str, api_type: str,
+                 session: Optional[aiohttp.ClientSession] = None,
+                 max_connections: int = 100, max_concurrency: Optional[int] = None,
+                 timeout: float = 10):
+        self.base_url = f"{server.rstrip('/')}/api/v1/{api_type}"
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "User-Agent": f"AdaptiveApi{api_type.capitalize()}/1.0"
+        }
+        self.session = session
+        self._owns_session = session is None
+        self.max_connections = max_connections
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+
+    async def __aenter__(self) -> 'AsyncBaseApi':
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the session if this client created it."""
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _session(self) -> aiohttp.ClientSession:
+        # Created lazily because aiohttp sessions must be made inside a running loop
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    def _url(self, path: str) -> str:
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    async def _request(self, method: str, path: str, query: Optional[dict] = None,
+                       body: Any = None, binary: bool = False, raw: bool = False) -> Any:
+        if not self.max_concurrency:
+            return await self._send(method, path, query, body, binary, raw)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            return await self._send(method, path, query, body, binary, raw)
+
+    async def _send(self, method: str, path: str, query: Optional[dict],
+                    body: Any, binary: bool, raw: bool = False) -> Any:
+        kwargs = {"params": _query_items(query), "headers": self.headers, "timeout": self.timeout}
+        if method == "POST":
+            kwargs["json"] = body
+        async with self._session().request(method, self._url(path), **kwargs) as response:
+            if binary:
+                return await response.read() if response.status == 200 else None
+            response.raise_for_status()
+            if raw:
+                return await response.read()
+            return await response.json(content_type=None)
+
+    async def _fetch(self, path: str, query: Optional[dict] = None) -> Any:
+        return await self._request("GET", path, query)
+
+    async def _post(self, path: str, params: Optional[Dict[str, Any]] = None,
+                    body: Any = None) -> Any:
+        return await self._request("POST", path, params, body)
+
+class AsyncApiLive(AsyncBaseApi):
+    def __init__(self, server: str, token: str, **kwargs: Any):
+        super().__init__(server, token, "live", **kwargs)
+
+    async def machines(self, machines: Optional[List[str]] = None) -> LiveMachines:
+        """Fetch a list of machines. If 'machines' is provided, fetch only those."""
+        data = await self._fetch("machines", {"m": machines} if machines else None)
+        return live._decode_list(live.LiveMachine, data)
+
+    async def tag_values_multiple(self, machines: List[str], tags: List[str]) -> Dict[str, List[Any]]:
+        """Fetch values for the same tags from multiple machines."""
+        return await self._fetch("tagValues", {"m": machines, "t": tags})
+
+    async def tag_values(self, machine: str, tags: List[str]) -> List[Any]:
+        """Fetch values for a single machine and extract the specific data."""
+        data = await self.tag_values_multiple([machine], tags)
+        return data.get(machine, [])
+
+    async def tags_multiple(self, machines: List[str]) -> Dict[str, List[Tag]]:
+        """Fetch tags for multiple machines."""
+        return live._decode_by_machine(Tag, await self._fetch("tags", {"m": machines}))
+
+    async def tags(self, machine: str) -> List[Tag]:
+        """Fetch tags for a single machine."""
+        data = await self.tags_multiple([machine])
+        return data.get(machine, [])
+
+    async def commands_multiple(self, machines: List[str]) -> Dict[str, List[Command]]:
+        """Fetch commands for multiple machines."""
+        return live._decode_by_machine(Command, await self._fetch("commands", {"m": machines}))
+
+    async def commands(self, machine: str) -> List[Command]:
+        """Fetch commands for a single machine."""
+        data = await self.commands_multiple([machine])
+        return data.get(machine, [])
+
+    async def dashboard_entries(self) -> DashboardEntries:
+        """Fetch dashboard entries."""
+        return live._decode_list(live.DashboardEntry, await self._fetch("dashboardEntries"))
+
+    async def dashboard(self, name: str) -> Optional[bytes]:
+        """Fetch a dashboard by name, returns binary data or None if not found."""
+        return await self._request("GET", "dashboard", {"name": name}, binary=True)
+
+    async def scene(self, name: str) -> Optional[bytes]:
+        """Fetch a scene by name, returns binary data or None if not found."""
+        return await self._request("GET", "scene", {"name": name}, binary=True)
+
+    async def screen_buttons_multiple(self, machines: List[str]) -> Dict[str, List[ScreenButton]]:
+        """Fetch screen buttons for multiple machines."""
+        return live._decode_by_machine(ScreenButton, await self._fetch("screenButtons", {"m": machines}))
+
+    async def screen_buttons(self, machine: str) -> List[ScreenButton]:
+        """Fetch screen buttons for a single machine."""
+        data = await self.screen_buttons_multiple([machine])
+        return data.get(machine, [])
+
+    async def program_groups_multiple(self, machines: List[str], group: Optional[str] = None,
+                                      only_step_counts: bool = False) -> Dict[str, List[ProgramGroup]]:
+        """Fetch program groups for multiple machines."""
+        data = await self._fetch("programs", live._program_groups_query(machines, group, only_step_counts))
+        return live._decode_program_groups(data)
+
+    async def program_groups(self, machine: str, group: Optional[str] = None,
+                             only_step_counts: bool = False) -> List[ProgramGroup]:
+        """Fetch program groups for a single machine."""
+        data = await self.program_groups_multiple([machine], group, only_step_counts)
+        return data.get(machine, [])
+
+    async def jobs_multiple(self, machines: List[str]) -> Dict[str, List[ScheduledJob]]:
+        """Fetch scheduled jobs for multiple machines."""
+        return live._decode_by_machine(ScheduledJob, await self._fetch("jobs", {"m": machines}))
+
+    async def jobs(self, machine: str) -> List[ScheduledJob]:
+        """Fetch scheduled jobs for a single machine."""
+        data = await self.jobs_multiple([machine])
+        return data.get(machine, [])
+
+    async def messages_multiple(self, machines: List[str]) -> Dict[str, List[str]]:
+        """Fetch messages for multiple machines."""
+        return await self._fetch("messages", {"m": machines})
+
+    async def messages(self, machine: str) -> List[str]:
+        """Fetch messages for a single machine."""
+        data = await self.messages_multiple([machine])
+        return data.get(machine, [])
+
+    async def profiles(self, machines: List[str]) -> Dict[str, Optional[RunningProfile]]:
+        """Fetch running profiles for multiple machines."""
+        return live._decode_profiles(await self._fetch("profiles", {"m": machines}))
+
+    async def screen_multiple(self, machines: List[str], page: Optional[int] = None) -> Dict[str, List[str]]:
+        """Fetch screen data for multiple machines."""
+        return await self._fetch("screen", live._screen_query(machines, page))
+
+    async def screen(self, machine: str, page: Optional[int] = None) -> List[str]:
+        """Fetch screen data for a single machine."""
+        data = await self.screen_multiple([machine], page)
+        return data.get(machine, [])
+
+    def url_command_icon(self, machine: str, command: str) -> str:
+        """Generate URL for command icon."""
+        return f"{self._url('commandIcon')}?m={machine}&c={command}"
+
+    # Machine control methods (require change permissions)
+    async def run(self, machine: str) -> Any:
+        """Start/run a machine."""
+        return await self._post('run', {'m': machine})
+
+    async def backward(self, machine: str) -> Any:
+        """Move machine backward."""
+        return await self._post('backward', {'m': machine})
+
+    async def forward(self, machine: str) -> Any:
+        """Move machine forward."""
+        return await self._post('forward', {'m': machine})
+
+    async def pause(self, machine: str) -> Any:
+        """Pause a machine."""
+        return await self._post('pause', {'m': machine})
+
+    async def stop(self, machine: str) -> Any:
+        """Stop a machine."""
+        return await self._post('stop', {'m': machine})
+
+    async def yes(self, machine: str) -> Any:
+        """Send 'yes' response to machine."""
+        return await self._post('yes', {'m': machine})
+
+    async def no(self, machine: str) -> Any:
+        """Send 'no' response to machine."""
+        return await self._post('no', {'m': machine})
+
+    async def set_step(self, machine: str, step: int) -> Any:
+        """Set the current step for a machine. Can be fetched in Parent.CurrentStep."""
+        return await self._post('setStep', {'m': machine, 'step': step})
+
+    async def set_mode(self, machine: str, mode: Mode) -> Any:
+        """Set the mode for a machine. Can be fetched in Parent.Mode."""
+        return await self._post('setMode', {'m': machine, 'mode': mode.value})
+
+class AsyncApiPe(AsyncBaseApi):
+    """Async client for Adaptive PE API.
+
+    Histories are parsed and decoded on executor, the loop's default
+    executor when None, so large histories do not block the event loop.
+    """
+    def __init__(self, server: str, token: str, compact_history: bool = False,
+                 lazy_history: bool = False, executor: Optional[Executor] = None, **kwargs: Any):
+        super().__init__(server, token, "pe", **kwargs)
+        self.compact_history = compact_history
+        self.lazy_history = lazy_history
+        self.executor = executor
+
+    async def program_group_names(self) -> List[str]:
+        """Fetch program group names."""
+        return await self._fetch('programGroupNames')
+
+    async def program_groups(self, group: Optional[Union[str, List[str]]] = None,
+                             number: Optional[Union[str, List[str]]] = None,
+                             only_step_counts: bool = False) -> List[pe.ProgramGroup]:
+        """Fetch program groups."""
+        data = await self._fetch('programGroups', pe._program_groups_params(group, number, only_step_counts))
+        return pe._decode_list(pe.ProgramGroup, data)
+
+    async def history(self, job_id: Any, tags_filter: Optional[str] = None,
+                      tags: Optional[List[str]] = None) -> Optional[AdaptiveHistory]:
+        """Fetch history for given ID."""
+        body = await self._request("GET", 'history', pe._history_params(job_id, tags_filter, tags), raw=True)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _decode_history_body, body,
+                                          self.compact_history, self.lazy_history)
+
+    async def reschedule_groups(self) -> List[RescheduleGroup]:
+        """Fetch reschedule groups."""
+        return pe._decode_list(RescheduleGroup, await self._fetch('rescheduleGroups'))
+
+    async def jobs_and_stoppages(self, after: Optional[int] = None, before: Optional[int] = None,
+                                 starts_in_range: bool = False, no_jobs: bool = False,
+                                 no_stoppages: bool = False,
+                                 job_props: Optional[List[str]] = None) -> List[Union[Job, Stoppage]]:
+        """Fetch jobs and stoppages."""
+        params = pe._jobs_params(after, before, starts_in_range, no_jobs, no_stoppages, job_props)
+        return pe._decode_jobs_and_stoppages(await self._fetch('jobs', params))
+
+    async def resource_events(self, alarms: bool = False, delays: bool = False,
+                              stoppages: bool = False, after: Optional[int] = None,
+                              before: Optional[int] = None) -> List[ResourceEvent]:
+        """Fetch resource events."""
+        params = pe._resource_events_params(alarms, delays, stoppages, after, before)
+        return pe._decode_resource_events(await self._fetch('resourceEvents', params))
+
+    def group_resource_events(self, events: Optional[List[ResourceEvent]],
+                              get_name: Callable[[ResourceEvent], str]) -> Optional[Dict[str, Dict[str, int]]]:
+        """Group and sum resource events by machine."""
+        return pe.group_resource_events(events, get_name)
+
+    async def inbox_jobs(self) -> List[InBoxGroupAndJobs]:
+        """Fetch inbox jobs."""
+        return pe._decode_inbox_jobs(await self._fetch('inBoxJobs'))
+
+    async def search(self, text: str, limit: Optional[int] = None) -> List[SearchResult]:
+        """Search for jobs/items."""
+        return pe._decode_search(await self._fetch('search', pe._search_params(text, limit)))
+
+    async def daily_job_count(self) -> List[DailyJobCount]:
+        """Fetch daily job count."""
+        return pe._decode_list(DailyJobCount, await self._fetch('dailyJobCount'))
+
+    # Change operations
+
+    async def insert_jobs(self, inserts: List[Dict[str, Any]]) -> Any:
+        """Insert jobs."""
+        return await self._post('insertJobs', body=inserts)
+
+    async def update_jobs(self, updates: List[Dict[str, Any]]) -> Any:
+        """Update jobs."""
+        return await self._post('updateJobs', body=updates)
+
+    async def delete_jobs(self, ids: List[Any]) -> Any:
+        """Delete jobs."""
+        return await self._post('deleteJobs', body=ids)
+
+    async def insert_programs(self, inserts: List[Dict[str, Any]]) -> Any:
+        """Insert programs."""
+        return await self._post('insertPrograms', body=inserts)
+
+    async def update_programs(self, updates: List[Dict[str, Any]]) -> Any:
+        """Update programs."""
+        return await self._post('updatePrograms', body=updates)
+
+    async def delete_programs(self, ids: List[Dict[str, str]]) -> Any:
+        """Delete programs."""
+        return await self._post('deletePrograms', body=ids)
+
+def _decode_history_body(body: bytes, compact: bool, lazy: bool) -> Optional[AdaptiveHistory]:
+    """Parse and decode a history response body, run off the event loop."""
+    return pe._decode_history(json.loads(body) if body.strip() else None, compact, lazy)
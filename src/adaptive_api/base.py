@@ -1,10 +1,21 @@
 import requests
-from typing import Any, Dict, Dict, Optional
+from typing import Any, Callable, Dict, Dict, Optional
+
+from .cache import ResponseCache, cache_key
+from .metrics import MetricsSink
+from .transport import Transport
 
 class BaseApi:
-    def __init__(self, server: str, token: str, api_type: str):
-        self.base_url = f"{server.rstrip('/')}/api/v1/{api_type}"
+    def __init__(self, server: str, token: str, api_type: str, cache: Optional[ResponseCache] = None,
+                 transport: Optional[Transport] = None, metrics: Optional[MetricsSink] = None):
+        self.server = server.rstrip('/')
+        self.api_type = api_type
+        self.base_url = f"{self.server}/api/v1/{api_type}"
+        self.cache = cache
+        self.metrics = metrics
+        self.transport = transport if transport is not None else Transport()
         self.session = requests.Session()
+        self.transport.mount(self.session)
         self.session.headers.update({
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json",
@@ -14,17 +25,43 @@ class BaseApi:
     def _url(self, path: str) -> str:
         return f"{self.base_url}/{path.lstrip('/')}"
 
+    def _get(self, path: str, query: Optional[dict] = None,
+             headers: Optional[Dict[str, str]] = None, stream: bool = False) -> requests.Response:
+        return self.transport.request(self.session, self.server, "GET", self._url(path), path,
+                                      self.metrics, self.api_type, params=query, headers=headers,
+                                      stream=stream)
+
     def _fetch(self, path: str, query: Optional[dict] = None) -> Any:
-        url = self._url(path)
-        response = self.session.get(url, params=query, timeout=10)
+        response = self._get(path, query)
         response.raise_for_status()
         return response.json()
 
+    def _fetch_cached(self, path: str, query: Optional[dict], decode: Callable[[Any], Any]) -> Any:
+        """Fetch and decode through the response cache when the endpoint is cached."""
+        if self.cache is None or not self.cache.caches(path):
+            return decode(self._fetch(path, query))
+
+        key = cache_key(path, query, self.server, self.api_type)
+        entry, fresh = self.cache.lookup(key)
+        if fresh:
+            return entry.value
+
+        headers = entry.validators() if entry is not None else None
+        response = self._get(path, query, headers)
+        if response.status_code == 304 and entry is not None:
+            self.cache.revalidated(key)
+            return entry.value
+        response.raise_for_status()
+        value = decode(response.json())
+        self.cache.put(key, value, len(response.content),
+                       response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return value
+
 
 
-    def _post(self, path: str, params: Optional[Dict[str, Any]] = None, 
-                    body: Optional[str] = None) -> Any:
-        url = self._url(path)
-        response = self.session.post(url, params=params, json=body, timeout=10)
+    def _post(self, path: str, params: Optional[Dict[str, Any]] = None,
+                    body: Any = None) -> Any:
+        response = self.transport.request(self.session, self.server, "POST", self._url(path), path,
+                                          self.metrics, self.api_type, params=params, json=body)
         response.raise_for_status()
         return response.json()
\ No newline at end of file
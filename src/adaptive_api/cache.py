@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# Endpoints of the Live API that return near-static metadata
+LIVE_METADATA_TTLS = {
+    "tags": 300.0,
+    "commands": 300.0,
+    "screenButtons": 300.0,
+    "programs": 60.0,
+    "dashboardEntries": 60.0,
+}
+
+@dataclass
+class CacheEntry:
+    """A decoded response and the validators needed to revalidate it."""
+    value: Any
+    expires: float
+    size: int
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers for this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+def cache_key(path: str, query: Optional[dict], server: str = "", api: str = "") -> Tuple[Hashable, ...]:
+    """Hashable key for an endpoint of a server's API and its query.
+
+    The path comes first, it selects the TTL.
+    """
+    return (path, server, api) + _query_items(query)
+
+def _query_items(query: Optional[dict]) -> Tuple[Hashable, ...]:
+    if not query:
+        return ()
+    items = []
+    for key, value in sorted(query.items()):
+        if isinstance(value, (list, tuple)):
+            value = tuple(value)
+        items.append((key, value))
+    return tuple(items)
+
+class ResponseCache:
+    """Thread-safe TTL cache of decoded responses with LRU eviction.
+
+    Only endpoints listed in ttls are cached. Entries are evicted least
+    recently used first once max_entries or max_bytes (measured as response
+    body size) is exceeded. Expired entries are kept for revalidation with
+    If-None-Match / If-Modified-Since when the server sent validators.
+    Cached values are shared between callers and must not be mutated.
+    Entries are keyed by server and API too, so one cache can be shared by
+    clients of several servers.
+    """
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_entries: int = 1024,
+                 max_bytes: int = 64 * 1024 * 1024):
+        self.ttls = dict(LIVE_METADATA_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries: 'OrderedDict[Tuple[Hashable, ...], CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def caches(self, path: str) -> bool:
+        return path in self.ttls
+
+    def lookup(self, key: Tuple[Hashable, ...]) -> Tuple[Optional[CacheEntry], bool]:
+        """Return the entry for key, if any, and whether it is still fresh."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            if entry.expires > time.monotonic():
+                self.hits += 1
+                return entry, True
+            self.misses += 1
+            return entry, False
+
+    def revalidated(self, key: Tuple[Hashable, ...]) -> None:
+        """Extend an entry after the server answered 304 Not Modified."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.expires = time.monotonic() + self.ttls.get(key[0], 0.0)
+                self.revalidations += 1
+
+    def put(self, key: Tuple[Hashable, ...], value: Any, size: int,
+            etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Store a decoded response."""
+        entry = CacheEntry(value, time.monotonic() + self.ttls.get(key[0], 0.0), size,
+                           etag, last_modified)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = entry
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+
+    def invalidate(self, path: Optional[str] = None, query: Optional[dict] = None,
+                   server: Optional[str] = None, api: Optional[str] = None) -> None:
+        """Drop the entries matching every given argument: endpoint, query, server and API."""
+        items = _query_items(query) if query is not None else None
+        with self._lock:
+            keys = [key for key in self._entries
+                    if (path is None or key[0] == path) and (server is None or key[1] == server)
+                    and (api is None or key[2] == api) and (items is None or key[3:] == items)]
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._bytes -= entry.size
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
@@ -0,0 +1,359 @@
+"""adaptive-api command line tool for bulk extraction.
+
+    adaptive-api histories --server URL --ids ids.txt --output-dir out
+    adaptive-api histories --server URL --after 2025-01-01 --before 2025-02-01 --concat all.csv
+    adaptive-api jobs --server URL --after 2025-01-01 --before 2025-02-01 --output jobs.csv
+
+The token is read from --token or the ADAPTIVE_API_TOKEN environment
+variable. Only the standard library is imported until a command runs.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+FORMATS = ('csv', 'csv.gz', 'parquet')
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parser().parse_args(argv)
+    if not args.token:
+        print('adaptive-api: a token is required, pass --token or set ADAPTIVE_API_TOKEN', file=sys.stderr)
+        return 2
+    return args.command(args)
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='adaptive-api', description='Bulk extraction from Adaptive servers.')
+    commands = parser.add_subparsers(title='commands', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--server', required=True, help='server URL, for example http://adaptive')
+    common.add_argument('--token', default=os.environ.get('ADAPTIVE_API_TOKEN'), help='API token')
+    common.add_argument('--quiet', action='store_true', help='no progress output')
+
+    histories = commands.add_parser('histories', parents=[common], help='export job histories')
+    source = histories.add_mutually_exclusive_group(required=True)
+    source.add_argument('--ids', help='file with one job ID per line, - for stdin')
+    source.add_argument('--after', type=_parse_time, help='export jobs from this time (ISO date or ms)')
+    histories.add_argument('--before', type=_parse_time, help='end of the --after range, default now')
+    histories.add_argument('--resource', action='append', help='only jobs of this machine, repeatable')
+    histories.add_argument('--tags', help='comma separated tag names')
+    histories.add_argument('--tags-filter', help='server side tags filter')
+    histories.add_argument('--workers', type=int, default=8, help='concurrent history requests (default 8)')
+    histories.add_argument('--format', choices=FORMATS, default='csv')
+    output = histories.add_mutually_exclusive_group()
+    output.add_argument('--output-dir', default='.', help='directory for one file per job (default .)')
+    output.add_argument('--concat', help='write every job to this one file, with a JobId column')
+    histories.add_argument('--restart', action='store_true', help='export everything again instead of resuming')
+    histories.set_defaults(command=_histories)
+
+    jobs = commands.add_parser('jobs', parents=[common], help='export jobs and stoppages of a time range')
+    jobs.add_argument('--after', type=_parse_time, required=True)
+    jobs.add_argument('--before', type=_parse_time)
+    jobs.add_argument('--output', default='-', help='CSV file, - for stdout (default)')
+    jobs.set_defaults(command=_jobs)
+    return parser
+
+def _parse_time(value: str) -> int:
+    """Milliseconds since the epoch from digits or an ISO date, naive dates are local time."""
+    if value.isdigit():
+        return int(value)
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'not a date or millisecond timestamp: {value!r}')
+    return int(parsed.timestamp() * 1000)
+
+def _now() -> int:
+    return int(time.time() * 1000)
+
+# Progress
+
+def _progress_sink(quiet: bool) -> Any:
+    from .metrics import MetricsSink
+
+    class Progress(MetricsSink):
+        """Counts jobs and response bytes and reports throughput on stderr."""
+        def __init__(self, interval: float = 2.0):
+            self.total = 0
+            self.done = 0
+            self.skipped = 0
+            self.failed = 0
+            self.bytes = 0
+            self.interval = interval
+            self.start = time.monotonic()
+            self._last = 0.0
+            self._lock = threading.Lock()
+
+        def record_request(self, endpoint: str, method: str, status: Optional[int],
+                           latency: float, size: int, retries: int) -> None:
+            with self._lock:
+                self.bytes += size
+
+        def report(self, final: bool = False) -> None:
+            now = time.monotonic()
+            if quiet or (not final and now - self._last < self.interval):
+                return
+            self._last = now
+            elapsed = max(now - self.start, 1e-9)
+            print(f'{self.done + self.skipped + self.failed}/{self.total} jobs, {self.skipped} skipped, '
+                  f'{self.failed} failed, {self.done / elapsed:.1f} jobs/s, '
+                  f'{self.bytes / elapsed / 1e6:.1f} MB/s', file=sys.stderr)
+
+    return Progress()
+
+# histories
+
+def _histories(args: argparse.Namespace) -> int:
+    from .pe import ApiPe, id_to_string, string_to_id
+
+    progress = _progress_sink(args.quiet)
+    client = ApiPe(args.server, args.token, metrics=progress, compact_history=True, stream_history=True)
+    tags = [t.strip() for t in args.tags.split(',') if t.strip()] if args.tags else None
+
+    if args.ids is not None:
+        ids = []
+        for line in _read_lines(args.ids):
+            try:
+                ids.append(string_to_id(line))
+            except ValueError:
+                print(f'adaptive-api: not a job ID in {args.ids}: {line!r}', file=sys.stderr)
+                return 2
+    else:
+        before = args.before if args.before is not None else _now()
+        ids = [job.id for job in client.iter_jobs_and_stoppages(args.after, before, no_stoppages=True)
+               if not args.resource or job.resource in args.resource]
+
+    writer = _ConcatWriter(args.concat, args.format, args.restart) if args.concat else \
+        _FileWriter(args.output_dir, args.format, args.restart)
+    pending = []
+    for job_id in ids:
+        if writer.done(id_to_string(job_id)):
+            progress.skipped += 1
+        else:
+            pending.append(job_id)
+    progress.total = len(ids)
+
+    failures = []
+    try:
+        for result in client.history_many(pending, args.tags_filter, tags, max_workers=args.workers):
+            key = id_to_string(result.job_id)
+            if result.error is not None:
+                progress.failed += 1
+                failures.append(f'{key}: {result.error}')
+            elif result.history is None:
+                progress.failed += 1
+                failures.append(f'{key}: no history')
+            else:
+                writer.write(key, result.history)
+                progress.done += 1
+            progress.report()
+    finally:
+        writer.close()
+    progress.report(final=True)
+    for failure in failures:
+        print(f'failed {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+def _read_lines(path: str) -> Iterator[str]:
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8-sig')
+    try:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def _file_name(key: str) -> str:
+    return re.sub(r'[^\w@.-]', '_', key) or '_'
+
+class _FileWriter:
+    """One file per job. A job is done when its file exists, files are renamed into place."""
+    def __init__(self, directory: str, fmt: str, restart: bool):
+        self.directory = directory
+        self.format = fmt
+        self.restart = restart
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{_file_name(key)}.{self.format}')
+
+    def done(self, key: str) -> bool:
+        return not self.restart and os.path.exists(self._path(key))
+
+    def write(self, key: str, history: Any) -> None:
+        path = self._path(key)
+        _write(history, path + '.part', self.format)
+        os.replace(path + '.part', path)
+
+    def close(self) -> None:
+        pass
+
+def _write(history: Any, path: str, fmt: str) -> None:
+    if fmt == 'parquet':
+        from .export import write_history_parquet
+        write_history_parquet(history, path)
+    else:
+        from .pe import write_history_csv
+        write_history_csv(history, path, compress=fmt == 'csv.gz')
+
+class _ConcatWriter:
+    """All jobs in one file with a leading JobId column.
+
+    Finished job IDs are appended to <output>.done, so a restarted export
+    continues where it stopped. CSV rows follow the tag columns of the first
+    job. Each job is written to <output>.job first and appended whole, and
+    <output>.done records the output size after it. On restart the output is
+    truncated to the last recorded size, dropping the rows of a job that
+    was interrupted. Parquet is written per job into <output>.parts and
+    streamed into the output one job at a time at the end.
+    """
+    def __init__(self, output: str, fmt: str, restart: bool):
+        self.output = output
+        self.format = fmt
+        self.done_path = output + '.done'
+        self.parts = output + '.parts'
+        self.job_path = output + '.job'
+        if restart:
+            for path in (output, self.done_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            shutil.rmtree(self.parts, ignore_errors=True)
+        self.finished: Set[str] = set()
+        size: Optional[int] = 0
+        if os.path.exists(self.done_path):
+            with open(self.done_path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break  # cut off by a crash
+                    key, _, offset = line.rstrip('\n').partition('\t')
+                    self.finished.add(key)
+                    size = int(offset) if offset else None
+        self._columns: Optional[List[str]] = None
+        if fmt == 'parquet':
+            os.makedirs(self.parts, exist_ok=True)
+        elif os.path.exists(self.output):
+            if size is not None:
+                with open(self.output, 'r+b') as f:
+                    f.truncate(size)
+            if os.path.getsize(self.output) > 0:
+                self._columns = self._read_columns()
+        self._done_file = open(self.done_path, 'a', encoding='utf-8')
+
+    def _read_columns(self) -> Optional[List[str]]:
+        import gzip
+
+        opener: Any = gzip.open if self.format == 'csv.gz' else open
+        with opener(self.output, 'rt', encoding='utf-8', newline='') as f:
+            return next(csv.reader(f), None)
+
+    def done(self, key: str) -> bool:
+        return key in self.finished
+
+    def write(self, key: str, history: Any) -> None:
+        if self.format == 'parquet':
+            _write(history, os.path.join(self.parts, f'{_file_name(key)}.parquet'), 'parquet')
+            offset = 0
+        else:
+            offset = self._write_csv(key, history)
+        self.finished.add(key)
+        self._done_file.write(f'{key}\t{offset}\n')
+        self._done_file.flush()
+
+    def _write_csv(self, key: str, history: Any) -> int:
+        """Append the rows of one job and return the output size after them."""
+        import gzip
+        from .pe import history_header, history_rows
+
+        header = ['JobId'] + history_header(history)
+        columns = self._columns or header
+        positions = {name: n for n, name in enumerate(header)}
+        # Map this job's columns onto the file's, tags it lacks stay empty
+        order = [positions.get(name) for name in columns]
+        with open(self.job_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            if self._columns is None:
+                writer.writerow(header)
+            for row in history_rows(history):
+                row = [key] + row
+                writer.writerow(['' if n is None else row[n] for n in order])
+        with open(self.job_path, 'rb') as source:
+            # csv.gz gets one gzip member per job, which gzip readers concatenate
+            with (gzip.open(self.output, 'ab') if self.format == 'csv.gz' else open(self.output, 'ab')) as target:
+                shutil.copyfileobj(source, target)
+        os.remove(self.job_path)
+        self._columns = columns
+        return os.path.getsize(self.output)
+
+    def close(self) -> None:
+        self._done_file.close()
+        if self.format == 'parquet':
+            self._combine_parquet()
+
+    def _combine_parquet(self) -> None:
+        """Stream the parts into the output one job at a time, over the union of their columns."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parts = [(key, os.path.join(self.parts, f'{_file_name(key)}.parquet')) for key in sorted(self.finished)]
+        parts = [(key, path) for key, path in parts if os.path.exists(path)]
+        if not parts:
+            return
+        schemas = [pq.read_schema(path) for _, path in parts]
+        try:
+            unified = pa.unify_schemas(schemas, promote_options='permissive')
+        except TypeError:
+            unified = pa.unify_schemas(schemas)
+        schema = pa.schema([pa.field('JobId', pa.string())] + list(unified))
+        with pq.ParquetWriter(self.output + '.part', schema, compression='zstd') as writer:
+            for key, path in parts:
+                table = pq.read_table(path)
+                n = table.num_rows
+                # Tags this job lacks are null, types promoted by the schema are cast
+                columns = [pa.array([key] * n, pa.string())]
+                columns += [table.column(f.name).cast(f.type) if f.name in table.column_names
+                            else pa.nulls(n, f.type) for f in unified]
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+        os.replace(self.output + '.part', self.output)
+
+# jobs
+
+_JOB_COLUMNS = ['kind', 'id', 'resource', 'start', 'end', 'committed', 'blocked', 'stoppage',
+                'notes', 'color', 'standardTime', 'parameters', 'props']
+
+def _jobs(args: argparse.Namespace) -> int:
+    from .pe import ApiPe, id_to_string, is_stoppage
+
+    progress = _progress_sink(args.quiet)
+    client = ApiPe(args.server, args.token, metrics=progress)
+    before = args.before if args.before is not None else _now()
+    f = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8', newline='')
+    try:
+        writer = csv.writer(f)
+        writer.writerow(_JOB_COLUMNS)
+        for item in client.iter_jobs_and_stoppages(args.after, before):
+            row: Dict[str, Any] = {'kind': 'stoppage' if is_stoppage(item) else 'job',
+                                   'id': id_to_string(item.id)}
+            for name in _JOB_COLUMNS[2:]:
+                value = getattr(item, name, None)
+                row[name] = json.dumps(value) if isinstance(value, (dict, list)) else value
+            writer.writerow(['' if row[name] is None else row[name] for name in _JOB_COLUMNS])
+            progress.done += 1
+            progress.total += 1
+            progress.report()
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    progress.report(final=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import warnings
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .pe import AdaptiveHistory, HistoryTag
+
+# Alignment of many batch histories onto one grid for comparison.
+#
+# With ELAPSED the grid is points elapsed times from 0 to the longest batch,
+# or duration. With STEP every run of one value of the step tag is a step,
+# the n-th run of a value in a batch is matched with the n-th run of that
+# value in the others, and each step is stretched onto points_per_step grid
+# points, so batches are compared at the same fraction of each step. Steps
+# are ordered by their median start time over the batches.
+#
+# Values are forward filled by default, as they hold until the next sample,
+# or interpolated linearly. Grid points before a tag's first sample, after
+# the end of a batch or in a step the batch does not have are NaN.
+
+ELAPSED = 'elapsed'
+STEP = 'step'
+
+STEP_TAG = 'Parent.CurrentStep'
+
+_NUMERIC = ('number', 'date', 'boolean')
+
+StepKey = Tuple[Any, int]
+
+@dataclass
+class Envelope:
+    """Statistics of one tag over the batches at every grid point, ignoring NaN.
+
+    With a golden batch, deviation is every batch minus the golden batch and
+    rms_deviation the root mean square of each batch's deviation.
+    """
+    mean: np.ndarray
+    std: np.ndarray
+    minimum: np.ndarray
+    maximum: np.ndarray
+    count: np.ndarray
+    percentiles: Dict[float, np.ndarray] = field(default_factory=dict)
+    deviation: Optional[np.ndarray] = None
+    rms_deviation: Optional[np.ndarray] = None
+
+@dataclass
+class AlignedBatches:
+    """Tags of many batches resampled onto a common grid.
+
+    matrices has one (len(ids), len(grid)) float array per tag, with NaN
+    where a batch has no value. For ELAPSED, grid holds elapsed
+    milliseconds. For STEP, grid holds step number + fraction of the step,
+    step n being steps[n], the (step value, occurrence) pair, and
+    step_starts the grid index where each step begins.
+    """
+    ids: List[Any]
+    by: str
+    grid: np.ndarray
+    matrices: Dict[str, np.ndarray]
+    steps: List[StepKey] = field(default_factory=list)
+    step_starts: Optional[np.ndarray] = None
+
+    def batch(self, key: Union[int, Any]) -> int:
+        """Row of a batch given its position or its history id."""
+        if key in self.ids:
+            return self.ids.index(key)
+        if isinstance(key, int) and -len(self.ids) <= key < len(self.ids):
+            return key % len(self.ids)
+        raise KeyError(f"No batch {key!r}")
+
+    def deviation(self, tag: str, golden: Union[int, Any]) -> np.ndarray:
+        """Every batch of a tag minus the golden batch."""
+        matrix = self.matrices[tag]
+        return matrix - matrix[self.batch(golden)]
+
+    def envelope(self, tag: str, percentiles: Sequence[float] = (5, 50, 95),
+                 golden: Optional[Union[int, Any]] = None) -> Envelope:
+        """Mean, standard deviation, extremes and percentiles of a tag at every grid point."""
+        matrix = self.matrices[tag]
+        count = np.count_nonzero(~np.isnan(matrix), axis=0)
+        with warnings.catch_warnings():
+            # Grid points without any value give NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            envelope = Envelope(np.nanmean(matrix, axis=0), np.nanstd(matrix, axis=0),
+                                np.nanmin(matrix, axis=0), np.nanmax(matrix, axis=0), count)
+            if percentiles:
+                values = np.nanpercentile(matrix, list(percentiles), axis=0)
+                envelope.percentiles = dict(zip(percentiles, values))
+            if golden is not None:
+                envelope.deviation = self.deviation(tag, golden)
+                envelope.rms_deviation = np.sqrt(np.nanmean(envelope.deviation ** 2, axis=1))
+        return envelope
+
+def align_histories(histories: Iterable[AdaptiveHistory], tags: Optional[List[str]] = None,
+                    by: str = ELAPSED, points: int = 1000, duration: Optional[int] = None,
+                    step_tag: str = STEP_TAG, points_per_step: int = 50,
+                    interpolate: bool = False) -> AlignedBatches:
+    """Align many histories onto a common grid, by elapsed time or by step.
+
+    tags defaults to every number, date and boolean tag of the histories.
+    Booleans become 0 and 1. duration limits the ELAPSED grid, in
+    milliseconds.
+    """
+    if by not in (ELAPSED, STEP):
+        raise ValueError(f"Unknown alignment {by!r}")
+    batches = [_Batch(history) for history in histories]
+    if tags is None:
+        tags = list(dict.fromkeys(tag.name for batch in batches for tag in batch.tags.values()
+                                  if tag.type in _NUMERIC))
+    ids = [batch.id for batch in batches]
+
+    if by == ELAPSED:
+        if duration is None:
+            duration = max((batch.end for batch in batches), default=0)
+        grid = np.linspace(0, duration, points)
+        at = [grid] * len(batches)
+        result = AlignedBatches(ids, by, grid, {})
+    else:
+        runs = [batch.steps(step_tag) for batch in batches]
+        steps = _order_steps(runs)
+        fractions = np.arange(points_per_step) / points_per_step
+        grid = (np.arange(len(steps))[:, None] + fractions).ravel()
+        at = []
+        for batch_runs in runs:
+            # Start and length of each step in this batch, NaN for steps it does not have
+            bounds = np.full((len(steps), 2), np.nan)
+            for n, key in enumerate(steps):
+                if key in batch_runs:
+                    bounds[n] = batch_runs[key]
+            at.append((bounds[:, :1] + fractions * bounds[:, 1:]).ravel())
+        result = AlignedBatches(ids, by, grid, {}, steps, np.arange(len(steps)) * points_per_step)
+
+    for name in tags:
+        matrix = np.full((len(batches), len(grid)), np.nan)
+        for row, (batch, batch_at) in enumerate(zip(batches, at)):
+            series = batch.series(name)
+            if series is not None:
+                matrix[row] = _resample(series[0], series[1], batch_at, batch.end, interpolate)
+        result.matrices[name] = matrix
+    return result
+
+class _Batch:
+    """One history, with its tags converted to arrays when they are resampled."""
+    def __init__(self, history: AdaptiveHistory):
+        self.id = history.id
+        self.times = np.asarray(history.elapsedTimes, dtype=np.int64)
+        self.tags = {tag.name: tag for tag in history.tags}
+        last = int(self.times[-1]) if len(self.times) else 0
+        self.end = max(last, int((history.end - history.start).total_seconds() * 1000))
+
+    def series(self, name: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Sample times and float values of a tag."""
+        tag = self.tags.get(name)
+        if tag is None or len(tag.elapsedIndexes) == 0:
+            return None
+        return self.times[np.asarray(tag.elapsedIndexes, dtype=np.int64)], np.asarray(tag.values, dtype=np.float64)
+
+    def steps(self, step_tag: str) -> Dict[StepKey, Tuple[float, float]]:
+        """Start and length of every (step value, occurrence) run of the step tag."""
+        tag: Optional[HistoryTag] = self.tags.get(step_tag)
+        if tag is None or len(tag.elapsedIndexes) == 0:
+            return {}
+        starts = self.times[np.asarray(tag.elapsedIndexes, dtype=np.int64)].tolist()
+        ends = starts[1:] + [self.end]
+        runs: Dict[StepKey, Tuple[float, float]] = {}
+        seen: Dict[Any, int] = {}
+        previous = object()
+        for value, start, end in zip(tag.values, starts, ends):
+            if value == previous:
+                # A repeated sample continues the run
+                key = (value, seen[value] - 1)
+                runs[key] = (runs[key][0], end - runs[key][0])
+                continue
+            occurrence = seen.get(value, 0)
+            seen[value] = occurrence + 1
+            runs[(value, occurrence)] = (start, end - start)
+            previous = value
+        return runs
+
+def _order_steps(runs: List[Dict[StepKey, Tuple[float, float]]]) -> List[StepKey]:
+    """Every step key of the batches, ordered by median start time."""
+    starts: Dict[StepKey, List[float]] = {}
+    for batch_runs in runs:
+        for key, (start, _) in batch_runs.items():
+            starts.setdefault(key, []).append(start)
+    return sorted(starts, key=lambda key: float(np.median(starts[key])))
+
+def _resample(times: np.ndarray, values: np.ndarray, at: np.ndarray, end: int, interpolate: bool) -> np.ndarray:
+    """Values of a tag at the times in at, NaN before the first sample and after end."""
+    if interpolate:
+        result = np.interp(at, times, values)
+    else:
+        positions = np.searchsorted(times, at, side='right') - 1
+        result = values[np.maximum(positions, 0)]
+    result[(at < times[0]) | (at > end) | np.isnan(at)] = np.nan
+    return result
@@ -0,0 +1,183 @@
+from array import array
+from dataclasses import fields
+from datetime import datetime
+from typing import Any, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .pe import AdaptiveHistory, HistoryTag, Tag
+
+# Decimation of histories for plotting.
+#
+# Each tag is reduced on its own to about a target number of samples within
+# a time range, and the kept samples of all tags make up the elapsedTimes of
+# the reduced history. Number and date tags keep the minimum and maximum of
+# each time bucket (MINMAX) or the points chosen by Largest-Triangle-Three-
+# Buckets (LTTB). Boolean and string tags keep the first and last sample of
+# each bucket and the first sample that differs from the first, so short
+# pulses stay visible. Samples are values that hold until the next sample,
+# and the start and edges of gaps (None) are always kept.
+
+MINMAX = 'minmax'
+LTTB = 'lttb'
+
+Time = Union[int, datetime]
+
+def decimate_history(history: AdaptiveHistory, points: int = 2000, after: Optional[Time] = None,
+                     before: Optional[Time] = None, method: str = MINMAX,
+                     tags: Optional[List[str]] = None) -> AdaptiveHistory:
+    """Reduce every tag of a history to about points samples within [after, before).
+
+    after and before are elapsed milliseconds or datetimes and default to the
+    whole history. Each tag starts with the value it held at after. Returns a
+    new history with the same start, and plain lists.
+    """
+    if method not in (MINMAX, LTTB):
+        raise ValueError(f"Unknown decimation method {method!r}")
+    if points < 4:
+        raise ValueError("points must be at least 4")
+    times = np.asarray(history.elapsedTimes, dtype=np.int64)
+    if len(times) == 0:
+        return AdaptiveHistory(history.id, history.start, history.end, [], [], history.commands)
+    lo = _elapsed(history, after) if after is not None else int(times[0])
+    hi = _elapsed(history, before) if before is not None else int(times[-1]) + 1
+    selected = history.tags if tags is None else [tag for tag in history.tags if tag.name in tags]
+
+    reduced = [_decimate_tag(tag, times, lo, hi, points, method) for tag in selected]
+    kept_times = np.unique(np.concatenate([t for t, _ in reduced] + [np.empty(0, np.int64)]))
+    result_tags = []
+    for tag, (tag_times, values) in zip(selected, reduced):
+        meta = {f.name: getattr(tag, f.name) for f in fields(Tag)}
+        result_tags.append(HistoryTag(**meta, elapsedIndexes=np.searchsorted(kept_times, tag_times).tolist(),
+                                      values=values))
+    return AdaptiveHistory(history.id, history.start, history.end, kept_times.tolist(), result_tags,
+                           history.commands)
+
+def _elapsed(history: AdaptiveHistory, value: Time) -> int:
+    if isinstance(value, datetime):
+        return int((value - history.start).total_seconds() * 1000)
+    return int(value)
+
+def _decimate_tag(tag: HistoryTag, times: np.ndarray, lo: int, hi: int, points: int,
+                  method: str) -> Tuple[np.ndarray, List[Any]]:
+    """Kept sample times and values of one tag."""
+    source = tag.values
+    sample_times = times[np.asarray(tag.elapsedIndexes, dtype=np.int64)]
+    first = int(np.searchsorted(sample_times, lo, side='left'))
+    stop = int(np.searchsorted(sample_times, hi, side='left'))
+    window_times = sample_times[first:stop]
+    if first > 0 and (stop == first or window_times[0] > lo):
+        # The value held at the start of the range
+        first -= 1
+        window_times = np.concatenate(([lo], window_times))
+    if len(window_times) == 0:
+        return window_times, []
+
+    window = _window(source, first, stop)
+    if tag.type in ('number', 'date'):
+        values = np.asarray(window, dtype=np.float64)
+        if method == LTTB:
+            keep = lttb_indexes(window_times, values, points)
+        else:
+            keep = minmax_indexes(window_times, values, points // 2, lo, hi)
+    else:
+        values = window if isinstance(window, np.ndarray) else np.asarray(window, dtype=object)
+        keep = transition_indexes(window_times, values, points // 3, lo, hi)
+        # Drop kept samples that repeat the previous kept value
+        kept = values[keep]
+        keep = keep[np.concatenate(([True], np.asarray(kept[1:] != kept[:-1], dtype=bool)))]
+    kept_values = window[keep].tolist() if isinstance(window, np.ndarray) else [window[i] for i in keep.tolist()]
+    return window_times[keep], kept_values
+
+def _window(source: Any, start: int, stop: int) -> Any:
+    """source[start:stop], as an array when source converts to one without a Python loop."""
+    if isinstance(source, (np.ndarray, array)) or hasattr(source, '__array__'):
+        return np.asarray(source)[start:stop]
+    return source[start:stop]
+
+def _buckets(times: np.ndarray, buckets: int, lo: int, hi: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Equal time bucket of every sample, and the position of each bucket's first sample."""
+    bucket = np.clip((times - lo) * buckets // max(hi - lo, 1), 0, buckets - 1)
+    starts = np.flatnonzero(np.concatenate(([True], bucket[1:] != bucket[:-1])))
+    segment = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(times))))
+    return segment, starts
+
+def _first_per_segment(mask: np.ndarray, segment: np.ndarray) -> np.ndarray:
+    """Position of the first True of mask in every segment that has one."""
+    hits = np.flatnonzero(mask)
+    owners = segment[hits]
+    return hits[np.concatenate(([True], owners[1:] != owners[:-1]))] if len(hits) else hits
+
+def _gap_edges(values: np.ndarray) -> np.ndarray:
+    """Positions where values turn NaN or stop being NaN."""
+    missing = np.isnan(values)
+    changes = np.flatnonzero(missing[1:] != missing[:-1]) + 1
+    return np.concatenate((changes - 1, changes))
+
+def minmax_indexes(times: np.ndarray, values: np.ndarray, buckets: int,
+                   lo: Optional[int] = None, hi: Optional[int] = None) -> np.ndarray:
+    """Positions of the minimum and maximum float value in each of buckets equal time buckets.
+
+    The first and last sample and the edges of NaN gaps are kept too.
+    """
+    n = len(times)
+    if n <= 2 * buckets:
+        return np.arange(n)
+    lo = int(times[0]) if lo is None else lo
+    hi = int(times[-1]) + 1 if hi is None else hi
+    segment, starts = _buckets(times, buckets, lo, hi)
+    missing = np.isnan(values)
+    low = np.where(missing, np.inf, values)
+    high = np.where(missing, -np.inf, values)
+    mins = np.minimum.reduceat(low, starts)
+    maxs = np.maximum.reduceat(high, starts)
+    keep = np.concatenate((_first_per_segment(low == mins[segment], segment),
+                           _first_per_segment(high == maxs[segment], segment),
+                           [0, n - 1], _gap_edges(values)))
+    return np.unique(keep)
+
+def lttb_indexes(times: np.ndarray, values: np.ndarray, points: int) -> np.ndarray:
+    """Positions chosen by Largest-Triangle-Three-Buckets among the non-NaN values.
+
+    The edges of NaN gaps are kept too.
+    """
+    n = len(times)
+    present = np.flatnonzero(~np.isnan(values))
+    m = len(present)
+    if n <= points or m <= points:
+        return np.arange(n) if n <= points else np.unique(np.concatenate((present, _gap_edges(values))))
+    x = times[present].astype(np.float64)
+    y = values[present]
+    # points - 2 buckets between the first and last point, each compared to
+    # the average of the next bucket (the last point for the last bucket)
+    edges = np.linspace(1, m - 1, points - 1).astype(np.int64)
+    bounds = np.append(edges, m)
+    counts = np.diff(bounds)
+    mean_x = np.add.reduceat(x, bounds[:-1]) / counts
+    mean_y = np.add.reduceat(y, bounds[:-1]) / counts
+    chosen = np.empty(points, dtype=np.int64)
+    chosen[0] = a = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - mean_x[i + 1]) * (y[start:end] - ay) - (ax - x[start:end]) * (mean_y[i + 1] - ay))
+        a = start + int(np.argmax(area))
+        chosen[i + 1] = a
+    chosen[-1] = m - 1
+    return np.unique(np.concatenate((present[chosen], _gap_edges(values))))
+
+def transition_indexes(times: np.ndarray, values: np.ndarray, buckets: int,
+                       lo: Optional[int] = None, hi: Optional[int] = None) -> np.ndarray:
+    """Positions of the first and last sample in each equal time bucket, and the first that differs from the first.
+
+    values may be any array that compares elementwise, such as bool or object.
+    """
+    n = len(times)
+    if n <= 3 * buckets:
+        return np.arange(n)
+    lo = int(times[0]) if lo is None else lo
+    hi = int(times[-1]) + 1 if hi is None else hi
+    segment, starts = _buckets(times, buckets, lo, hi)
+    lasts = np.append(starts[1:] - 1, n - 1)
+    differs = np.asarray(values != values[starts][segment], dtype=bool)
+    return np.unique(np.concatenate((starts, lasts, _first_per_segment(differs, segment))))
@@ -0,0 +1,207 @@
+import dataclasses
+import threading
+import typing
+from typing import Any, Callable, Dict, Optional, Set, Tuple, Type, TypeVar
+
+from dacite import Config, from_dict
+from dacite.exceptions import MissingValueError, WrongTypeError
+from dacite.types import is_instance
+
+T = TypeVar("T")
+
+# Specialized dict -> dataclass constructors. Each dataclass gets a function
+# generated once that reads its fields straight from the dict, applies the
+# config type hooks inline and decodes nested dataclasses with their own
+# generated functions. Lists and dicts are copied, as dacite does, so
+# decoded objects never share them with the payload. For valid payloads the
+# result equals dacite's from_dict. Every field is type checked like dacite
+# does, except that only the container type of lists and dicts is checked,
+# not their items, and values converted by a type hook are not checked.
+# Configs using cast, strict or the other dacite options fall back to
+# from_dict.
+
+def with_slots(cls: Type[T]) -> Type[T]:
+    """Recreate a dataclass with __slots__ (dataclass(slots=True) before 3.10)."""
+    cls_dict = dict(cls.__dict__)
+    field_names = tuple(f.name for f in dataclasses.fields(cls))
+    inherited = {name for base in cls.__mro__[1:] for name in getattr(base, '__slots__', ())}
+    cls_dict['__slots__'] = tuple(name for name in field_names if name not in inherited)
+    for name in field_names:
+        # Defaults live on in the generated __init__
+        cls_dict.pop(name, None)
+    cls_dict.pop('__dict__', None)
+    cls_dict.pop('__weakref__', None)
+    new_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    new_cls.__qualname__ = cls.__qualname__
+    return new_cls
+
+_decoders: Dict[Tuple[type, Any], Callable[[Dict[str, Any]], Any]] = {}
+_compiling: Set[Tuple[type, Any]] = set()
+_compile_lock = threading.RLock()
+
+def decoder_for(data_class: Type[T], config: Optional[Config] = None) -> Callable[[Dict[str, Any]], T]:
+    """Return the generated decoder for a dataclass, compiling it on first use."""
+    hooks = config.type_hooks if config is not None else {}
+    key = (data_class, frozenset(hooks.items()),
+           config is None or (config.check_types, _plain(config)))
+    decoder = _decoders.get(key)
+    if decoder is not None:
+        return decoder
+    with _compile_lock:
+        decoder = _decoders.get(key)
+        if decoder is None:
+            if key in _compiling:
+                # A dataclass that contains itself, looked up once it is compiled
+                return lambda data: _decoders[key](data)
+            _compiling.add(key)
+            try:
+                decoder = _compile(data_class, hooks, config)
+            finally:
+                _compiling.discard(key)
+            _decoders[key] = decoder
+    return decoder
+
+def decode(data_class: Type[T], data: Dict[str, Any], config: Optional[Config] = None) -> T:
+    """Drop-in replacement for dacite.from_dict."""
+    return decoder_for(data_class, config)(data)
+
+class _Unsupported(Exception):
+    pass
+
+class _Builder:
+    def __init__(self, hooks: Dict[type, Callable[[Any], Any]], config: Optional[Config]):
+        self.hooks = hooks
+        self.config = config
+        self.namespace: Dict[str, Any] = {}
+        self.depth = 0
+
+    def constant(self, value: Any) -> str:
+        name = f"_c{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def expr(self, tp: Any, var: str) -> str:
+        """Expression converting the wire value in var to type tp."""
+        if tp in self.hooks:
+            return f"{self.constant(self.hooks[tp])}({var})"
+        origin = typing.get_origin(tp)
+        args = typing.get_args(tp)
+        if origin is typing.Union:
+            inner = [a for a in args if a is not type(None)]
+            if len(inner) == 1:
+                return self.expr(inner[0], var)
+            copies = (f"list({var})", f"dict({var})")
+            converted = [self.expr(a, var) for a in inner]
+            if any(e != var and e not in copies for e in converted):
+                raise _Unsupported(tp)
+            if any(e in copies for e in converted):
+                return f"{self.constant(_copy)}({var})"
+            return var
+        if dataclasses.is_dataclass(tp):
+            decoder = decoder_for(tp, self.config)
+            return f"{self.constant(decoder)}({var})"
+        if origin in (list, typing.List) and args:
+            self.depth += 1
+            item = f"_i{self.depth}"
+            item_expr = self.expr(args[0], item)
+            self.depth -= 1
+            if item_expr == item:
+                return f"list({var})"
+            return f"[{self.guard(item_expr, item)} for {item} in {var}]"
+        if origin in (dict, typing.Dict) and len(args) == 2:
+            self.depth += 1
+            key, item = f"_k{self.depth}", f"_v{self.depth}"
+            item_expr = self.expr(args[1], item)
+            self.depth -= 1
+            if item_expr == item:
+                return f"dict({var})"
+            return f"{{{key}: {self.guard(item_expr, item)} for {key}, {item} in {var}.items()}}"
+        return var
+
+    def guard(self, expression: str, var: str) -> str:
+        return f"(None if {var} is None else {expression})"
+
+    def check(self, tp: Any, var: str, name: str, default: Any = dataclasses.MISSING) -> Optional[str]:
+        """Statement raising WrongTypeError when the wire value of a field has the wrong type."""
+        if self.config is not None and not self.config.check_types:
+            return None
+        optional = typing.get_origin(tp) is typing.Union and type(None) in typing.get_args(tp)
+        inner = [a for a in typing.get_args(tp) if a is not type(None)] if optional else [tp]
+        checked = inner[0] if len(inner) == 1 else typing.Union[tuple(inner)]
+        if checked is typing.Any or checked in self.hooks:
+            return None
+        origin = typing.get_origin(checked)
+        if checked in _SCALARS:
+            condition = f"not isinstance({var}, {self.constant(_SCALARS[checked])})"
+        elif dataclasses.is_dataclass(checked) or origin in (dict, typing.Dict):
+            condition = f"not isinstance({var}, dict)"
+        elif origin in (list, typing.List):
+            condition = f"not isinstance({var}, list)"
+        elif origin is None and isinstance(checked, type):
+            condition = f"not isinstance({var}, {self.constant(checked)})"
+        else:
+            condition = f"not {self.constant(is_instance)}({var}, {self.constant(checked)})"
+        if optional:
+            condition = f"{var} is not None and {condition}"
+        elif default is not dataclasses.MISSING and not is_instance(default, checked):
+            # Like dacite, a default is used as is
+            condition = f"{var} is not {self.constant(default)} and {condition}"
+        return f"    if {condition}: raise _wrong({self.constant(tp)}, {var}, {name})"
+
+# Python and JSON accept an int where a float is expected, as dacite does
+_SCALARS = {int: (int,), float: (int, float), str: (str,), bool: (bool,)}
+
+_DEFAULT_CONVERT_KEY = Config().convert_key.__code__
+
+def _plain(config: Config) -> bool:
+    """Whether a config only uses type hooks and check_types, which generated decoders support."""
+    return (not config.cast and not config.strict and not config.strict_unions_match
+            and not config.forward_references and config.convert_key.__code__ is _DEFAULT_CONVERT_KEY)
+
+def _copy(value: Any) -> Any:
+    """A copy of a list or dict from the payload, other values as they are."""
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+def _compile(data_class: type, hooks: Dict[type, Callable[[Any], Any]],
+             config: Optional[Config]) -> Callable[[Dict[str, Any]], Any]:
+    if config is not None and not _plain(config):
+        return lambda data: from_dict(data_class, data, config)
+    builder = _Builder(hooks, config)
+    hints = typing.get_type_hints(data_class)
+    lines = []
+    args = []
+    try:
+        for n, f in enumerate(dataclasses.fields(data_class)):
+            if not f.init:
+                continue
+            var = f"v{n}"
+            name = repr(f.name)
+            tp = hints[f.name]
+            if f.default is not dataclasses.MISSING:
+                lines.append(f"    {var} = data.get({name}, {builder.constant(f.default)})")
+            elif f.default_factory is not dataclasses.MISSING:
+                factory = builder.constant(f.default_factory)
+                lines.append(f"    {var} = data[{name}] if {name} in data else {factory}()")
+            elif typing.get_origin(tp) is typing.Union and type(None) in typing.get_args(tp):
+                lines.append(f"    {var} = data.get({name})")
+            else:
+                lines.append(f"    if {name} not in data: raise _missing({name})")
+                lines.append(f"    {var} = data[{name}]")
+            check = builder.check(tp, var, name, f.default)
+            if check is not None:
+                lines.append(check)
+            expression = builder.expr(tp, var)
+            if expression != var:
+                lines.append(f"    {var} = {builder.guard(expression, var)}")
+            args.append(var)
+    except _Unsupported:
+        return lambda data: from_dict(data_class, data, config)
+
+    builder.namespace.update(_cls=data_class, _missing=MissingValueError, _wrong=WrongTypeError)
+    source = "def decode(data):\n" + "\n".join(lines) + f"\n    return _cls({', '.join(args)})\n"
+    exec(source, builder.namespace)
+    return builder.namespace["decode"]
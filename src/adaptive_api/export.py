@@ -0,0 +1,124 @@
+from typing import Any, Dict, Optional, Tuple, Union
+from datetime import datetime, timezone
+import os
+
+import numpy as np
+
+from .pe import AdaptiveHistory, HistoryTag
+
+# Columnar export of AdaptiveHistory. numpy is required, pandas and pyarrow
+# are imported only by the functions that need them.
+
+def _utc_naive(value: datetime) -> datetime:
+    """Convert an aware datetime to naive UTC, leave naive ones alone."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _tag_column(tag: HistoryTag, n: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Forward fill a tag onto the n global steps.
+
+    Returns the dense values and a mask of steps before the first sample, or
+    None when every step has a value.
+    """
+    elapsed_indexes = np.asarray(tag.elapsedIndexes, dtype=np.int64)
+    # Position of the last sample at or before each global step
+    positions = np.searchsorted(elapsed_indexes, np.arange(n), side='right') - 1
+    missing = positions < 0
+    positions[missing] = 0
+
+    if tag.type in ('number', 'date'):
+        values = np.asarray(tag.values)
+        if values.dtype == object or values.dtype.kind not in 'iuf':
+            values = values.astype(np.float64)
+    elif tag.type == 'boolean':
+        values = np.asarray(tag.values, dtype=bool)
+    else:
+        values = np.asarray(tag.values, dtype=object)
+
+    if len(values) == 0:
+        return np.zeros(n, dtype=values.dtype), np.ones(n, dtype=bool)
+    column = values[positions]
+    return column, (missing if missing.any() else None)
+
+def history_times(history: AdaptiveHistory) -> np.ndarray:
+    """Absolute UTC time of every global step as datetime64[ms]."""
+    start = np.datetime64(_utc_naive(history.start), 'ms')
+    return start + np.asarray(history.elapsedTimes, dtype=np.int64).astype('timedelta64[ms]')
+
+def history_to_arrays(history: AdaptiveHistory) -> Dict[str, np.ndarray]:
+    """Dense forward-filled numpy array per tag, keyed by tag name.
+
+    Also contains 'ElapsedTime' and 'Time'. Numeric and date tags with steps
+    before their first sample are float with NaN, other tags use None.
+    """
+    n = len(history.elapsedTimes)
+    result = {
+        'ElapsedTime': np.asarray(history.elapsedTimes, dtype=np.int64),
+        'Time': history_times(history),
+    }
+    for tag in history.tags:
+        column, missing = _tag_column(tag, n)
+        if missing is not None:
+            if column.dtype.kind in 'iuf':
+                column = column.astype(np.float64)
+                column[missing] = np.nan
+            else:
+                column = column.astype(object)
+                column[missing] = None
+        result[tag.name] = column
+    return result
+
+def history_to_dataframe(history: AdaptiveHistory) -> Any:
+    """Dense forward-filled pandas DataFrame indexed by UTC time."""
+    import pandas as pd
+
+    n = len(history.elapsedTimes)
+    index = pd.DatetimeIndex(history_times(history), name='Time')
+    if history.start.tzinfo is not None:
+        index = index.tz_localize('UTC')
+    columns = {'ElapsedTime': np.asarray(history.elapsedTimes, dtype=np.int64)}
+    for tag in history.tags:
+        column, missing = _tag_column(tag, n)
+        if tag.type == 'date':
+            series = pd.Series(pd.to_datetime(column, unit='ms', utc=True), index=index)
+        elif tag.type == 'number' and column.dtype.kind in 'iu' and missing is not None:
+            series = pd.Series(pd.array(column, dtype='Int64'), index=index)
+        elif tag.type == 'boolean' and missing is not None:
+            series = pd.Series(pd.array(column, dtype='boolean'), index=index)
+        else:
+            series = pd.Series(column, index=index)
+        if missing is not None:
+            series[missing] = None
+        columns[tag.name] = series
+    return pd.DataFrame(columns, index=index)
+
+def history_to_arrow(history: AdaptiveHistory) -> Any:
+    """Dense forward-filled pyarrow Table with a UTC timestamp column."""
+    import pyarrow as pa
+
+    n = len(history.elapsedTimes)
+    names = ['ElapsedTime', 'Time']
+    arrays = [
+        pa.array(np.asarray(history.elapsedTimes, dtype=np.int64), type=pa.int64()),
+        pa.array(history_times(history), type=pa.timestamp('ms', tz='UTC')),
+    ]
+    for tag in history.tags:
+        column, missing = _tag_column(tag, n)
+        if tag.type == 'date':
+            array = pa.array(column.astype(np.int64), type=pa.timestamp('ms', tz='UTC'), mask=missing)
+        elif column.dtype == object:
+            array = pa.array([None if v is None else str(v) for v in column],
+                             type=pa.string(), mask=missing)
+        else:
+            array = pa.array(column, mask=missing)
+        names.append(tag.name)
+        arrays.append(array)
+    return pa.Table.from_arrays(arrays, names=names)
+
+def write_history_parquet(history: AdaptiveHistory, path: Union[str, os.PathLike],
+                          compression: str = 'zstd') -> None:
+    """Write a history to a Parquet file."""
+    import pyarrow.parquet as pq
+
+    pq.write_table(history_to_arrow(history), path, compression=compression)
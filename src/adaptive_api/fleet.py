@@ -0,0 +1,155 @@
+import concurrent.futures
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar, Union
+
+from .live import ApiLive, LiveMachine
+from .metrics import MetricsSink
+from .pe import ApiPe, DailyJobCount, Job, Stoppage
+from .transport import Transport
+
+T = TypeVar('T')
+
+@dataclass
+class Site:
+    """One plant's Adaptive server.
+
+    timeout bounds how long a fleet call waits for this site, in seconds,
+    and defaults to the FleetClient timeout. It is also the deadline of the
+    site's requests, so a call that hangs gives its worker back. transport
+    overrides the FleetClient transport, for example to give a distant site
+    longer request timeouts.
+    """
+    name: str
+    server: str
+    token: str
+    timeout: Optional[float] = None
+    transport: Optional[Transport] = None
+
+@dataclass
+class FleetResult(Generic[T]):
+    """Merged value of a fleet call and the sites that failed or timed out."""
+    value: T
+    errors: Dict[str, Exception] = field(default_factory=dict)
+
+class FleetClient:
+    """Queries many Adaptive servers at once.
+
+    Every call is sent to all sites concurrently. A site that fails or does
+    not answer within its timeout is reported in FleetResult.errors and the
+    call returns without it, so one slow site does not hold up the others.
+    Machine names are qualified with the site name, 'Plant1/05' by default,
+    both in the results and in the machines passed to the *_multiple calls.
+    """
+    def __init__(self, sites: Iterable[Site], timeout: float = 10.0, separator: str = '/',
+                 transport: Optional[Transport] = None, metrics: Optional[MetricsSink] = None,
+                 max_workers: Optional[int] = None):
+        self.sites = {site.name: site for site in sites}
+        self.timeout = timeout
+        self.separator = separator
+        transport = transport or Transport()
+        transports = {name: (site.transport or transport).bounded(self._timeout(name))
+                      for name, site in self.sites.items()}
+        self.live = {name: ApiLive(site.server, site.token, transport=transports[name], metrics=metrics)
+                     for name, site in self.sites.items()}
+        self.pe = {name: ApiPe(site.server, site.token, transport=transports[name], metrics=metrics)
+                   for name, site in self.sites.items()}
+        # Room for every site twice, so calls abandoned by a timeout do not starve the next call
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or max(4, 2 * len(self.sites)))
+
+    def __enter__(self) -> 'FleetClient':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the worker threads without waiting for abandoned calls."""
+        self._executor.shutdown(wait=False)
+
+    def _timeout(self, site: str) -> float:
+        timeout = self.sites[site].timeout
+        return self.timeout if timeout is None else timeout
+
+    # Machine names
+
+    def qualify(self, site: str, machine: str) -> str:
+        return f"{site}{self.separator}{machine}"
+
+    def split(self, qualified: str) -> Tuple[str, str]:
+        """Site and machine name of a qualified machine name."""
+        site, separator, machine = qualified.partition(self.separator)
+        if not separator or site not in self.sites:
+            raise ValueError(f"Not a qualified machine name: {qualified!r}")
+        return site, machine
+
+    def _by_site(self, machines: List[str]) -> Dict[str, List[str]]:
+        grouped: Dict[str, List[str]] = {}
+        for qualified in machines:
+            site, machine = self.split(qualified)
+            grouped.setdefault(site, []).append(machine)
+        return grouped
+
+    def _fan_out(self, call: Callable[[str], T], sites: Optional[Iterable[str]] = None) -> Tuple[Dict[str, T], Dict[str, Exception]]:
+        """Run call(site) for every site concurrently, each bounded by its own timeout."""
+        start = time.monotonic()
+        futures = {name: self._executor.submit(call, name) for name in (self.sites if sites is None else sites)}
+        values: Dict[str, T] = {}
+        errors: Dict[str, Exception] = {}
+        for name, future in futures.items():
+            timeout = self._timeout(name)
+            try:
+                values[name] = future.result(max(0.0, start + timeout - time.monotonic()))
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                errors[name] = TimeoutError(f"{name} did not answer within {timeout} s")
+            except Exception as e:
+                errors[name] = e
+        return values, errors
+
+    # Live
+
+    def machines(self) -> FleetResult[List[LiveMachine]]:
+        """Machines of every site, with qualified names."""
+        values, errors = self._fan_out(lambda name: self.live[name].machines())
+        merged = [replace(m, machine=self.qualify(name, m.machine))
+                  for name, machines in values.items() for m in machines]
+        return FleetResult(merged, errors)
+
+    def tag_values_multiple(self, machines: List[str], tags: List[str]) -> FleetResult[Dict[str, List[Any]]]:
+        """Values of the same tags from qualified machines on any site."""
+        grouped = self._by_site(machines)
+        values, errors = self._fan_out(lambda name: self.live[name].tag_values_multiple(grouped[name], tags), grouped)
+        return FleetResult(self._qualify_keys(values), errors)
+
+    def messages_multiple(self, machines: List[str]) -> FleetResult[Dict[str, List[str]]]:
+        """Messages of qualified machines on any site."""
+        grouped = self._by_site(machines)
+        values, errors = self._fan_out(lambda name: self.live[name].messages_multiple(grouped[name]), grouped)
+        return FleetResult(self._qualify_keys(values), errors)
+
+    def _qualify_keys(self, values: Dict[str, Dict[str, T]]) -> Dict[str, T]:
+        return {self.qualify(name, machine): value
+                for name, by_machine in values.items() for machine, value in by_machine.items()}
+
+    # PE
+
+    def jobs_and_stoppages(self, after: Optional[int] = None, before: Optional[int] = None,
+                           **kwargs: Any) -> FleetResult[List[Union[Job, Stoppage]]]:
+        """Jobs and stoppages of every site, with qualified resources.
+
+        Keyword arguments are passed on to ApiPe.jobs_and_stoppages.
+        """
+        values, errors = self._fan_out(lambda name: self.pe[name].jobs_and_stoppages(after, before, **kwargs))
+        merged = []
+        for name, items in values.items():
+            for item in items:
+                item.resource = self.qualify(name, item.resource)
+                merged.append(item)
+        return FleetResult(merged, errors)
+
+    def daily_job_count(self) -> FleetResult[Dict[str, List[DailyJobCount]]]:
+        """Daily job counts keyed by site."""
+        values, errors = self._fan_out(lambda name: self.pe[name].daily_job_count())
+        return FleetResult(values, errors)
@@ -0,0 +1,310 @@
+import dataclasses
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .decoders import decoder_for
+from .pe import AdaptiveHistory, ApiPe, Command, HistoryTag, id_to_string
+
+# On-disk cache of decoded histories of finished jobs.
+#
+# <directory>/<job hash>/<query hash>/ holds one fetched history: meta.json
+# with the history and tag metadata, times.npy with elapsedTimes and, per
+# tag, <n>.idx.npy with elapsedIndexes and <n>.val.npy with the values when
+# they fit a typed array (string values stay in meta.json). A number tag
+# that mixes ints and floats also gets <n>.int.npy with the positions of the
+# ints, so they load as ints again. The .npy files are memory-mapped on load.
+
+_META = 'meta.json'
+
+def _hash(*parts: str) -> str:
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:32]
+
+def _typed(values: Any) -> Optional[np.ndarray]:
+    """values as a bool/int/float array, or None when they do not fit one."""
+    try:
+        array = np.asarray(values)
+    except (TypeError, ValueError):
+        return None
+    if array.ndim != 1 or array.dtype.kind not in 'biuf':
+        return None
+    return array
+
+def _int_positions(values: Any, typed: np.ndarray) -> Optional[np.ndarray]:
+    """Positions of the Python ints in a list stored as a float array, or None."""
+    if typed.dtype.kind != 'f' or not isinstance(values, list):
+        return None
+    ints = np.flatnonzero(np.fromiter((type(v) is int for v in values), dtype=bool, count=len(values)))
+    return ints if len(ints) else None
+
+def _dir_size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+class HistoryCache:
+    """Size-bounded disk cache of decoded histories, keyed by server, job and tags.
+
+    A history is only stored once its end is at least min_age seconds in the
+    past, so running jobs are always fetched. A request for some tags is
+    answered from any cached history of the same job that has all of them.
+    Least recently used histories are evicted above max_bytes. With
+    as_arrays, loaded histories keep memory-mapped numpy arrays instead of
+    lists.
+    """
+    def __init__(self, directory: str, max_bytes: int = 1024 ** 3, min_age: float = 3600.0,
+                 as_arrays: bool = False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self.as_arrays = as_arrays
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._sizes: Dict[str, Tuple[int, float]] = {}
+        for job in os.scandir(directory):
+            if job.is_dir():
+                for entry in os.scandir(job.path):
+                    if not entry.is_dir():
+                        continue
+                    if os.path.exists(os.path.join(entry.path, _META)):
+                        self._sizes[entry.path] = (_dir_size(entry.path), entry.stat().st_mtime)
+                    else:
+                        # Staging left by a crash, or an entry whose delete did not finish
+                        shutil.rmtree(entry.path, ignore_errors=True)
+        self._bytes = sum(size for size, _ in self._sizes.values())
+
+    def _job_dir(self, server: str, job_id: Any) -> str:
+        return os.path.join(self.directory, _hash(server, id_to_string(job_id)))
+
+    # Lookup
+
+    def get(self, server: str, job_id: Any, tags_filter: Optional[str] = None,
+            tags: Optional[List[str]] = None) -> Optional[AdaptiveHistory]:
+        """Return the cached history for a request, or None."""
+        history = self._lookup(server, job_id, tags_filter, tags)
+        with self._lock:
+            if history is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return history
+
+    def _lookup(self, server: str, job_id: Any, tags_filter: Optional[str],
+                tags: Optional[List[str]]) -> Optional[AdaptiveHistory]:
+        job_dir = self._job_dir(server, job_id)
+        try:
+            entries = [entry.path for entry in os.scandir(job_dir)]
+        except OSError:
+            return None
+        for path in entries:
+            meta = self._read_meta(path)
+            if meta is None or not self._answers(meta, tags_filter, tags):
+                continue
+            try:
+                # Another thread may evict the entry while its files are loaded
+                history = self._load(path, meta, tags)
+                now = time.time()
+                os.utime(os.path.join(path, _META), (now, now))
+            except OSError:
+                return None
+            with self._lock:
+                if path in self._sizes:
+                    self._sizes[path] = (self._sizes[path][0], now)
+            return history
+        return None
+
+    @staticmethod
+    def _read_meta(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(path, _META), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _answers(meta: Dict[str, Any], tags_filter: Optional[str], tags: Optional[List[str]]) -> bool:
+        if tags_filter:
+            # Filters are evaluated by the server, only an identical query matches,
+            # or one for some of the tags fetched with that filter
+            if meta['tags_filter'] != tags_filter:
+                return False
+            if not tags:
+                return 'tags' in meta.get('query', ()) and meta['query']['tags'] is None
+            return set(tags) <= set(meta['tag_names'])
+        if tags:
+            return set(tags) <= set(meta['tag_names'])
+        return meta['all']
+
+    def _load(self, path: str, meta: Dict[str, Any], tags: Optional[List[str]]) -> AdaptiveHistory:
+        positions = {name: n for n, name in enumerate(meta['tag_names'])}
+        wanted = [positions[name] for name in tags] if tags else list(range(len(positions)))
+        times = np.load(os.path.join(path, 'times.npy'), mmap_mode='r')
+        columns = []
+        for n in wanted:
+            info = meta['tags'][n]
+            indexes = np.load(os.path.join(path, f'{n}.idx.npy'), mmap_mode='r')
+            if 'values' in info:
+                values = info['values']
+            else:
+                values = np.load(os.path.join(path, f'{n}.val.npy'), mmap_mode='r')
+            ints = np.load(os.path.join(path, f'{n}.int.npy')) if info.get('ints') else None
+            columns.append((info, indexes, values, ints))
+
+        if len(wanted) != len(positions):
+            # Drop the global steps that only the other tags used
+            used = np.unique(np.concatenate([np.asarray(indexes) for _, indexes, _, _ in columns])
+                             if columns else np.zeros(0, dtype=np.int64))
+            times = times[used]
+            columns = [(info, np.searchsorted(used, indexes), values, ints)
+                       for info, indexes, values, ints in columns]
+
+        convert = (lambda a: a) if self.as_arrays else (lambda a: a.tolist() if isinstance(a, np.ndarray) else a)
+        history_tags = []
+        for info, indexes, values, ints in columns:
+            fields = {k: v for k, v in info.items() if k not in ('values', 'ints')}
+            values = convert(values)
+            if ints is not None and not self.as_arrays:
+                for i in ints.tolist():
+                    values[i] = int(values[i])
+            history_tags.append(HistoryTag(elapsedIndexes=convert(indexes), values=values, **fields))
+        commands = meta['commands']
+        command = decoder_for(Command, ApiPe._config)
+        return AdaptiveHistory(
+            id=meta['id'],
+            start=datetime.fromisoformat(meta['start']),
+            end=datetime.fromisoformat(meta['end']),
+            elapsedTimes=convert(times),
+            tags=history_tags,
+            commands=[command(c) for c in commands] if commands is not None else None,
+        )
+
+    # Storage
+
+    def cacheable(self, history: AdaptiveHistory) -> bool:
+        """Whether the job finished long enough ago for its history to be final."""
+        end = history.end
+        now = datetime.now(end.tzinfo) if end.tzinfo is not None else datetime.now()
+        return end <= now - timedelta(seconds=self.min_age)
+
+    def put(self, server: str, job_id: Any, tags_filter: Optional[str], tags: Optional[List[str]],
+            history: AdaptiveHistory) -> bool:
+        """Store a decoded history. Returns False if the job is not finished yet."""
+        if not self.cacheable(history):
+            return False
+        job_dir = self._job_dir(server, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        path = os.path.join(job_dir, _hash(tags_filter or '', ','.join(sorted(tags or []))))
+        staging = tempfile.mkdtemp(dir=job_dir, prefix='.tmp')
+        try:
+            tag_meta = []
+            np.save(os.path.join(staging, 'times.npy'), np.asarray(history.elapsedTimes, dtype=np.int64))
+            for n, tag in enumerate(history.tags):
+                info = {f.name: getattr(tag, f.name) for f in dataclasses.fields(tag)
+                        if f.name not in ('elapsedIndexes', 'values')}
+                np.save(os.path.join(staging, f'{n}.idx.npy'), np.asarray(tag.elapsedIndexes, dtype=np.int64))
+                values = _typed(tag.values) if len(tag.values) > 0 else None
+                if values is not None:
+                    np.save(os.path.join(staging, f'{n}.val.npy'), values)
+                    ints = _int_positions(tag.values, values)
+                    if ints is not None:
+                        np.save(os.path.join(staging, f'{n}.int.npy'), ints)
+                        info['ints'] = True
+                else:
+                    info['values'] = list(tag.values)
+                tag_meta.append(info)
+            meta = {
+                'server': server,
+                'job_id': id_to_string(job_id),
+                'tags_filter': tags_filter or None,
+                'all': not tags_filter and not tags,
+                'query': {'tags': sorted(tags) if tags else None},
+                'tag_names': [tag.name for tag in history.tags],
+                'id': history.id,
+                'start': history.start.isoformat(),
+                'end': history.end.isoformat(),
+                'commands': ([dataclasses.asdict(c) for c in history.commands]
+                             if history.commands is not None else None),
+                'tags': tag_meta,
+            }
+            with open(os.path.join(staging, _META), 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            size = _dir_size(staging)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        with self._lock:
+            # os.replace does not overwrite a directory, the old entry is removed
+            # first. If it cannot be (its arrays are memory-mapped on Windows) it
+            # holds the same final history and is kept instead.
+            if path in self._sizes and not self._remove(path):
+                shutil.rmtree(staging, ignore_errors=True)
+                self._sizes[path] = (self._sizes[path][0], time.time())
+                return True
+            if path not in self._sizes and os.path.exists(path):
+                shutil.rmtree(path, ignore_errors=True)  # Written by another process
+            try:
+                os.replace(staging, path)
+            except OSError:
+                shutil.rmtree(staging, ignore_errors=True)
+                return False
+            self._bytes += size
+            self._sizes[path] = (size, time.time())
+            self._evict()
+        return True
+
+    def _remove(self, path: str) -> bool:
+        """Delete a cached history, and whether it is gone.
+
+        meta.json goes first so a partly deleted entry is never read. Files
+        that cannot be deleted, such as arrays still memory-mapped on
+        Windows, stay accounted for and are retried by the next eviction.
+        Call with the lock held.
+        """
+        try:
+            os.remove(os.path.join(path, _META))
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return False
+        shutil.rmtree(path, ignore_errors=True)
+        size = self._sizes[path][0]
+        if os.path.exists(path):
+            left = _dir_size(path)
+            self._bytes -= size - left
+            self._sizes[path] = (left, self._sizes[path][1])
+            return False
+        self._bytes -= size
+        del self._sizes[path]
+        return True
+
+    def _evict(self) -> None:
+        if self._bytes <= self.max_bytes:
+            return
+        for path, _ in sorted(self._sizes.items(), key=lambda item: item[1][1]):
+            if self._bytes <= self.max_bytes:
+                break
+            if not self._remove(path):
+                continue
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass  # Other queries of the job are still cached
+
+    def clear(self) -> None:
+        """Remove every cached history, except files that are still in use."""
+        with self._lock:
+            for path in list(self._sizes):
+                self._remove(path)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counts and the size of the cache."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._sizes), 'bytes': self._bytes}
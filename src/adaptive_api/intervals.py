@@ -0,0 +1,201 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .pe import AlarmEvent, DelayEvent, Job, ResourceEvent, ResourceJobEvent, Stoppage
+
+# Interval queries over jobs, stoppages and resource events. Times are the
+# millisecond timestamps of the decoded items and intervals are half-open,
+# [start, end).
+
+HOUR = 3600 * 1000
+DAY = 24 * HOUR
+
+RUNNING = 'running'
+STOPPED = 'stopped'
+ALARM = 'alarm'
+DELAY = 'delay'
+OTHER = 'other'
+
+Interval = Union[Job, Stoppage, ResourceEvent]
+
+def event_category(item: Interval) -> str:
+    """Default category of an item: running, stopped, alarm, delay or other."""
+    if isinstance(item, Stoppage):
+        return STOPPED
+    if isinstance(item, AlarmEvent):
+        return ALARM
+    if isinstance(item, DelayEvent):
+        return DELAY
+    if isinstance(item, (Job, ResourceJobEvent)):
+        return RUNNING
+    return OTHER
+
+@dataclass
+class Utilization:
+    """Time per resource, category and bucket, in milliseconds.
+
+    durations has the shape (len(resources), len(categories), len(bucket_starts)).
+    Overlapping items of one category are only counted once.
+    """
+    resources: List[str]
+    categories: List[str]
+    bucket_starts: np.ndarray
+    bucket_lengths: np.ndarray
+    durations: np.ndarray
+
+    def fractions(self) -> np.ndarray:
+        """durations as a fraction of each bucket's length."""
+        return self.durations / self.bucket_lengths
+
+    def get(self, resource: str, category: str) -> np.ndarray:
+        """Durations of one resource and category per bucket."""
+        return self.durations[self.resources.index(resource), self.categories.index(category)]
+
+class _Resource:
+    """Items of one resource sorted by start, with the running maximum of their ends."""
+    __slots__ = ('items', 'starts', 'ends', 'max_ends', 'categories')
+
+    def __init__(self, items: List[Interval], starts: List[int], ends: List[int], categories: List[int]):
+        order = np.argsort(np.asarray(starts, dtype=np.int64), kind='stable')
+        self.items = [items[i] for i in order]
+        self.starts = np.asarray(starts, dtype=np.int64)[order]
+        self.ends = np.asarray(ends, dtype=np.int64)[order]
+        self.categories = np.asarray(categories, dtype=np.int64)[order]
+        # Non-decreasing, so the first item that can reach past a time is a binary search away
+        self.max_ends = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+    def overlapping(self, after: int, before: int) -> np.ndarray:
+        """Positions of the items with start < before and end > after."""
+        first = np.searchsorted(self.max_ends, after, side='right')
+        last = np.searchsorted(self.starts, before, side='left')
+        if first >= last:
+            return np.zeros(0, dtype=np.int64)
+        return first + np.flatnonzero(self.ends[first:last] > after)
+
+class IntervalIndex:
+    """Per-resource index of jobs, stoppages and resource events.
+
+    Build it once from the results of jobs_and_stoppages, resource_events or
+    the iter_* methods, then answer point, range and utilization queries
+    with binary searches instead of scanning every item. Items without a
+    start or end are skipped. category maps an item to the name it is
+    counted under by utilization, event_category by default.
+    """
+    def __init__(self, items: Iterable[Interval],
+                 category: Callable[[Interval], str] = event_category):
+        grouped: Dict[str, Tuple[List[Interval], List[int], List[int], List[int]]] = {}
+        codes: Dict[str, int] = {}
+        for item in items:
+            start = getattr(item, 'start', None)
+            end = getattr(item, 'end', None)
+            if start is None or end is None:
+                continue
+            group = grouped.get(item.resource)
+            if group is None:
+                group = grouped[item.resource] = ([], [], [], [])
+            name = category(item)
+            code = codes.get(name)
+            if code is None:
+                code = codes[name] = len(codes)
+            group[0].append(item)
+            group[1].append(start)
+            group[2].append(end)
+            group[3].append(code)
+        self.categories = list(codes)
+        self._resources = {resource: _Resource(*group) for resource, group in grouped.items()}
+
+    @property
+    def resources(self) -> List[str]:
+        return sorted(self._resources)
+
+    def __len__(self) -> int:
+        return sum(len(r.items) for r in self._resources.values())
+
+    def _selected(self, resource: Optional[str]) -> Dict[str, _Resource]:
+        if resource is None:
+            return self._resources
+        r = self._resources.get(resource)
+        return {resource: r} if r is not None else {}
+
+    # Queries
+
+    def at(self, time: int, resource: Optional[str] = None) -> List[Interval]:
+        """Items in progress at time, start <= time < end."""
+        return [r.items[i] for r in self._selected(resource).values()
+                for i in r.overlapping(time, time + 1)]
+
+    def overlapping(self, after: int, before: int, resource: Optional[str] = None) -> List[Interval]:
+        """Items overlapping [after, before), in start order per resource."""
+        return [r.items[i] for r in self._selected(resource).values()
+                for i in r.overlapping(after, before)]
+
+    def clipped(self, after: int, before: int,
+                resource: Optional[str] = None) -> List[Tuple[Interval, int, int]]:
+        """Items overlapping [after, before) with their start and end clipped to it."""
+        result = []
+        for r in self._selected(resource).values():
+            positions = r.overlapping(after, before)
+            starts = np.maximum(r.starts[positions], after).tolist()
+            ends = np.minimum(r.ends[positions], before).tolist()
+            result.extend(zip([r.items[i] for i in positions], starts, ends))
+        return result
+
+    def by_resource(self, after: int, before: int) -> Dict[str, List[Interval]]:
+        """overlapping, grouped by resource."""
+        result = {}
+        for resource, r in self._resources.items():
+            positions = r.overlapping(after, before)
+            if len(positions):
+                result[resource] = [r.items[i] for i in positions]
+        return result
+
+    def utilization(self, after: int, before: int, bucket: int = HOUR,
+                    resources: Optional[List[str]] = None) -> Utilization:
+        """Time per resource and category in buckets of bucket ms from after to before.
+
+        The last bucket is shorter when the range is not a multiple of bucket.
+        """
+        if resources is None:
+            resources = self.resources
+        edges = np.arange(after, before, bucket, dtype=np.int64)
+        edges = np.append(edges, np.int64(before))
+        durations = np.zeros((len(resources), len(self.categories), len(edges) - 1), dtype=np.int64)
+        for n, resource in enumerate(resources):
+            r = self._resources.get(resource)
+            if r is None:
+                continue
+            positions = r.overlapping(after, before)
+            starts = np.maximum(r.starts[positions], after)
+            ends = np.minimum(r.ends[positions], before)
+            categories = r.categories[positions]
+            for code in np.unique(categories):
+                chosen = categories == code
+                merged_starts, merged_ends = _merge(starts[chosen], ends[chosen])
+                durations[n, code] = np.diff(_covered(merged_starts, merged_ends, edges))
+        return Utilization(list(resources), list(self.categories), edges[:-1], np.diff(edges), durations)
+
+def _merge(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Union of intervals sorted by start, as disjoint sorted intervals."""
+    if len(starts) == 0:
+        return starts, ends
+    max_ends = np.maximum.accumulate(ends)
+    new = np.empty(len(starts), dtype=bool)
+    new[0] = True
+    new[1:] = starts[1:] > max_ends[:-1]
+    heads = np.flatnonzero(new)
+    return starts[heads], np.maximum.reduceat(ends, heads)
+
+def _covered(starts: np.ndarray, ends: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """Total length of disjoint sorted intervals before each of times."""
+    if len(starts) == 0:
+        return np.zeros(len(times), dtype=np.int64)
+    lengths = ends - starts
+    before = np.concatenate(([0], np.cumsum(lengths)))
+    # Index of the last interval starting at or before each time
+    k = np.searchsorted(starts, times, side='right') - 1
+    inside = k >= 0
+    last = np.maximum(k, 0)
+    partial = np.clip(times - starts[last], 0, lengths[last])
+    return np.where(inside, before[last] + partial, 0)
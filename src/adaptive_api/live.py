@@ -3,9 +3,12 @@ from typing import List, Dict, Any, Optional, TypedDict
 from enum import Enum
 from datetime import datetime
 from dataclasses import dataclass, field
-from dacite import from_dict
 
 from .base import BaseApi
+from .cache import ResponseCache
+from .metrics import MetricsSink
+from .decoders import decoder_for, with_slots
+from .transport import Transport
 
 # Enums
 class Running(Enum):
@@ -43,6 +46,7 @@ class TimelineItem:
     resource: str
     id: str
 
+@with_slots
 @dataclass
 class Job:
     id: str
@@ -55,6 +59,7 @@ class Job:
     parameters: Optional[List[Dict[str, str]]] = None  # [{command: str}]
     profile: Optional[Dict[str, Any]] = None  # ValueProfile
 
+@with_slots
 @dataclass
 class ScheduledJob:
     id: str
@@ -120,6 +125,7 @@ class GroupNumberAndName:
     number: str
     name: str
 
+@with_slots
 @dataclass
 class Tag:
     name: str
@@ -138,13 +144,14 @@ LiveMachines = List[LiveMachine]
 DashboardEntries = List[DashboardEntry]
 
 class ApiLive(BaseApi):
-    def __init__(self, server: str, token: str):
-        super().__init__(server, token, "live")
+    def __init__(self, server: str, token: str, cache: Optional[ResponseCache] = None,
+                 transport: Optional[Transport] = None, metrics: Optional[MetricsSink] = None):
+        super().__init__(server, token, "live", cache, transport, metrics)
 
     def machines(self, machines: Optional[List[str]] = None) -> LiveMachines:
         """Fetch a list of machines. If 'machines' is provided, fetch only those."""
         data = self._fetch("machines", {"m": machines} if machines else None)
-        return [from_dict(LiveMachine, item) for item in data]
+        return _decode_list(LiveMachine, data)
 
     def tag_values_multiple(self, machines: List[str], tags: List[str]) -> Dict[str, List[Any]]:
         """Fetch values for the same tags from multiple machines."""
@@ -157,8 +164,7 @@ class ApiLive(BaseApi):
 
     def tags_multiple(self, machines: List[str]) -> Dict[str, List[Tag]]:
         """Fetch tags for multiple machines."""
-        data = self._fetch("tags", {"m": machines})
-        return {machine: [from_dict(Tag, tag) for tag in tags] for machine, tags in data.items()}
+        return self._fetch_cached("tags", {"m": machines}, lambda data: _decode_by_machine(Tag, data))
 
     def tags(self, machine: str) -> List[Tag]:
         """Fetch tags for a single machine."""
@@ -167,8 +173,7 @@ class ApiLive(BaseApi):
 
     def commands_multiple(self, machines: List[str]) -> Dict[str, List[Command]]:
         """Fetch commands for multiple machines."""
-        data = self._fetch("commands", {"m": machines})
-        return {machine: [from_dict(Command, cmd) for cmd in commands] for machine, commands in data.items()}
+        return self._fetch_cached("commands", {"m": machines}, lambda data: _decode_by_machine(Command, data))
 
     def commands(self, machine: str) -> List[Command]:
         """Fetch commands for a single machine."""
@@ -177,29 +182,25 @@ class ApiLive(BaseApi):
 
     def dashboard_entries(self) -> DashboardEntries:
         """Fetch dashboard entries."""
-        data = self._fetch("dashboardEntries")
-        return [from_dict(DashboardEntry, item) for item in data]
+        return self._fetch_cached("dashboardEntries", None, lambda data: _decode_list(DashboardEntry, data))
 
     def dashboard(self, name: str) -> Optional[bytes]:
         """Fetch a dashboard by name, returns binary data or None if not found."""
-        url = self._url("dashboard")
-        response = self.session.get(url, params={"name": name}, timeout=10)
+        response = self._get("dashboard", {"name": name})
         if response.status_code == 200:
             return response.content
         return None
 
     def scene(self, name: str) -> Optional[bytes]:
         """Fetch a scene by name, returns binary data or None if not found."""
-        url = self._url("scene")
-        response = self.session.get(url, params={"name": name}, timeout=10)
+        response = self._get("scene", {"name": name})
         if response.status_code == 200:
             return response.content
         return None
 
     def screen_buttons_multiple(self, machines: List[str]) -> Dict[str, List[ScreenButton]]:
         """Fetch screen buttons for multiple machines."""
-        data = self._fetch("screenButtons", {"m": machines})
-        return {machine: [from_dict(ScreenButton, btn) for btn in buttons] for machine, buttons in data.items()}
+        return self._fetch_cached("screenButtons", {"m": machines}, lambda data: _decode_by_machine(ScreenButton, data))
 
     def screen_buttons(self, machine: str) -> List[ScreenButton]:
         """Fetch screen buttons for a single machine."""
@@ -208,20 +209,8 @@ class ApiLive(BaseApi):
 
     def program_groups_multiple(self, machines: List[str], group: Optional[str] = None, only_step_counts: bool = False) -> Dict[str, List[ProgramGroup]]:
         """Fetch program groups for multiple machines."""
-        query = {"m": machines}
-        if group is not None:
-            query["group"] = group
-        if only_step_counts:
-            query["onlyStepCounts"] = "true"
-        data = self._fetch("programs", query)
-        
-        result = {}
-        for machine, groups in data.items():
-            result[machine] = []
-            for group_data in groups:
-                programs = [from_dict(Program, prog) for prog in group_data.get('programs', [])]
-                result[machine].append(ProgramGroup(group=group_data['group'], programs=programs))
-        return result
+        query = _program_groups_query(machines, group, only_step_counts)
+        return self._fetch_cached("programs", query, _decode_program_groups)
 
     def program_groups(self, machine: str, group: Optional[str] = None, only_step_counts: bool = False) -> List[ProgramGroup]:
         """Fetch program groups for a single machine."""
@@ -231,7 +220,7 @@ class ApiLive(BaseApi):
     def jobs_multiple(self, machines: List[str]) -> Dict[str, List[ScheduledJob]]:
         """Fetch scheduled jobs for multiple machines."""
         data = self._fetch("jobs", {"m": machines})
-        return {machine: [from_dict(ScheduledJob, job) for job in jobs] for machine, jobs in data.items()}
+        return _decode_by_machine(ScheduledJob, data)
 
     def jobs(self, machine: str) -> List[ScheduledJob]:
         """Fetch scheduled jobs for a single machine."""
@@ -250,25 +239,11 @@ class ApiLive(BaseApi):
     def profiles(self, machines: List[str]) -> Dict[str, Optional[RunningProfile]]:
         """Fetch running profiles for multiple machines."""
         data = self._fetch("profiles", {"m": machines})
-        result = {}
-        for machine, profile_data in data.items():
-            if profile_data:
-                sample_steps = [from_dict(SampleStep, step) for step in profile_data.get('sampleSteps', [])]
-                result[machine] = RunningProfile(
-                    currentStep=profile_data['currentStep'],
-                    changingStep=profile_data['changingStep'],
-                    sampleSteps=sample_steps
-                )
-            else:
-                result[machine] = None
-        return result
+        return _decode_profiles(data)
 
     def screen_multiple(self, machines: List[str], page: Optional[int] = None) -> Dict[str, List[str]]:
         """Fetch screen data for multiple machines."""
-        query = {"m": machines}
-        if page is not None:
-            query["page"] = page
-        return self._fetch("screen", query)
+        return self._fetch("screen", _screen_query(machines, page))
 
     def screen(self, machine: str, page: Optional[int] = None) -> List[str]:
         """Fetch screen data for a single machine."""
@@ -314,4 +289,51 @@ class ApiLive(BaseApi):
 
     def set_mode(self, machine: str, mode: Mode) -> Any:
         """Set the mode for a machine. Can be fetched in Parent.Mode."""
-        return self._post('setMode', {'m': machine, 'mode': mode.value})
\ No newline at end of file
+        return self._post('setMode', {'m': machine, 'mode': mode.value})
+
+# Query building and decoding shared by ApiLive and AsyncApiLive
+
+def _decode_list(data_class: type, data: List[Dict[str, Any]]) -> List[Any]:
+    decoder = decoder_for(data_class)
+    return [decoder(item) for item in data]
+
+def _decode_by_machine(data_class: type, data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Any]]:
+    decoder = decoder_for(data_class)
+    return {machine: [decoder(item) for item in items] for machine, items in data.items()}
+
+def _program_groups_query(machines: List[str], group: Optional[str], only_step_counts: bool) -> Dict[str, Any]:
+    query = {"m": machines}
+    if group is not None:
+        query["group"] = group
+    if only_step_counts:
+        query["onlyStepCounts"] = "true"
+    return query
+
+def _decode_program_groups(data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[ProgramGroup]]:
+    result = {}
+    for machine, groups in data.items():
+        result[machine] = []
+        for group_data in groups:
+            programs = _decode_list(Program, group_data.get('programs', []))
+            result[machine].append(ProgramGroup(group=group_data['group'], programs=programs))
+    return result
+
+def _decode_profiles(data: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, Optional[RunningProfile]]:
+    result = {}
+    for machine, profile_data in data.items():
+        if profile_data:
+            sample_steps = _decode_list(SampleStep, profile_data.get('sampleSteps', []))
+            result[machine] = RunningProfile(
+                currentStep=profile_data['currentStep'],
+                changingStep=profile_data['changingStep'],
+                sampleSteps=sample_steps
+            )
+        else:
+            result[machine] = None
+    return result
+
+def _screen_query(machines: List[str], page: Optional[int]) -> Dict[str, Any]:
+    query = {"m": machines}
+    if page is not None:
+        query["page"] = page
+    return query
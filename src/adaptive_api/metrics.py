@@ -0,0 +1,146 @@
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Latency buckets in seconds, roughly doubling from 1 ms to 60 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class MetricsSink:
+    """Receives request and pipeline stage measurements. The base class ignores them."""
+
+    def record_request(self, endpoint: str, method: str, status: Optional[int],
+                       latency: float, size: int, retries: int) -> None:
+        """A request finished. status is None when no response was received."""
+
+    def record_stage(self, pipeline: str, stage: str, seconds: float) -> None:
+        """A stage of a processing pipeline, such as history decoding, finished."""
+
+class StageTimer:
+    """Times consecutive stages of a pipeline into a sink.
+
+        timer = StageTimer(sink, 'history')
+        with timer('fetch'):
+            ...
+    """
+    def __init__(self, sink: MetricsSink, pipeline: str):
+        self.sink = sink
+        self.pipeline = pipeline
+        self._stage = ''
+        self._start = 0.0
+
+    def __call__(self, stage: str) -> 'StageTimer':
+        self._stage = stage
+        return self
+
+    def __enter__(self) -> 'StageTimer':
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.sink.record_stage(self.pipeline, self._stage, time.perf_counter() - self._start)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket that contains it."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+class HistogramCollector(MetricsSink):
+    """Thread-safe in-memory collector of latency histograms and counters."""
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.requests: Dict[Tuple[str, str], Histogram] = {}
+        self.statuses: Dict[Tuple[str, str, str], int] = {}
+        self.bytes: Dict[Tuple[str, str], int] = {}
+        self.retries: Dict[Tuple[str, str], int] = {}
+        self.stages: Dict[Tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record_request(self, endpoint: str, method: str, status: Optional[int],
+                       latency: float, size: int, retries: int) -> None:
+        key = (endpoint, method)
+        status_key = (endpoint, method, str(status) if status is not None else 'error')
+        with self._lock:
+            histogram = self.requests.get(key)
+            if histogram is None:
+                histogram = self.requests[key] = Histogram(self.buckets)
+            histogram.observe(latency)
+            self.statuses[status_key] = self.statuses.get(status_key, 0) + 1
+            self.bytes[key] = self.bytes.get(key, 0) + size
+            self.retries[key] = self.retries.get(key, 0) + retries
+
+    def record_stage(self, pipeline: str, stage: str, seconds: float) -> None:
+        key = (pipeline, stage)
+        with self._lock:
+            histogram = self.stages.get(key)
+            if histogram is None:
+                histogram = self.stages[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def to_prometheus(self, prefix: str = 'adaptive_api') -> str:
+        """Render everything in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            _histograms(lines, f'{prefix}_request_duration_seconds', 'Request latency including retries.',
+                        ('endpoint', 'method'), self.requests)
+            _counters(lines, f'{prefix}_requests_total', 'Requests by response status.',
+                      ('endpoint', 'method', 'status'), self.statuses)
+            _counters(lines, f'{prefix}_response_bytes_total', 'Response body bytes received.',
+                      ('endpoint', 'method'), self.bytes)
+            _counters(lines, f'{prefix}_retries_total', 'Retried request attempts.',
+                      ('endpoint', 'method'), self.retries)
+            _histograms(lines, f'{prefix}_stage_duration_seconds', 'Duration of pipeline stages.',
+                        ('pipeline', 'stage'), self.stages)
+        return '\n'.join(lines) + '\n'
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}'
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _counters(lines: List[str], name: str, help_text: str, label_names: Tuple[str, ...],
+              values: Dict[Tuple[str, ...], int]) -> None:
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} counter')
+    for key, value in sorted(values.items()):
+        lines.append(f'{name}{_labels(label_names, key)} {value}')
+
+def _histograms(lines: List[str], name: str, help_text: str, label_names: Tuple[str, ...],
+                histograms: Dict[Tuple[str, ...], Histogram]) -> None:
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for key, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, n in zip(histogram.buckets, histogram.counts):
+            cumulative += n
+            le = 'le="%s"' % bound
+            lines.append(f'{name}_bucket{_labels(label_names, key, le)} {cumulative}')
+        le = 'le="+Inf"'
+        lines.append(f'{name}_bucket{_labels(label_names, key, le)} {histogram.count}')
+        lines.append(f'{name}_sum{_labels(label_names, key)} {histogram.sum}')
+        lines.append(f'{name}_count{_labels(label_names, key)} {histogram.count}')
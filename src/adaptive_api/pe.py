@@ -1,15 +1,36 @@
-from typing import List, Dict, Any, Optional, Union, Callable, Tuple
-from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Union, Callable, Tuple, Iterable, Iterator, Sequence, IO, TYPE_CHECKING
+from dataclasses import MISSING, dataclass, field, fields
+from array import array
 from datetime import datetime, timedelta
-import json
 import csv
+import collections.abc
+import gzip
+import heapq
+import io
+import itertools
+import math
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from io import StringIO
 from enum import Enum
-from dacite import from_dict, Config
+from dacite import Config
 
 import requests
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, decoding falls back to plain Python
+    np = None
+
 from .base import BaseApi
+from .cache import ResponseCache
+from .metrics import MetricsSink, StageTimer
+from .decoders import decode, decoder_for, with_slots
+from .transport import Transport
+
+if TYPE_CHECKING:
+    from .history_cache import HistoryCache
 
 def to_key_string(key: List[Any]) -> str:
     """Convert a key array to a string representation."""
@@ -136,6 +157,7 @@ class DailyJobCount:
     day: int
     count: int
 
+@with_slots
 @dataclass
 class InBoxJob:
     """Inbox job data structure."""
@@ -148,6 +170,7 @@ class InBoxJob:
     standardTime: Optional[int] = None
     props: Optional[Dict[str, Any]] = None
 
+@with_slots
 @dataclass
 class Job(InBoxJob):
     """Job data structure extending InBoxJob."""
@@ -166,6 +189,7 @@ class InBoxGroupAndJobs:
     resources: List[str]
     jobs: Optional[List[InBoxJob]] = None
 
+@with_slots
 @dataclass
 class ResourceEvent:
     """Base resource event data."""
@@ -173,6 +197,7 @@ class ResourceEvent:
     end: int
     resource: str
 
+@with_slots
 @dataclass
 class Stoppage(ResourceEvent):
     """Stoppage event data."""
@@ -184,16 +209,19 @@ def is_stoppage(value: Union[Job, Stoppage]) -> bool:
     """Check if a value is a Stoppage."""
     return hasattr(value, 'stoppage')
 
+@with_slots
 @dataclass
 class ResourceJobEvent(ResourceEvent):
     """Resource job event data."""
     job: str
 
+@with_slots
 @dataclass
 class AlarmEvent(ResourceEvent):
     """Alarm event data."""
     alarm: str
 
+@with_slots
 @dataclass
 class DelayEvent(ResourceEvent):
     """Delay event data."""
@@ -202,6 +230,55 @@ class DelayEvent(ResourceEvent):
 SearchResult = Union[Job, InBoxJob]
 
 
+class BooleanValues(collections.abc.Sequence):
+    """Values of a boolean history tag stored as the initial value only.
+
+    The value flips at every elapsed index of the tag, so value i is
+    initial xor (i is odd). Reads like the list of bools it replaces.
+    """
+    __slots__ = ('initial', 'length')
+
+    def __init__(self, initial: bool, length: int):
+        self.initial = initial
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [self.initial ^ bool(i & 1) for i in range(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('BooleanValues index out of range')
+        return self.initial ^ bool(index & 1)
+
+    def __iter__(self) -> Iterator[bool]:
+        value = self.initial
+        for _ in range(self.length):
+            yield value
+            value = not value
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, BooleanValues):
+            return (self.length == other.length
+                    and (self.length == 0 or self.initial == other.initial))
+        if isinstance(other, collections.abc.Sequence):
+            return len(other) == self.length and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'BooleanValues(initial={self.initial}, length={self.length})'
+
+    def __array__(self, dtype: Any = None, copy: Any = None) -> Any:
+        values = (np.arange(self.length) & 1).astype(bool) ^ self.initial
+        return values if dtype is None else values.astype(dtype)
+
+    def tolist(self) -> List[bool]:
+        return list(self)
+
+@with_slots
 @dataclass
 class AdaptiveHistory:
     """Adaptive history data structure."""
@@ -212,6 +289,7 @@ class AdaptiveHistory:
     tags: List['HistoryTag']
     commands: Optional[List[Command]] = None
 
+@with_slots
 @dataclass
 class Tag:
     """Tag data structure."""
@@ -225,16 +303,116 @@ class Tag:
     trace: Optional[Dict[str, Any]] = None
     format: Optional[str] = None
 
+@with_slots
 @dataclass
 class HistoryTag(Tag):
     """History tag that extends Tag."""
     elapsedIndexes: List[int] = field(default_factory=list)
     values: List[Any] = field(default_factory=list)
 
+# Slot descriptors of the decoded fields, written by the lazy subclasses below
+_HISTORY_TIMES = AdaptiveHistory.elapsedTimes
+_TAG_INDEXES = HistoryTag.elapsedIndexes
+_TAG_VALUES = HistoryTag.values
+
+class LazyHistoryTag(HistoryTag):
+    """HistoryTag that keeps its wire arrays until elapsedIndexes or values is read."""
+    __slots__ = ('_wire', '_compact')
+
+    def __init__(self, tag: Tag, wire: Dict[str, Any], compact: bool = False):
+        for f in fields(Tag):
+            setattr(self, f.name, getattr(tag, f.name))
+        self._wire = wire
+        self._compact = compact
+
+    def _decode(self) -> None:
+        wire = self._wire
+        if wire is None:
+            return
+        # Decode copies so concurrent first reads cannot see half-fixed lists
+        tag = HistoryTag(self.name, self.type, elapsedIndexes=list(wire.get('elapsedIndexes') or ()),
+                         values=list(wire.get('values') or ()))
+        _fix_tag(tag, compact=self._compact)
+        _TAG_INDEXES.__set__(self, tag.elapsedIndexes)
+        _TAG_VALUES.__set__(self, tag.values)
+        self._wire = None
+
+    @property
+    def decoded(self) -> bool:
+        return self._wire is None
+
+    @property
+    def elapsedIndexes(self) -> List[int]:
+        self._decode()
+        return _TAG_INDEXES.__get__(self)
+
+    @elapsedIndexes.setter
+    def elapsedIndexes(self, value: List[int]) -> None:
+        self._decode()
+        _TAG_INDEXES.__set__(self, value)
+
+    @property
+    def values(self) -> List[Any]:
+        self._decode()
+        return _TAG_VALUES.__get__(self)
+
+    @values.setter
+    def values(self, value: List[Any]) -> None:
+        self._decode()
+        _TAG_VALUES.__set__(self, value)
+
+class LazyAdaptiveHistory(AdaptiveHistory):
+    """AdaptiveHistory of LazyHistoryTag that decodes elapsedTimes when first read."""
+    __slots__ = ('_wire_times', '_compact')
+
+    def __init__(self, id: str, start: datetime, end: datetime, wire_times: List[int],
+                 tags: List[LazyHistoryTag], commands: Optional[List[Command]] = None,
+                 compact: bool = False):
+        self.id = id
+        self.start = start
+        self.end = end
+        self.tags = tags
+        self.commands = commands
+        self._wire_times = wire_times
+        self._compact = compact
+
+    @property
+    def elapsedTimes(self) -> List[int]:
+        wire_times = self._wire_times
+        if wire_times is not None:
+            _HISTORY_TIMES.__set__(self, _fix_elapsed_times(list(wire_times), compact=self._compact))
+            self._wire_times = None
+        return _HISTORY_TIMES.__get__(self)
+
+    @elapsedTimes.setter
+    def elapsedTimes(self, value: List[int]) -> None:
+        _HISTORY_TIMES.__set__(self, value)
+        self._wire_times = None
+
+@dataclass
+class HistoryResult:
+    """Outcome of one job in ApiPe.history_many."""
+    job_id: Any
+    history: Optional[AdaptiveHistory] = None
+    error: Optional[Exception] = None
+
+
+# Default window of the chunked iter_* methods, one week in milliseconds
+DEFAULT_WINDOW = 7 * 24 * 3600 * 1000
 
 class ApiPe(BaseApi):
-    def __init__(self, server: str, token: str):
-        super().__init__(server, token, "pe")
+    def __init__(self, server: str, token: str, cache: Optional[ResponseCache] = None,
+                 transport: Optional[Transport] = None, metrics: Optional[MetricsSink] = None,
+                 history_cache: Optional['HistoryCache'] = None, compact_history: bool = False,
+                 lazy_history: bool = False, stream_history: bool = False):
+        if lazy_history and stream_history:
+            # A streamed history is decoded while it downloads, there are no wire arrays to keep
+            raise ValueError("lazy_history and stream_history cannot be combined")
+        super().__init__(server, token, "pe", cache, transport, metrics)
+        self.history_cache = history_cache
+        self.compact_history = compact_history
+        self.lazy_history = lazy_history
+        self.stream_history = stream_history
     """Client for Adaptive PE API."""
     _config = Config(type_hooks={
         datetime: lambda v: datetime.fromisoformat(v.replace('Z', '+00:00')) if isinstance(v, str) else v
@@ -243,13 +421,7 @@ class ApiPe(BaseApi):
     
     def _fix_date(self, value: Any) -> Any:
         """Convert date strings to timestamps."""
-        if isinstance(value, str):
-            try:
-                dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                return int(dt.timestamp() * 1000)
-            except ValueError:
-                return value
-        return value
+        return _fix_date(value)
     
     # API Methods
     
@@ -261,260 +433,687 @@ class ApiPe(BaseApi):
                                   number: Optional[Union[str, List[str]]] = None,
                                   only_step_counts: bool = False) -> List[ProgramGroup]:
         """Fetch program groups."""
-        params = {}
-        if group is not None:
-            params['group'] = group
-        if number is not None:
-            params['number'] = number
-        if only_step_counts:
-            params['onlyStepCounts'] = True
-        
-        data = self._fetch('programGroups', params)
-        return [from_dict(ProgramGroup, item, self._config) for item in data]
+        data = self._fetch('programGroups', _program_groups_params(group, number, only_step_counts))
+        return _decode_list(ProgramGroup, data)
     
     def history(self, job_id: Any, tags_filter: Optional[str] = None, tags: Optional[List[str]] = None) -> Optional[AdaptiveHistory]:
-        """Fetch history for given ID."""
-        params = {'id': id_to_string(job_id)}
-        if tags_filter:
-            params['tagsFilter'] = tags_filter
-        if tags:
-            params['tags'] = ','.join(tags)
-        
-        response_json = self._fetch('history', params)
+        """Fetch history for given ID.
+
+        With a history_cache, finished jobs are answered from disk when a
+        cached history has the requested tags.
+        """
+        if self.history_cache is None:
+            return self._history(job_id, tags_filter, tags)
+        history = self.history_cache.get(self.server, job_id, tags_filter, tags)
+        if history is None:
+            history = self._history(job_id, tags_filter, tags)
+            if history is not None:
+                self.history_cache.put(self.server, job_id, tags_filter, tags, history)
+        return history
+
+    def _history(self, job_id: Any, tags_filter: Optional[str], tags: Optional[List[str]]) -> Optional[AdaptiveHistory]:
+        params = _history_params(job_id, tags_filter, tags)
+        if self.stream_history:
+            return self._history_streamed(params)
+        if self.metrics is None:
+            return _decode_history(self._fetch('history', params), self.compact_history, self.lazy_history)
+
+        timer = StageTimer(self.metrics, 'history')
+        with timer('fetch'):
+            response = self._get('history', params)
+            response.raise_for_status()
+        with timer('json'):
+            response_json = response.json()
         if not response_json:
             return None
-        history = from_dict(AdaptiveHistory, response_json, self._config)        
-        _fix_history(history)
+        if self.lazy_history:
+            with timer('decode'):
+                return _decode_history_lazy(response_json, self.compact_history)
+        with timer('decode'):
+            history = decode(AdaptiveHistory, response_json, ApiPe._config)
+        with timer('fix'):
+            _fix_history(history, compact=self.compact_history)
         return history
 
+    def _history_streamed(self, params: Dict[str, Any]) -> Optional[AdaptiveHistory]:
+        from .streaming import read_history
+
+        if self.metrics is None:
+            with self._get('history', params, stream=True) as response:
+                response.raise_for_status()
+                return read_history(response, self.compact_history)
+
+        timer = StageTimer(self.metrics, 'history')
+        with timer('fetch'):
+            response = self._get('history', params, stream=True)
+        with response:
+            response.raise_for_status()
+            with timer('stream'):
+                return read_history(response, self.compact_history)
+
+    def history_many(self, job_ids: Iterable[Any], tags_filter: Optional[str] = None,
+                     tags: Optional[List[str]] = None, max_workers: int = 8,
+                     ordered: bool = False) -> Iterator[HistoryResult]:
+        """Fetch and decode histories for many IDs on a thread pool.
+
+        Yields a HistoryResult per ID as soon as it completes, or in input
+        order when ordered is set. A failed ID is reported in its result's
+        error instead of stopping the batch. At most 2 * max_workers results
+        are held in memory at a time.
+        """
+        def fetch(job_id: Any) -> HistoryResult:
+            try:
+                return HistoryResult(job_id, self.history(job_id, tags_filter, tags))
+            except Exception as e:
+                return HistoryResult(job_id, error=e)
+
+        ids = iter(job_ids)
+        window = max(1, max_workers) * 2
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        pending = deque()
+        try:
+            for job_id in itertools.islice(ids, window):
+                pending.append(executor.submit(fetch, job_id))
+            while pending:
+                if ordered:
+                    done = [pending.popleft()]
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+                for future in done:
+                    for job_id in itertools.islice(ids, 1):
+                        pending.append(executor.submit(fetch, job_id))
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
 
     def reschedule_groups(self) -> List[RescheduleGroup]:
         """Fetch reschedule groups."""
         data = self._fetch('rescheduleGroups')
-        return [from_dict(RescheduleGroup, item, self._config) for item in data]
+        return _decode_list(RescheduleGroup, data)
     
     def jobs_and_stoppages(self, after: Optional[int] = None, before: Optional[int] = None,
                            starts_in_range: bool = False, no_jobs: bool = False,
                            no_stoppages: bool = False, job_props: Optional[List[str]] = None) -> List[Union[Job, Stoppage]]:
         """Fetch jobs and stoppages."""
-        params = {}
-        if after is not None:
-            params['after'] = datetime.fromtimestamp(after / 1000).isoformat()
-        if before is not None:
-            params['before'] = datetime.fromtimestamp(before / 1000).isoformat()
-        if starts_in_range:
-            params['startsInRange'] = True
-        if no_jobs:
-            params['noJobs'] = True
-        if no_stoppages:
-            params['noStoppages'] = True
-        if job_props:
-            params['jobProps'] = job_props
-        
+        params = _jobs_params(after, before, starts_in_range, no_jobs, no_stoppages, job_props)
         data = self._fetch('jobs', params)
-        
-        # Convert dates to numbers
-        for item in data:
-            item['start'] = self._fix_date(item['start'])
-            item['end'] = self._fix_date(item['end'])
-        
-        # Convert to appropriate objects
-        result = []
-        for item in data:
-            if 'stoppage' in item:
-                result.append(from_dict(Stoppage, item, self._config))
-            else:
-                result.append(from_dict(Job, item, self._config))
-        
-        return result
+        return _decode_jobs_and_stoppages(data)
     
     def resource_events(self, alarms: bool = False, delays: bool = False,
                         stoppages: bool = False, after: Optional[int] = None,
                         before: Optional[int] = None) -> List[ResourceEvent]:
         """Fetch resource events."""
-        params = {}
-        if alarms:
-            params['alarms'] = True
-        if delays:
-            params['delays'] = True
-        if stoppages:
-            params['stoppages'] = True
-        if after is not None:
-            params['after'] = datetime.fromtimestamp(after / 1000).isoformat()
-        if before is not None:
-            params['before'] = datetime.fromtimestamp(before / 1000).isoformat()
-        
+        params = _resource_events_params(alarms, delays, stoppages, after, before)
         data = self._fetch('resourceEvents', params)
-        
-        # Convert dates to numbers
-        for item in data:
-            item['start'] = self._fix_date(item['start'])
-            item['end'] = self._fix_date(item['end'])
-        
-        return [from_dict(ResourceEvent, item, self._config) for item in data]
+        return _decode_resource_events(data)
+
+    def iter_jobs_and_stoppages(self, after: int, before: int, window: int = DEFAULT_WINDOW,
+                                max_workers: int = 4, starts_in_range: bool = False,
+                                no_jobs: bool = False, no_stoppages: bool = False,
+                                job_props: Optional[List[str]] = None) -> Iterator[Union[Job, Stoppage]]:
+        """Fetch jobs and stoppages in windows of window ms, concurrently.
+
+        Items are yielded lazily in start time order. Items that span window
+        boundaries are only yielded once, de-duplicated by id.
+        """
+        def fetch(span: Tuple[int, int]) -> List[Union[Job, Stoppage]]:
+            params = _jobs_params(span[0], span[1], starts_in_range, no_jobs, no_stoppages, job_props)
+            return _decode_jobs_and_stoppages(self._fetch('jobs', params))
+
+        def key(item: Union[Job, Stoppage]) -> Any:
+            return (is_stoppage(item), id_to_string(item.id))
+
+        return _iter_windows(fetch, key, after, before, window, max_workers)
+
+    def iter_resource_events(self, after: int, before: int, window: int = DEFAULT_WINDOW,
+                             max_workers: int = 4, alarms: bool = False, delays: bool = False,
+                             stoppages: bool = False) -> Iterator[ResourceEvent]:
+        """Fetch resource events in windows of window ms, concurrently.
+
+        Events are yielded lazily in start time order. Events that span window
+        boundaries are only yielded once, de-duplicated by resource and start.
+        """
+        def fetch(span: Tuple[int, int]) -> List[ResourceEvent]:
+            params = _resource_events_params(alarms, delays, stoppages, span[0], span[1])
+            return _decode_resource_events(self._fetch('resourceEvents', params))
+
+        def key(event: ResourceEvent) -> Any:
+            return (event.resource, event.start)
+
+        return _iter_windows(fetch, key, after, before, window, max_workers)
     
     def group_resource_events(self, events: Optional[List[ResourceEvent]], 
                              get_name: Callable[[ResourceEvent], str]) -> Optional[Dict[str, Dict[str, int]]]:
         """Group and sum resource events by machine."""
-        if not events:
-            return None
-        
-        result = {}
-        for event in events:
-            name = get_name(event)
-            if name not in result:
-                result[name] = {}
-            
-            duration = event.end - event.start
-            if event.resource in result[name]:
-                result[name][event.resource] += duration
-            else:
-                result[name][event.resource] = duration
-        
-        return result
+        return group_resource_events(events, get_name)
     
     def inbox_jobs(self) -> List[InBoxGroupAndJobs]:
         """Fetch inbox jobs."""
         data = self._fetch('inBoxJobs')
-        
-        # Repopulate resource in each job
-        result = []
-        for group_data in data:
-            group = from_dict(InBoxGroupAndJobs, group_data, self._config)
-            if group.jobs:
-                for job in group.jobs:
-                    job.resource = group.group
-            result.append(group)
-        
-        return result
+        return _decode_inbox_jobs(data)
     
     def search(self, text: str, limit: Optional[int] = None) -> List[SearchResult]:
         """Search for jobs/items."""
-        params = {'text': text}
-        if limit is not None:
-            params['limit'] = limit
-        
-        data = self._fetch('search', params)
-        
-        # Convert dates to numbers
-        for item in data:
-            if 'start' in item:
-                item['start'] = self._fix_date(item['start'])
-        
-        # Convert to appropriate objects
-        result = []
-        for item in data:
-            if 'start' in item:
-                result.append(from_dict(Job, item, self._config))
-            else:
-                result.append(from_dict(InBoxJob, item, self._config))
-        
-        return result
+        data = self._fetch('search', _search_params(text, limit))
+        return _decode_search(data)
     
     def daily_job_count(self) -> List[DailyJobCount]:
         """Fetch daily job count."""
         data = self._fetch('dailyJobCount')
-        return [from_dict(DailyJobCount, item, self._config) for item in data]
+        return _decode_list(DailyJobCount, data)
     
     # Change operations (from apiPeChange.ts)
     
     def insert_jobs(self, inserts: List[Dict[str, Any]]) -> Any:
         """Insert jobs."""
-        return self._post('insertJobs', body=json.dumps(inserts))
+        return self._post('insertJobs', body=inserts)
     
     def update_jobs(self, updates: List[Dict[str, Any]]) -> Any:
         """Update jobs."""
-        return self._post('updateJobs', body=json.dumps(updates))
+        return self._post('updateJobs', body=updates)
     
     def delete_jobs(self, ids: List[Any]) -> Any:
         """Delete jobs."""
-        return self._post('deleteJobs', body=json.dumps(ids))
+        return self._post('deleteJobs', body=ids)
     
     def insert_programs(self, inserts: List[Dict[str, Any]]) -> Any:
         """Insert programs."""
-        return self._post('insertPrograms', body=json.dumps(inserts))
+        return self._post('insertPrograms', body=inserts)
     
     def update_programs(self, updates: List[Dict[str, Any]]) -> Any:
         """Update programs."""
-        return self._post('updatePrograms', body=json.dumps(updates))
+        return self._post('updatePrograms', body=updates)
     
     def delete_programs(self, ids: List[Dict[str, str]]) -> Any:
         """Delete programs."""
-        return self._post('deletePrograms', body=json.dumps(ids))
+        return self._post('deletePrograms', body=ids)
+
+# Query building and decoding shared by ApiPe and AsyncApiPe
+
+def _iter_windows(fetch: Callable[[Tuple[int, int]], List[Any]], key: Callable[[Any], Any],
+                  after: int, before: int, window: int, max_workers: int) -> Iterator[Any]:
+    """Fetch [after, before) window by window on a thread pool, yielding items in order."""
+    spans = iter([(start, min(start + window, before)) for start in range(after, before, window)])
+    # Items that may show up again in later windows, with their end times.
+    # Items without an end (still running) may be in every later window.
+    seen: Dict[Any, float] = {}
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = deque()
+    try:
+        for span in itertools.islice(spans, max(1, max_workers)):
+            pending.append((span, executor.submit(fetch, span)))
+        while pending:
+            span, future = pending.popleft()
+            for next_span in itertools.islice(spans, 1):
+                pending.append((next_span, executor.submit(fetch, next_span)))
+            items = future.result()
+            items.sort(key=lambda item: item.start if item.start is not None else span[0])
+            for item in items:
+                k = key(item)
+                if k in seen:
+                    continue
+                end = item.end if item.end is not None else math.inf
+                if end >= span[1]:
+                    seen[k] = end
+                yield item
+            for k in [k for k, end in seen.items() if end < span[1]]:
+                del seen[k]
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+def _fix_date(value: Any) -> Any:
+    """Convert date strings to timestamps."""
+    if isinstance(value, str):
+        try:
+            dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            return int(dt.timestamp() * 1000)
+        except ValueError:
+            return value
+    return value
+
+def _date_param(value: int) -> str:
+    """Format a millisecond timestamp as a query parameter."""
+    return datetime.fromtimestamp(value / 1000).isoformat()
+
+def _decode_list(data_class: type, data: List[Dict[str, Any]]) -> List[Any]:
+    decoder = decoder_for(data_class, ApiPe._config)
+    return [decoder(item) for item in data]
+
+def _program_groups_params(group: Optional[Union[str, List[str]]], number: Optional[Union[str, List[str]]],
+                           only_step_counts: bool) -> Dict[str, Any]:
+    params = {}
+    if group is not None:
+        params['group'] = group
+    if number is not None:
+        params['number'] = number
+    if only_step_counts:
+        params['onlyStepCounts'] = True
+    return params
+
+def _history_params(job_id: Any, tags_filter: Optional[str], tags: Optional[List[str]]) -> Dict[str, Any]:
+    params = {'id': id_to_string(job_id)}
+    if tags_filter:
+        params['tagsFilter'] = tags_filter
+    if tags:
+        params['tags'] = ','.join(tags)
+    return params
+
+def _decode_history(response_json: Any, compact: bool = False, lazy: bool = False) -> Optional[AdaptiveHistory]:
+    if not response_json:
+        return None
+    if lazy:
+        return _decode_history_lazy(response_json, compact)
+    history = decode(AdaptiveHistory, response_json, ApiPe._config)
+    _fix_history(history, compact=compact)
+    return history
+
+def _decode_history_lazy(response_json: Dict[str, Any], compact: bool = False) -> LazyAdaptiveHistory:
+    """Decode the history fields and tag metadata, leaving the arrays in wire form."""
+    head = decode(AdaptiveHistory, dict(response_json, elapsedTimes=[], tags=[]), ApiPe._config)
+    decode_tag = decoder_for(Tag, ApiPe._config)
+    tags = [LazyHistoryTag(decode_tag(wire), wire, compact) for wire in response_json.get('tags') or ()]
+    return LazyAdaptiveHistory(head.id, head.start, head.end, response_json.get('elapsedTimes') or [],
+                               tags, head.commands, compact)
+
+def _jobs_params(after: Optional[int], before: Optional[int], starts_in_range: bool, no_jobs: bool,
+                 no_stoppages: bool, job_props: Optional[List[str]]) -> Dict[str, Any]:
+    params = {}
+    if after is not None:
+        params['after'] = _date_param(after)
+    if before is not None:
+        params['before'] = _date_param(before)
+    if starts_in_range:
+        params['startsInRange'] = True
+    if no_jobs:
+        params['noJobs'] = True
+    if no_stoppages:
+        params['noStoppages'] = True
+    if job_props:
+        params['jobProps'] = job_props
+    return params
+
+def _decode_jobs_and_stoppages(data: List[Dict[str, Any]]) -> List[Union[Job, Stoppage]]:
+    # Convert dates to numbers
+    for item in data:
+        item['start'] = _fix_date(item['start'])
+        item['end'] = _fix_date(item['end'])
+    
+    # Convert to appropriate objects
+    decode_stoppage = decoder_for(Stoppage, ApiPe._config)
+    decode_job = decoder_for(Job, ApiPe._config)
+    result = []
+    for item in data:
+        if 'stoppage' in item:
+            result.append(decode_stoppage(item))
+        else:
+            result.append(decode_job(item))
+    
+    return result
+
+def _resource_events_params(alarms: bool, delays: bool, stoppages: bool,
+                            after: Optional[int], before: Optional[int]) -> Dict[str, Any]:
+    params = {}
+    if alarms:
+        params['alarms'] = True
+    if delays:
+        params['delays'] = True
+    if stoppages:
+        params['stoppages'] = True
+    if after is not None:
+        params['after'] = _date_param(after)
+    if before is not None:
+        params['before'] = _date_param(before)
+    return params
+
+# ResourceEvent subclasses, told apart by their stoppage, alarm, delay or job key
+_RESOURCE_EVENT_CLASSES = (Stoppage, AlarmEvent, DelayEvent, ResourceJobEvent)
+
+def _decode_resource_events(data: List[Dict[str, Any]]) -> List[ResourceEvent]:
+    # Convert dates to numbers
+    for item in data:
+        item['start'] = _fix_date(item['start'])
+        item['end'] = _fix_date(item['end'])
+
+    # Decode each event as the subclass its kind key selects, when it has that class's fields
+    decoders = [(_required_fields(cls), decoder_for(cls, ApiPe._config)) for cls in _RESOURCE_EVENT_CLASSES]
+    decode_event = decoder_for(ResourceEvent, ApiPe._config)
+    result = []
+    for item in data:
+        decoder = next((d for required, d in decoders if all(name in item for name in required)), decode_event)
+        result.append(decoder(item))
+    return result
+
+def _required_fields(cls: type) -> List[str]:
+    return [f.name for f in fields(cls)
+            if f.default is MISSING and f.default_factory is MISSING]
+
+def group_resource_events(events: Optional[List[ResourceEvent]],
+                          get_name: Callable[[ResourceEvent], str]) -> Optional[Dict[str, Dict[str, int]]]:
+    """Group and sum resource events by machine."""
+    if not events:
+        return None
+    
+    result = {}
+    for event in events:
+        name = get_name(event)
+        if name not in result:
+            result[name] = {}
+        
+        duration = event.end - event.start
+        if event.resource in result[name]:
+            result[name][event.resource] += duration
+        else:
+            result[name][event.resource] = duration
+    
+    return result
+
+def _decode_inbox_jobs(data: List[Dict[str, Any]]) -> List[InBoxGroupAndJobs]:
+    # Repopulate resource in each job
+    result = []
+    for group_data in data:
+        group = decode(InBoxGroupAndJobs, group_data, ApiPe._config)
+        if group.jobs:
+            for job in group.jobs:
+                job.resource = group.group
+        result.append(group)
+    
+    return result
+
+def _search_params(text: str, limit: Optional[int]) -> Dict[str, Any]:
+    params = {'text': text}
+    if limit is not None:
+        params['limit'] = limit
+    return params
+
+def _decode_search(data: List[Dict[str, Any]]) -> List[SearchResult]:
+    # Convert dates to numbers
+    for item in data:
+        if 'start' in item:
+            item['start'] = _fix_date(item['start'])
+    
+    # Convert to appropriate objects
+    decode_job = decoder_for(Job, ApiPe._config)
+    decode_inbox_job = decoder_for(InBoxJob, ApiPe._config)
+    result = []
+    for item in data:
+        if 'start' in item:
+            result.append(decode_job(item))
+        else:
+            result.append(decode_inbox_job(item))
     
-def _fix_history(history: AdaptiveHistory) -> None:
-    """Fix the history data structure."""
+    return result
+    
+def _fix_history(history: AdaptiveHistory, as_arrays: bool = False, compact: bool = False) -> None:
+    """Fix the history data structure.
+
+    Uses the vectorized NumPy decoder when numpy is installed, otherwise the
+    plain Python loops. With as_arrays the NumPy decoder leaves elapsedTimes,
+    elapsedIndexes and values as numpy arrays instead of lists. With compact
+    they become array('q')/array('d') and boolean values BooleanValues.
+    """
+    history.elapsedTimes = _fix_elapsed_times(history.elapsedTimes, as_arrays, compact)
+    for tag in history.tags:
+        _fix_tag(tag, as_arrays, compact)
+
+def _fix_elapsed_times(elapsed_times: List[int], as_arrays: bool = False, compact: bool = False) -> Any:
+    """Decode the delta-of-delta encoded elapsedTimes, see _fix_history."""
+    if compact:
+        return _running_sum(elapsed_times, 2)
+    if np is not None:
+        return _fix_elapsed_times_numpy(elapsed_times, as_arrays)
+    return _fix_elapsed_times_python(elapsed_times)
+
+def _fix_tag(tag: 'HistoryTag', as_arrays: bool = False, compact: bool = False) -> None:
+    """Decode the elapsedIndexes and values of one tag, see _fix_history."""
+    if compact:
+        _fix_tag_compact(tag)
+    elif np is not None:
+        _fix_tag_numpy(tag, as_arrays)
+    else:
+        _fix_tag_python(tag)
+
+def _fix_history_numpy(history: AdaptiveHistory, as_arrays: bool = False) -> None:
+    """Fix the history data structure using numpy cumulative sums."""
+    history.elapsedTimes = _fix_elapsed_times_numpy(history.elapsedTimes, as_arrays)
+    for tag in history.tags:
+        _fix_tag_numpy(tag, as_arrays)
+
+def _fix_elapsed_times_numpy(elapsed_times: List[int], as_arrays: bool = False) -> Any:
+    # elapsedTimes are delta-of-delta encoded
+    times = np.cumsum(np.cumsum(np.asarray(elapsed_times, dtype=np.int64)))
+    return times if as_arrays else times.tolist()
+
+def _fix_tag_numpy(tag: 'HistoryTag', as_arrays: bool = False) -> None:
+    convert = (lambda a: a) if as_arrays else (lambda a: a.tolist())
+    elapsed_indexes = np.cumsum(np.asarray(tag.elapsedIndexes, dtype=np.int64))
+    tag.elapsedIndexes = convert(elapsed_indexes)
+
+    if tag.type == 'number' or tag.type == 'date':
+        if len(tag.values) > 0:
+            tag.values = _running_sum_numpy(tag.values, as_arrays)
+        elif as_arrays:
+            tag.values = np.zeros(0)
+    elif tag.type == 'boolean':
+        if len(tag.values) > 0:
+            # a single initial value that flips at every elapsed index
+            parity = (np.arange(len(elapsed_indexes)) & 1).astype(bool)
+            tag.values = convert(parity ^ bool(tag.values[0]))
+    elif as_arrays:
+        tag.values = np.asarray(tag.values, dtype=object)
+
+def _running_sum_numpy(deltas: List[Any], as_arrays: bool = False) -> Any:
+    """Running sum of number deltas with the int/float promotion of the Python loop.
+
+    Sums stay int until the first float delta and are float from there on,
+    so the list matches _fix_tag_python. As an array it is int64 when every
+    delta is an int and float64 otherwise.
+    """
+    values = np.asarray(deltas)
+    if values.dtype.kind in 'iub':
+        sums = np.cumsum(values, dtype=np.int64)
+        return sums if as_arrays else sums.tolist()
+    if values.dtype.kind != 'f':
+        # None or other values, sum them like the Python loop would
+        return _running_sum_object(deltas, as_arrays)
+    if as_arrays or isinstance(deltas, np.ndarray):
+        return np.cumsum(values) if as_arrays else np.cumsum(values).tolist()
+    first_float = next((i for i, v in enumerate(deltas) if type(v) is not int), len(deltas))
+    head = np.cumsum(np.asarray(deltas[:first_float], dtype=np.int64)).tolist()
+    tail = values[first_float:].copy()
+    if head and len(tail):
+        # int + float, as the Python loop adds them
+        tail[0] = head[-1] + deltas[first_float]
+    return head + np.cumsum(tail).tolist()
+
+def _running_sum_object(deltas: List[Any], as_arrays: bool) -> Any:
+    sums = list(itertools.accumulate(deltas))
+    return np.asarray(sums, dtype=object) if as_arrays else sums
+
+def _fix_history_python(history: AdaptiveHistory) -> None:
+    """Fix the history data structure one element at a time."""
     # The JSON on the wire is in a smaller form that we fix here
+    history.elapsedTimes = _fix_elapsed_times_python(history.elapsedTimes)
+    for tag in history.tags:
+        _fix_tag_python(tag)
+
+def _fix_elapsed_times_python(elapsed_times: List[int]) -> List[int]:
     prev = 0
     prev_delta = 0
-    elapsed_times = history.elapsedTimes
     for i in range(len(elapsed_times)):
         delta = prev_delta + elapsed_times[i]
         prev_delta = delta
         value = prev + delta
         prev = value
         elapsed_times[i] = value
-    for tag in history.tags:
+    return elapsed_times
+
+def _fix_tag_python(tag: 'HistoryTag') -> None:
+    prev = 0
+    elapsed_indexes = tag.elapsedIndexes
+    for i in range(len(elapsed_indexes)):
+        value = prev + elapsed_indexes[i]
+        prev = value
+        elapsed_indexes[i] = value
+
+    if tag.type == 'number' or tag.type == 'date':
+        values = tag.values
         prev = 0
-        elapsed_indexes = tag.elapsedIndexes
-        for i in range(len(elapsed_indexes)):
-            value = prev + elapsed_indexes[i]
+        for i in range(len(values)):
+            value = prev + values[i]
             prev = value
-            elapsed_indexes[i] = value
-            
-        if tag.type == 'number' or tag.type == 'date':
-            values = tag.values
-            prev = 0
-            for i in range(len(values)):
-                value = prev + values[i]
-                prev = value
-                values[i] = value
-        elif tag.type == 'boolean':            
-            values1 = tag.values
-            if len(values1) > 0:
-                last_value = values1[0]  # a single initial value
-                # Expand to full length by alternating values
-                expanded_values = [last_value]
-                for i in range(1, len(tag.elapsedIndexes)):
-                    last_value = not last_value
-                    expanded_values.append(last_value)
-                tag.values = expanded_values
+            values[i] = value
+    elif tag.type == 'boolean':
+        values1 = tag.values
+        if len(values1) > 0:
+            last_value = values1[0]  # a single initial value
+            # Expand to full length by alternating values
+            expanded_values = [last_value]
+            for i in range(1, len(tag.elapsedIndexes)):
+                last_value = not last_value
+                expanded_values.append(last_value)
+            tag.values = expanded_values
+
+def _fix_history_compact(history: AdaptiveHistory) -> None:
+    """Fix the history data structure into 8-byte typed arrays."""
+    history.elapsedTimes = _running_sum(history.elapsedTimes, 2)
+    for tag in history.tags:
+        _fix_tag_compact(tag)
+
+def _fix_tag_compact(tag: 'HistoryTag') -> None:
+    tag.elapsedIndexes = _running_sum(tag.elapsedIndexes)
+    if tag.type == 'number' or tag.type == 'date':
+        tag.values = _running_sum(tag.values)
+    elif tag.type == 'boolean':
+        if len(tag.values) > 0:
+            tag.values = BooleanValues(bool(tag.values[0]), len(tag.elapsedIndexes))
+
+def _running_sum(deltas: List[Any], times: int = 1) -> Union[array, List[Any]]:
+    """Undo delta encoding times times into array('q'), or array('d') for floats."""
+    if np is not None:
+        values = np.asarray(deltas)
+        if values.size == 0:
+            return array('q')
+        for _ in range(times):
+            values = np.cumsum(values)
+        if values.dtype.kind in 'iub':
+            return array('q', values.astype(np.int64).tobytes())
+        if values.dtype.kind == 'f':
+            return array('d', values.tobytes())
+        return values.tolist()
+
+    values = deltas
+    for _ in range(times):
+        values = list(itertools.accumulate(values))
+    if all(type(v) is int for v in values):
+        return array('q', values)
+    if all(isinstance(v, (int, float)) for v in values):
+        return array('d', values)
+    return values
+
+_TIME_CHUNK = 8192
+
+def _format_times(start: datetime, elapsed_times: Sequence[int]) -> Iterator[str]:
+    """Format start + elapsed milliseconds as ISO strings, a chunk at a time."""
+    # Aware datetimes add timedeltas in wall-clock time, so drop the tzinfo
+    base = start.replace(tzinfo=None)
+    if np is not None:
+        base64 = np.datetime64(base, 'us')
+        for c in range(0, len(elapsed_times), _TIME_CHUNK):
+            chunk = np.asarray(elapsed_times[c:c + _TIME_CHUNK], dtype=np.int64)
+            strings = np.datetime_as_string(base64 + chunk * 1000, unit='us')
+            for s in strings.tolist():
+                yield s[:-3] + 'Z'
+        return
+
+    # Without numpy only format the date and time once per distinct second
+    base_second = base.replace(microsecond=0)
+    last_second = None
+    prefix = ''
+    for elapsed in elapsed_times:
+        second, micro = divmod(base.microsecond + elapsed * 1000, 1000000)
+        if second != last_second:
+            prefix = (base_second + timedelta(seconds=second)).strftime("%Y-%m-%dT%H:%M:%S")
+            last_second = second
+        yield f"{prefix}.{micro // 1000:03d}Z"
+
+def history_header(history: AdaptiveHistory) -> List[str]:
+    """CSV header row for a history."""
+    return ['ElapsedTime', 'Time'] + [tag.name for tag in history.tags]
+
+def history_rows(history: AdaptiveHistory) -> Iterator[List[str]]:
+    """Yield one forward-filled CSV row per global elapsed time step."""
+    tags = history.tags
+    current = [''] * len(tags)
+
+    # Heap of (next elapsed index, tag index, value pointer) so every step
+    # only touches the tags that change at that step
+    pending = [(tag.elapsedIndexes[0], t_idx, 0)
+               for t_idx, tag in enumerate(tags) if len(tag.elapsedIndexes) > 0]
+    heapq.heapify(pending)
+
+    elapsed_times = history.elapsedTimes
+    for i, time_string in enumerate(_format_times(history.start, elapsed_times)):
+        while pending and pending[0][0] <= i:
+            _, t_idx, ptr = pending[0]
+            tag = tags[t_idx]
+            value = tag.values[ptr]
+            current[t_idx] = str(value) if value is not None else ''
+            ptr += 1
+            if ptr < len(tag.elapsedIndexes):
+                heapq.heapreplace(pending, (tag.elapsedIndexes[ptr], t_idx, ptr))
+            else:
+                heapq.heappop(pending)
+        yield [str(elapsed_times[i]), time_string] + current
+
+def write_history_csv(history: AdaptiveHistory, target: Union[str, os.PathLike, IO],
+                      compress: Optional[bool] = None, encoding: str = 'utf-8',
+                      metrics: Optional[MetricsSink] = None) -> None:
+    """Stream a history as CSV to a path or file-like object.
+
+    Paths ending in .gz are gzipped unless compress is False. File-like
+    targets may be text or binary; binary targets are gzipped when compress
+    is True. The export time is recorded as the history 'csv' stage in metrics.
+    """
+    if metrics is not None:
+        with StageTimer(metrics, 'history')('csv'):
+            return write_history_csv(history, target, compress, encoding)
+
+    if isinstance(target, (str, os.PathLike)):
+        if compress is None:
+            compress = os.fspath(target).endswith('.gz')
+        if compress:
+            with gzip.open(target, 'wt', encoding=encoding, newline='') as f:
+                _write_history_csv(history, f)
+        else:
+            with open(target, 'w', encoding=encoding, newline='') as f:
+                _write_history_csv(history, f)
+        return
+
+    if compress:
+        with gzip.GzipFile(fileobj=target, mode='wb') as gz:
+            with io.TextIOWrapper(gz, encoding=encoding, newline='') as f:
+                _write_history_csv(history, f)
+    elif isinstance(target, (io.RawIOBase, io.BufferedIOBase)):
+        f = io.TextIOWrapper(target, encoding=encoding, newline='')
+        _write_history_csv(history, f)
+        f.flush()
+        f.detach()
+    else:
+        _write_history_csv(history, target)
+
+def _write_history_csv(history: AdaptiveHistory, f: IO[str]) -> None:
+    writer = csv.writer(f, lineterminator='\n')
+    writer.writerow(history_header(history))
+    writer.writerows(history_rows(history))
 
 def history_to_csv(history: AdaptiveHistory) -> str:
     output = StringIO()
-    writer = csv.writer(output, lineterminator='\n')
-    
-    # Write header
-    header = ['ElapsedTime', 'Time'] + [tag.name for tag in history.tags]
-    writer.writerow(header)
-
-    num_tags = len(history.tags)
-    last_values = [None] * num_tags
-    tag_pointers = [0] * num_tags 
-    
-    # Iterate through every global elapsed time step
-    for i in range(len(history.elapsedTimes)):
-        row = [
-            str(history.elapsedTimes[i]),
-            (history.start + timedelta(milliseconds=history.elapsedTimes[i])).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + 'Z'
-        ]   
-        
-        for t_idx, tag in enumerate(history.tags):
-            ptr = tag_pointers[t_idx]
-            
-            # Check if the current global step 'i' matches the tag's next recorded index
-            if ptr < len(tag.elapsedIndexes) and tag.elapsedIndexes[ptr] == i:
-                # Update the last known value and move the pointer forward
-                current_value = tag.values[ptr]
-                last_values[t_idx] = current_value
-                tag_pointers[t_idx] = ptr + 1
-            else:
-                # Use the carried-over value (Forward Fill)
-                current_value = last_values[t_idx]
-            
-            row.append(str(current_value) if current_value is not None else '')
-            
-        writer.writerow(row)
-    
+    _write_history_csv(history, output)
     return output.getvalue()
-    
\ No newline at end of file
@@ -0,0 +1,475 @@
+import bisect
+import hashlib
+import heapq
+import json
+import math
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .live import ApiLive
+from .pe import AdaptiveHistory, HistoryTag
+from .subscriptions import Subscription, TagSubscriptions
+
+# Local recording of polled live tag values.
+#
+# Every (machine, tag) series keeps its newest samples in a head of typed
+# arrays. A full head is sealed into a zlib compressed segment with the
+# times delta-of-delta encoded and integral numbers delta encoded, as in
+# the PE history wire format. The newest memory_segments segments of a
+# series stay in memory, older ones are written to <directory>/<series
+# hash>/<first>-<last>.seg, or dropped without a directory. Segment files
+# are evicted oldest first above max_disk_bytes and reloaded on restart.
+#
+# Only changes are recorded, so a series stores one sample per change of
+# its value, and a sample holds until the next one.
+
+_KEY = 'key.json'
+
+# Value kinds of a head or segment
+_NUMBER = 0  # array('d'), None is stored as NaN
+_BOOLEAN = 1  # array('b')
+_OTHER = 2  # list of JSON values
+
+# Value encodings of a segment
+_DELTAS = 0  # integral numbers as array('q') deltas
+_DOUBLES = 1
+_BYTES = 2
+_JSON = 3
+
+_HEADER = '<qqiBB'
+_HEADER_SIZE = 22
+
+_TAG_TYPES = {_NUMBER: 'number', _BOOLEAN: 'boolean', _OTHER: 'string'}
+
+Sample = Tuple[int, Any]
+
+def _hash(*parts: str) -> str:
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:32]
+
+def _now() -> int:
+    return int(time.time() * 1000)
+
+def _number(value: float) -> Any:
+    """A stored number as recorded: None for NaN, int when integral."""
+    if value != value:
+        return None
+    return int(value) if value.is_integer() else value
+
+def _kind(value: Any) -> int:
+    if isinstance(value, bool):
+        return _BOOLEAN
+    if isinstance(value, (int, float)):
+        return _NUMBER
+    return _OTHER
+
+def _promote(kind: Optional[int], value: Any) -> Optional[int]:
+    """Kind of a series after recording value. Values of another kind make it _OTHER."""
+    if value is None:
+        return kind
+    value_kind = _kind(value)
+    if kind is None or kind == value_kind:
+        return value_kind
+    return _OTHER
+
+class _Head:
+    """Newest samples of a series in typed arrays."""
+    __slots__ = ('times', 'values', 'kind')
+
+    def __init__(self, kind: int):
+        self.times = array('q')
+        self.kind = kind
+        self.values: Any = array('d') if kind == _NUMBER else array('b') if kind == _BOOLEAN else []
+
+    def append(self, t: int, value: Any) -> None:
+        kind = self.kind
+        if kind == _NUMBER and (value is None or _kind(value) == _NUMBER):
+            self.values.append(math.nan if value is None else value)
+        elif kind == _BOOLEAN and isinstance(value, bool):
+            self.values.append(value)
+        else:
+            if kind != _OTHER:
+                # A value the typed array cannot hold, keep the whole head as a list
+                self.values = self.read(0, len(self.times))
+                self.kind = _OTHER
+            self.values.append(value)
+        self.times.append(t)
+
+    def read(self, start: int, stop: int) -> List[Any]:
+        values = self.values[start:stop]
+        if self.kind == _NUMBER:
+            return [_number(v) for v in values]
+        if self.kind == _BOOLEAN:
+            return [bool(v) for v in values]
+        return list(values)
+
+class _Segment:
+    """A sealed, compressed run of samples, held in memory or in a file."""
+    __slots__ = ('first', 'last', 'count', 'data', 'path', 'size')
+
+    def __init__(self, first: int, last: int, count: int, data: Optional[bytes] = None,
+                 path: Optional[str] = None, size: int = 0):
+        self.first = first
+        self.last = last
+        self.count = count
+        self.data = data
+        self.path = path
+        self.size = size
+
+    @classmethod
+    def seal(cls, head: _Head) -> '_Segment':
+        times = head.times
+        deltas = array('q', [0] * len(times))
+        previous = delta = 0
+        for n, t in enumerate(times):
+            deltas[n] = t - previous - delta
+            delta = t - previous
+            previous = t
+        if head.kind == _NUMBER:
+            values = head.values
+            if all(v == v and v.is_integer() and abs(v) < 2 ** 53 for v in values):
+                encoding = _DELTAS
+                ints = array('q', map(int, values))
+                for n in range(len(ints) - 1, 0, -1):
+                    ints[n] -= ints[n - 1]
+                payload = ints.tobytes()
+            else:
+                encoding = _DOUBLES
+                payload = values.tobytes()
+        elif head.kind == _BOOLEAN:
+            encoding = _BYTES
+            payload = head.values.tobytes()
+        else:
+            encoding = _JSON
+            payload = json.dumps(head.values, separators=(',', ':')).encode()
+        header = struct.pack(_HEADER, times[0], times[-1], len(times), head.kind, encoding)
+        data = header + zlib.compress(deltas.tobytes() + payload)
+        return cls(times[0], times[-1], len(times), data, size=len(data))
+
+    def load(self) -> Tuple[array, List[Any]]:
+        """Decoded times and values."""
+        data = self.data
+        if data is None:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        _, _, count, kind, encoding = struct.unpack_from(_HEADER, data)
+        body = zlib.decompress(data[_HEADER_SIZE:])
+        times = array('q')
+        times.frombytes(body[:8 * count])
+        previous = delta = 0
+        for n in range(count):
+            delta += times[n]
+            previous += delta
+            times[n] = previous
+        payload = body[8 * count:]
+        if encoding == _DELTAS:
+            ints = array('q')
+            ints.frombytes(payload)
+            total = 0
+            values: List[Any] = []
+            for d in ints:
+                total += d
+                values.append(total)
+        elif encoding == _DOUBLES:
+            doubles = array('d')
+            doubles.frombytes(payload)
+            values = [_number(v) for v in doubles]
+        elif encoding == _BYTES:
+            values = [bool(v) for v in payload]
+        else:
+            values = json.loads(payload)
+        return times, values
+
+class _Series:
+    """Samples of one machine's tag: segments oldest first, then the head."""
+    __slots__ = ('machine', 'tag', 'head', 'segments', 'last', 'kind', 'directory')
+
+    def __init__(self, machine: str, tag: str):
+        self.machine = machine
+        self.tag = tag
+        self.head: Optional[_Head] = None
+        self.segments: List[_Segment] = []
+        self.last: Optional[Sample] = None
+        self.kind: Optional[int] = None
+        self.directory: Optional[str] = None
+
+    def __len__(self) -> int:
+        return sum(s.count for s in self.segments) + (len(self.head.times) if self.head is not None else 0)
+
+    def chunks(self, after: Optional[int], before: Optional[int]) -> Iterator[Tuple[Any, List[Any]]]:
+        """(times, values) of the segments and head overlapping [after, before), oldest first."""
+        for segment in self.segments:
+            if (after is None or segment.last >= after) and (before is None or segment.first < before):
+                yield segment.load()
+        head = self.head
+        if head is not None and len(head.times):
+            yield head.times, head.read(0, len(head.times))
+
+class TagRecorder:
+    """Records polled live tag values into a bounded, compact local store.
+
+    record() polls machines' tags through a TagSubscriptions and stores each
+    change with its wall clock time in milliseconds. latest() and range()
+    read samples back, and history() builds an AdaptiveHistory of a machine
+    that history_rows, write_history_csv and the export functions accept.
+
+    Each series keeps segment_size samples in memory uncompressed plus
+    memory_segments compressed segments. Older segments spill to directory
+    when given, up to max_disk_bytes over all series, and are dropped
+    otherwise. Call flush() or close() to write everything to directory.
+    """
+    def __init__(self, client: ApiLive, directory: Optional[str] = None, segment_size: int = 1024,
+                 memory_segments: int = 8, max_disk_bytes: int = 1024 ** 3,
+                 subscriptions: Optional[TagSubscriptions] = None):
+        self.client = client
+        self.directory = directory
+        self.segment_size = segment_size
+        self.memory_segments = memory_segments
+        self.max_disk_bytes = max_disk_bytes
+        self.subscriptions = subscriptions or TagSubscriptions(client)
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        # (last time, path, size) of every segment file, for eviction oldest first
+        self._files: List[Tuple[int, str, int]] = []
+        self._disk_bytes = 0
+        self._lock = threading.RLock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._open()
+
+    def __enter__(self) -> 'TagRecorder':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    # Recording
+
+    def record(self, machine: str, tags: List[str], interval: float) -> Subscription:
+        """Poll tags of a machine every interval seconds and record their changes."""
+        return self.subscriptions.subscribe(machine, tags, interval, self._on_values)
+
+    def _on_values(self, machine: str, values: Dict[str, Any]) -> None:
+        self.add(machine, values)
+
+    def add(self, machine: str, values: Dict[str, Any], timestamp: Optional[int] = None) -> None:
+        """Record {tag: value} of a machine at timestamp (ms, default now), skipping unchanged values."""
+        t = _now() if timestamp is None else timestamp
+        with self._lock:
+            for tag, value in values.items():
+                series = self._series.get((machine, tag))
+                if series is None:
+                    series = self._series[(machine, tag)] = _Series(machine, tag)
+                if series.last is not None and (series.last[1] == value and type(series.last[1]) is type(value)
+                                                or t < series.last[0]):
+                    continue
+                if series.head is None:
+                    series.head = _Head(_kind(value) if value is not None else _OTHER)
+                series.head.append(t, value)
+                series.last = (t, value)
+                series.kind = _promote(series.kind, value)
+                if len(series.head.times) >= self.segment_size:
+                    self._seal(series)
+
+    def start(self) -> None:
+        """Start polling in a background thread."""
+        self.subscriptions.start()
+
+    def stop(self) -> None:
+        """Stop polling."""
+        self.subscriptions.stop()
+
+    def close(self) -> None:
+        """Stop polling and write everything to directory."""
+        self.stop()
+        self.flush()
+
+    # Storage
+
+    def _seal(self, series: _Series) -> None:
+        series.segments.append(_Segment.seal(series.head))
+        series.head = None
+        in_memory = [s for s in series.segments if s.data is not None]
+        for segment in in_memory[:max(0, len(in_memory) - self.memory_segments)]:
+            self._spill(series, segment)
+
+    def _spill(self, series: _Series, segment: _Segment) -> None:
+        if self.directory is None:
+            series.segments.remove(segment)
+            return
+        if series.directory is None:
+            series.directory = os.path.join(self.directory, _hash(series.machine, series.tag))
+            os.makedirs(series.directory, exist_ok=True)
+        # Rewritten with every segment, as the kind may have been promoted since
+        key_path = os.path.join(series.directory, _KEY)
+        with open(key_path + '.part', 'w', encoding='utf-8') as f:
+            json.dump({'machine': series.machine, 'tag': series.tag, 'kind': series.kind}, f)
+        os.replace(key_path + '.part', key_path)
+        path = os.path.join(series.directory, f'{segment.first}-{segment.last}.seg')
+        with open(path + '.part', 'wb') as f:
+            f.write(segment.data)
+        os.replace(path + '.part', path)
+        segment.path = path
+        segment.data = None
+        heapq.heappush(self._files, (segment.last, path, segment.size))
+        self._disk_bytes += segment.size
+        self._evict()
+
+    def _evict(self) -> None:
+        evicted = set()
+        while self._disk_bytes > self.max_disk_bytes and self._files:
+            _, path, size = heapq.heappop(self._files)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._disk_bytes -= size
+            evicted.add(path)
+        if evicted:
+            for series in self._series.values():
+                series.segments = [s for s in series.segments if s.path not in evicted]
+
+    def flush(self) -> None:
+        """Seal every head and write all in-memory segments to directory, if there is one."""
+        if self.directory is None:
+            return
+        with self._lock:
+            for series in self._series.values():
+                if series.head is not None:
+                    series.segments.append(_Segment.seal(series.head))
+                    series.head = None
+                for segment in [s for s in series.segments if s.data is not None]:
+                    self._spill(series, segment)
+
+    def _open(self) -> None:
+        """Load the segment files of an earlier run."""
+        for entry in os.scandir(self.directory):
+            key_path = os.path.join(entry.path, _KEY)
+            if not entry.is_dir() or not os.path.exists(key_path):
+                continue
+            with open(key_path, encoding='utf-8') as f:
+                key = json.load(f)
+            series = _Series(key['machine'], key['tag'])
+            series.directory = entry.path
+            for file in os.scandir(entry.path):
+                if not file.name.endswith('.seg'):
+                    continue
+                with open(file.path, 'rb') as f:
+                    first, last, count, kind, _ = struct.unpack(_HEADER, f.read(_HEADER_SIZE))
+                size = file.stat().st_size
+                series.segments.append(_Segment(first, last, count, path=file.path, size=size))
+                heapq.heappush(self._files, (last, file.path, size))
+                self._disk_bytes += size
+            series.segments.sort(key=lambda s: s.first)
+            if series.segments:
+                times, values = series.segments[-1].load()
+                series.last = (times[-1], values[-1])
+                if 'kind' in key:
+                    series.kind = key['kind']
+                else:
+                    for value in values:
+                        series.kind = _promote(series.kind, value)
+            self._series[(series.machine, series.tag)] = series
+        self._evict()
+
+    # Queries
+
+    def series(self) -> List[Tuple[str, str]]:
+        """(machine, tag) of every recorded series."""
+        with self._lock:
+            return list(self._series)
+
+    def __len__(self) -> int:
+        """Number of samples over all series."""
+        with self._lock:
+            return sum(len(series) for series in self._series.values())
+
+    def latest(self, machine: str, tag: str, n: int = 1) -> List[Sample]:
+        """The newest n (time, value) samples of a tag, oldest first."""
+        with self._lock:
+            series = self._series.get((machine, tag))
+            if series is None or n <= 0:
+                return []
+            samples: List[Sample] = []
+            head = series.head
+            if head is not None:
+                start = max(0, len(head.times) - n)
+                samples = list(zip(head.times[start:], head.read(start, len(head.times))))
+            for segment in reversed(series.segments):
+                if len(samples) >= n:
+                    break
+                times, values = segment.load()
+                take = min(n - len(samples), len(times))
+                samples = list(zip(times[len(times) - take:], values[len(values) - take:])) + samples
+        return samples
+
+    def range(self, machine: str, tag: str, after: Optional[int] = None,
+              before: Optional[int] = None) -> Tuple[List[int], List[Any]]:
+        """Times and values of a tag's samples with after <= time < before."""
+        with self._lock:
+            series = self._series.get((machine, tag))
+            if series is None:
+                return [], []
+            chunks = list(series.chunks(after, before))
+        times: List[int] = []
+        values: List[Any] = []
+        for chunk_times, chunk_values in chunks:
+            start = 0 if after is None else bisect.bisect_left(chunk_times, after)
+            stop = len(chunk_times) if before is None else bisect.bisect_left(chunk_times, before)
+            times.extend(chunk_times[start:stop])
+            values.extend(chunk_values[start:stop])
+        return times, values
+
+    def _value_at(self, machine: str, tag: str, t: int) -> Optional[Sample]:
+        """The last sample before t, the value a tag held at t."""
+        with self._lock:
+            series = self._series.get((machine, tag))
+            if series is None:
+                return None
+            chunks = list(series.chunks(None, t))
+        for chunk_times, chunk_values in reversed(chunks):
+            n = bisect.bisect_left(chunk_times, t)
+            if n > 0:
+                return chunk_times[n - 1], chunk_values[n - 1]
+        return None
+
+    def history(self, machine: str, tags: Optional[List[str]] = None, after: Optional[int] = None,
+                before: Optional[int] = None) -> Optional[AdaptiveHistory]:
+        """The recorded samples of a machine as an AdaptiveHistory.
+
+        The history starts at after, with each tag's value at that time, or
+        at the first sample. Its id is the machine name and elapsedTimes
+        are the distinct sample times. Returns None without samples.
+        """
+        if tags is None:
+            tags = [tag for m, tag in self.series() if m == machine]
+        columns = []
+        for tag in tags:
+            times, values = self.range(machine, tag, after, before)
+            if after is not None and (not times or times[0] > after):
+                held = self._value_at(machine, tag, after)
+                if held is not None:
+                    times.insert(0, after)
+                    values.insert(0, held[1])
+            columns.append((tag, times, values))
+        all_times = sorted({t for _, times, _ in columns for t in times})
+        if not all_times:
+            return None
+        start = all_times[0]
+        positions = {t: n for n, t in enumerate(all_times)}
+        history_tags = []
+        for tag, times, values in columns:
+            with self._lock:
+                series = self._series.get((machine, tag))
+                kind = series.kind if series is not None else None
+            history_tags.append(HistoryTag(tag, _TAG_TYPES[_OTHER if kind is None else kind],
+                                           elapsedIndexes=[positions[t] for t in times], values=values))
+        return AdaptiveHistory(machine, _datetime(start), _datetime(all_times[-1]),
+                               [t - start for t in all_times], history_tags)
+
+def _datetime(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, timezone.utc)
@@ -0,0 +1,197 @@
+import bisect
+import threading
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .pe import DEFAULT_WINDOW, ApiPe, Job, SearchResult, id_to_string, is_stoppage, string_to_id
+from .sync import INBOX, JOB, ScheduleChange
+
+# Separates the searchable texts of two items in the haystack, never matched
+_END = '\x00'
+# Separates the fields of one item
+_FIELD = '\x1f'
+
+class _Snapshot(NamedTuple):
+    """Immutable lookup structures, swapped in whole by each rebuild."""
+    items: List[SearchResult]
+    ids: List[str]  # lower-case id strings, sorted
+    id_items: List[int]  # item position of each entry in ids
+    by_id: Dict[str, int]  # _normalize of each id
+    haystack: str
+    offsets: List[int]  # start of every item's text in haystack
+
+class SearchIndex:
+    """Local type-ahead search over inbox jobs and a window of scheduled jobs.
+
+    Matches ids (normalized with id_to_string), notes, parameters and prop
+    values, case-insensitively. Exact and prefix id matches come first,
+    then other substring matches. When fewer than min_results items match
+    locally and fallback is set, the server search fills up the results.
+
+    refresh() re-fetches the inbox and [now - trailing, now + lookahead].
+    Alternatively pass apply to ScheduleMirror.subscribe to follow a mirror.
+    """
+    def __init__(self, client: ApiPe, trailing: int = DEFAULT_WINDOW, lookahead: int = DEFAULT_WINDOW,
+                 fallback: bool = True, min_results: int = 1, job_props: Optional[List[str]] = None):
+        self.client = client
+        self.trailing = trailing
+        self.lookahead = lookahead
+        self.fallback = fallback
+        self.min_results = min_results
+        self.job_props = job_props
+        self._entries: Dict[Tuple[str, str], Tuple[SearchResult, str]] = {}
+        self._lock = threading.Lock()
+        self._snapshot: Optional[_Snapshot] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # Maintenance
+
+    def refresh(self, now: Optional[int] = None) -> int:
+        """Re-fetch the inbox and the job window. Returns the number of changed items."""
+        if now is None:
+            now = int(time.time() * 1000)
+        scheduled = self.client.jobs_and_stoppages(now - self.trailing, now + self.lookahead,
+                                                   job_props=self.job_props)
+        inbox = [job for group in self.client.inbox_jobs() for job in (group.jobs or [])]
+        items = [(JOB, item) for item in scheduled if not is_stoppage(item)]
+        items += [(INBOX, job) for job in inbox]
+        with self._lock:
+            fresh = {(kind, id_to_string(item.id)): item for kind, item in items}
+            changed = len(self._entries.keys() - fresh.keys())
+            for key in self._entries.keys() - fresh.keys():
+                del self._entries[key]
+            changed += self._upsert(fresh.items())
+            if changed:
+                self._snapshot = None
+        return changed
+
+    def update(self, items: Iterable[SearchResult]) -> None:
+        """Add or replace items, keyed by id and by whether they are scheduled."""
+        with self._lock:
+            if self._upsert(((JOB if isinstance(item, Job) else INBOX, id_to_string(item.id)), item)
+                            for item in items):
+                self._snapshot = None
+
+    def apply(self, changes: List[ScheduleChange]) -> None:
+        """Apply ScheduleMirror changes, ignoring stoppages."""
+        with self._lock:
+            dirty = self._upsert(((c.kind, c.key), c.item) for c in changes
+                                 if c.item is not None and c.kind in (JOB, INBOX))
+            for c in changes:
+                if c.item is None and self._entries.pop((c.kind, c.key), None) is not None:
+                    dirty += 1
+            if dirty:
+                self._snapshot = None
+
+    def _upsert(self, items: Iterable[Tuple[Tuple[str, str], SearchResult]]) -> int:
+        changed = 0
+        for key, item in items:
+            text = _text(key[1], item)
+            old = self._entries.get(key)
+            if old is None or old[1] != text or old[0] != item:
+                self._entries[key] = (item, text)
+                changed += 1
+        return changed
+
+    def _current(self) -> _Snapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = _build(list(self._entries.values()))
+            return self._snapshot
+
+    # Lookup
+
+    def search(self, text: Any, limit: Optional[int] = None) -> List[SearchResult]:
+        """Items whose id starts with or whose fields contain text, best matches first."""
+        results = self.search_local(text, limit)
+        if self.fallback and len(results) < self.min_results:
+            seen = {id_to_string(item.id) for item in results}
+            for item in self.client.search(id_to_string(text), limit):
+                key = id_to_string(item.id)
+                if key not in seen and (limit is None or len(results) < limit):
+                    seen.add(key)
+                    results.append(item)
+        return results
+
+    def search_local(self, text: Any, limit: Optional[int] = None) -> List[SearchResult]:
+        """search without the server fallback."""
+        query = id_to_string(text).strip().lower()
+        if not query or _END in query:
+            return []
+        snapshot = self._current()
+        found: List[int] = []
+        seen = set()
+
+        def add(position: int) -> bool:
+            if position not in seen:
+                seen.add(position)
+                found.append(position)
+            return limit is not None and len(found) >= limit
+
+        exact = snapshot.by_id.get(_normalize(text))
+        if exact is not None and add(exact):
+            return [snapshot.items[i] for i in found]
+
+        ids = snapshot.ids
+        j = bisect.bisect_left(ids, query)
+        while j < len(ids) and ids[j].startswith(query):
+            if add(snapshot.id_items[j]):
+                return [snapshot.items[i] for i in found]
+            j += 1
+
+        haystack = snapshot.haystack
+        offsets = snapshot.offsets
+        position = haystack.find(query)
+        while position >= 0:
+            item = bisect.bisect_right(offsets, position) - 1
+            if add(item):
+                break
+            # Continue after this item's text
+            position = haystack.find(query, offsets[item + 1])
+        return [snapshot.items[i] for i in found]
+
+def _normalize(text: Any) -> str:
+    """Canonical lower-case id string, applied to both the indexed ids and the query.
+
+    'A@1@0' and 'a@1' both become 'a@1', so either finds the id ['A', 1, 0]
+    and an item whose id was given as the string 'A@1@0'.
+    """
+    if not isinstance(text, str):
+        return id_to_string(text).lower()
+    try:
+        return id_to_string(string_to_id(text.strip())).lower()
+    except ValueError:
+        return text.strip().lower()
+
+def _text(key: str, item: SearchResult) -> str:
+    fields = [key, item.notes or '']
+    for parameter in item.parameters or ():
+        fields.extend(str(v) for v in parameter.values())
+    for value in (item.props or {}).values():
+        if value is not None:
+            fields.append(str(value))
+    return _FIELD.join(fields).replace(_END, ' ').lower()
+
+def _build(entries: List[Tuple[SearchResult, str]]) -> _Snapshot:
+    items = [item for item, _ in entries]
+    keys = [text.split(_FIELD, 1)[0] for _, text in entries]
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    offsets = []
+    position = 0
+    for _, text in entries:
+        offsets.append(position)
+        position += len(text) + 1
+    offsets.append(position)
+    return _Snapshot(
+        items=items,
+        ids=[keys[i] for i in order],
+        id_items=order,
+        by_id={_normalize(key): i for i, key in reversed(list(enumerate(keys)))},
+        haystack=''.join(text + _END for _, text in entries),
+        offsets=offsets,
+    )
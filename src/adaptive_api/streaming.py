@@ -0,0 +1,217 @@
+import json
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+from .decoders import decode, decoder_for
+from .pe import AdaptiveHistory, ApiPe, BooleanValues, HistoryTag, _fix_elapsed_times, _fix_tag
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Streaming decode of history responses.
+#
+# With ijson installed the body is parsed as a stream of events and every
+# array element goes straight into its decoded list or typed array, so the
+# body and the wire arrays are never held in memory. Without ijson the body
+# is read into one buffer, parsed with orjson when installed (json otherwise)
+# and released before the tags are decoded one at a time.
+
+_CHUNK = 1 << 20
+
+def loads(data: Any) -> Any:
+    """Parse JSON bytes with orjson when installed, json otherwise."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def read_history(response: requests.Response, compact: bool = False) -> Optional[AdaptiveHistory]:
+    """Decode a history from a response requested with stream=True."""
+    if ijson is not None:
+        response.raw.decode_content = True
+        return decode_history_events(ijson.parse(response.raw, use_float=True), compact)
+    body = bytearray()
+    for chunk in response.iter_content(_CHUNK):
+        body += chunk
+    data = loads(body)
+    del body
+    return decode_history_json(data, compact)
+
+def decode_history_json(data: Any, compact: bool = False) -> Optional[AdaptiveHistory]:
+    """Decode a parsed history, dropping each tag's wire arrays once it is decoded."""
+    if not data:
+        return None
+    wire_tags = data.pop('tags', None) or []
+    wire_times = data.pop('elapsedTimes', None) or []
+    history = decode(AdaptiveHistory, dict(data, elapsedTimes=[], tags=[]), ApiPe._config)
+    history.elapsedTimes = _fix_elapsed_times(wire_times, compact=compact)
+    del wire_times
+    decode_tag = decoder_for(HistoryTag, ApiPe._config)
+    # Pop from the end so every wire tag is unreferenced as soon as it is decoded
+    wire_tags.reverse()
+    while wire_tags:
+        tag = decode_tag(wire_tags.pop())
+        _fix_tag(tag, compact=compact)
+        history.tags.append(tag)
+    return history
+
+def decode_history_events(events: Iterable[Tuple[str, str, Any]], compact: bool = False) -> Optional[AdaptiveHistory]:
+    """Decode a history from ijson.parse style (prefix, event, value) events."""
+    head: Dict[str, Any] = {}
+    times = _Sum(compact, twice=True)
+    tags: List[HistoryTag] = []
+    decode_tag = decoder_for(HistoryTag, ApiPe._config)
+    meta: Dict[str, Any] = {}
+    indexes = _Sum(compact)
+    values: Optional[_Values] = None
+    raw_values: List[Any] = []
+    # Key whose value comes next, and the builder of a nested value
+    target: Optional[Tuple[Dict[str, Any], str]] = None
+    builder: Optional[_Builder] = None
+
+    for prefix, event, value in events:
+        if builder is not None:
+            builder.event(event, value)
+            if builder.done:
+                target[0][target[1]] = builder.value
+                builder = target = None
+        elif prefix == 'elapsedTimes.item':
+            times.add(value)
+        elif prefix == 'tags.item.elapsedIndexes.item':
+            indexes.add(value)
+        elif prefix == 'tags.item.values.item':
+            if values is None and 'type' in meta:
+                values = _Values(meta['type'], compact)
+            if values is not None:
+                values.add(value)
+            else:
+                # The type comes after the values, decode them at the end of the tag
+                raw_values.append(value)
+        elif event == 'map_key':
+            if prefix == '':
+                target = (head, value)
+            elif prefix == 'tags.item':
+                target = (meta, value)
+        elif prefix == 'tags.item' and event == 'start_map':
+            meta = {}
+            indexes = _Sum(compact)
+            values = None
+            raw_values = []
+        elif prefix == 'tags.item' and event == 'end_map':
+            tag = decode_tag(dict(meta, elapsedIndexes=[], values=[]))
+            tag.elapsedIndexes = indexes.values
+            if values is None:
+                values = _Values(tag.type, compact)
+                for item in raw_values:
+                    values.add(item)
+            tag.values = values.result(len(indexes.values))
+            tags.append(tag)
+            values = None
+            raw_values = []
+        elif target is not None and prefix in ('elapsedTimes', 'tags', 'tags.item.elapsedIndexes',
+                                               'tags.item.values'):
+            target = None  # the arrays above, or null
+        elif target is not None:
+            if event in ('start_map', 'start_array'):
+                builder = _Builder()
+                builder.event(event, value)
+            else:
+                target[0][target[1]] = value
+                target = None
+
+    if not head:
+        return None
+    history = decode(AdaptiveHistory, dict(head, elapsedTimes=[], tags=[]), ApiPe._config)
+    history.elapsedTimes = times.values
+    history.tags = tags
+    return history
+
+class _Sum:
+    """Undoes delta (or delta-of-delta) encoding one element at a time."""
+    __slots__ = ('values', 'total', 'delta', 'twice')
+
+    def __init__(self, compact: bool, twice: bool = False):
+        self.values: Any = array('q') if compact else []
+        self.total = 0
+        self.delta = 0
+        self.twice = twice
+
+    def add(self, value: Any) -> None:
+        if self.twice:
+            self.delta += value
+            self.total += self.delta
+        else:
+            self.total += value
+        try:
+            self.values.append(self.total)
+        except TypeError:
+            # The first float in an array('q')
+            self.values = array('d', self.values)
+            self.values.append(self.total)
+
+class _Values:
+    """Decoded values of one tag, in the form _fix_tag gives them."""
+    __slots__ = ('type', 'compact', 'sum', 'items')
+
+    def __init__(self, tag_type: Any, compact: bool):
+        self.type = tag_type
+        self.compact = compact
+        self.sum = _Sum(compact) if tag_type in ('number', 'date') else None
+        self.items: List[Any] = []
+
+    def add(self, value: Any) -> None:
+        if self.sum is not None:
+            self.sum.add(value)
+        elif self.type != 'boolean' or not self.items:
+            # Boolean tags only send their initial value
+            self.items.append(value)
+
+    def result(self, count: int) -> Any:
+        if self.sum is not None:
+            return self.sum.values
+        if self.type != 'boolean' or not self.items:
+            return self.items
+        initial = bool(self.items[0])
+        if self.compact:
+            return BooleanValues(initial, count)
+        return [initial ^ bool(i & 1) for i in range(count)]
+
+class _Builder:
+    """Builds one nested JSON value from events."""
+    __slots__ = ('stack', 'key', 'value', 'done')
+
+    def __init__(self):
+        self.stack: List[Any] = []
+        self.key: Optional[str] = None
+        self.value: Any = None
+        self.done = False
+
+    def event(self, event: str, value: Any) -> None:
+        if event == 'map_key':
+            self.key = value
+        elif event in ('start_map', 'start_array'):
+            container: Any = {} if event == 'start_map' else []
+            self._put(container)
+            self.stack.append(container)
+        elif event in ('end_map', 'end_array'):
+            self.stack.pop()
+            self.done = not self.stack
+        else:
+            self._put(value)
+            self.done = not self.stack
+
+    def _put(self, value: Any) -> None:
+        if not self.stack:
+            self.value = value
+        elif isinstance(self.stack[-1], list):
+            self.stack[-1].append(value)
+        else:
+            self.stack[-1][self.key] = value
@@ -0,0 +1,132 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from .live import ApiLive, Running
+
+RUNNING_TAG = "Parent.Running"
+
+TagCallback = Callable[[str, Dict[str, Any]], None]
+
+@dataclass(eq=False)
+class Subscription:
+    """A registered interest in some tags of one machine."""
+    machine: str
+    tags: List[str]
+    interval: float
+    callback: TagCallback
+    values: Optional[Dict[str, Any]] = None
+    next_due: float = 0.0
+
+class TagSubscriptions:
+    """Poll tag values for many subscribers with as few requests as possible.
+
+    Every tick, the subscriptions that are due are merged into a single
+    tagValues request for all their machines and tags. A callback is called
+    with machine and {tag: value} only when one of its values changed.
+    Machines whose Parent.Running says they are not running are polled
+    idle_factor times less often. An exception raised by a callback goes to
+    on_error and does not keep the other subscribers from being notified.
+    """
+    def __init__(self, client: ApiLive, idle_factor: float = 5.0, coalesce: float = 0.05,
+                 on_error: Optional[Callable[[Exception], None]] = None):
+        self.client = client
+        self.idle_factor = idle_factor
+        self.coalesce = coalesce
+        self.on_error = on_error
+        self.running: Dict[str, Any] = {}
+        self._subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, machine: str, tags: List[str], interval: float,
+                  callback: TagCallback) -> Subscription:
+        """Register a callback for tags on a machine, polled every interval seconds."""
+        subscription = Subscription(machine, list(tags), interval, callback)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        self._wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscription."""
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def _is_idle(self, machine: str) -> bool:
+        return self.running.get(machine) == Running.NOT_RUNNING.value
+
+    def poll(self, now: Optional[float] = None) -> float:
+        """Poll all due subscriptions once. Returns when the next one is due."""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            due = [s for s in self._subscriptions if s.next_due <= now + self.coalesce]
+        errors: List[Exception] = []
+        if due:
+            machines = list(dict.fromkeys(s.machine for s in due))
+            tags = list(dict.fromkeys(t for s in due for t in s.tags))
+            if RUNNING_TAG not in tags:
+                tags.append(RUNNING_TAG)
+            column = {tag: i for i, tag in enumerate(tags)}
+
+            data = self.client.tag_values_multiple(machines, tags)
+
+            for machine in machines:
+                row = data.get(machine)
+                if row:
+                    self.running[machine] = row[column[RUNNING_TAG]]
+            for s in due:
+                interval = s.interval * self.idle_factor if self._is_idle(s.machine) else s.interval
+                s.next_due = now + interval
+                row = data.get(s.machine)
+                if not row:
+                    continue
+                values = {tag: row[column[tag]] for tag in s.tags}
+                if values != s.values:
+                    s.values = values
+                    try:
+                        s.callback(s.machine, values)
+                    except Exception as e:
+                        if self.on_error is None:
+                            errors.append(e)
+                        else:
+                            self.on_error(e)
+
+        if errors:
+            # Without on_error, the first callback error surfaces once everyone was notified
+            raise errors[0]
+        with self._lock:
+            return min((s.next_due for s in self._subscriptions), default=now + 1.0)
+
+    def start(self) -> None:
+        """Poll in a background thread until stop is called."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="TagSubscriptions", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            now = time.monotonic()
+            try:
+                next_due = self.poll(now)
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(e)
+                next_due = now + 1.0
+            self._wake.wait(max(0.0, next_due - time.monotonic()))
+            self._wake.clear()
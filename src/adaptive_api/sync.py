@@ -0,0 +1,216 @@
+import dataclasses
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional, Set, Tuple, Union
+
+from .decoders import decoder_for
+from .pe import ApiPe, InBoxJob, Job, Stoppage, id_to_string, is_stoppage, item_is_job
+
+HOUR = 3600 * 1000
+
+JOB = 'job'
+STOPPAGE = 'stoppage'
+INBOX = 'inbox'
+
+ScheduleItem = Union[Job, Stoppage, InBoxJob]
+
+@dataclass
+class ScheduleChange:
+    """An insert, update, delete or move applied to the mirror.
+
+    'moved' is a scheduled job that was taken off the schedule into the
+    inbox, it is reported again as an 'insert' of kind 'inbox'.
+    """
+    action: str  # 'insert', 'update', 'delete' or 'moved'
+    kind: str  # 'job', 'stoppage' or 'inbox'
+    key: str
+    item: Optional[ScheduleItem] = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    resource TEXT,
+    start INTEGER,
+    "end" INTEGER,
+    committed INTEGER,
+    blocked INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS items_resource_start ON items (resource, start);
+CREATE INDEX IF NOT EXISTS items_start ON items (start);
+CREATE INDEX IF NOT EXISTS items_end ON items ("end");
+CREATE INDEX IF NOT EXISTS items_committed ON items (committed);
+CREATE INDEX IF NOT EXISTS items_blocked ON items (blocked);
+"""
+
+# Rows overlapping [after, before), open-ended rows included
+_OVERLAPS = '(start < ? OR start IS NULL) AND ("end" >= ? OR "end" IS NULL)'
+
+def _flag(value: Optional[bool]) -> int:
+    return int(bool(value))
+
+class ScheduleMirror:
+    """Local SQLite mirror of jobs, stoppages and inbox jobs.
+
+    full_sync loads a whole time range once. After that, refresh only fetches
+    [now - trailing, now + lookahead] plus the inbox and upserts what changed.
+    When mirrored items in that range are no longer returned, lookahead
+    before and after the range is fetched once, and jobs still missing are
+    searched by id, to find those rescheduled elsewhere, which are updated.
+    Items found nowhere, nor in the inbox, are deleted.
+    Subscribers get the list of ScheduleChange applied by each sync.
+    """
+    def __init__(self, client: ApiPe, path: str = ':memory:', trailing: int = HOUR,
+                 lookahead: int = 24 * HOUR, job_props: Optional[List[str]] = None):
+        self.client = client
+        self.trailing = trailing
+        self.lookahead = lookahead
+        self.job_props = job_props
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[List[ScheduleChange]], None]] = []
+        self._decoders = {
+            JOB: decoder_for(Job, ApiPe._config),
+            STOPPAGE: decoder_for(Stoppage, ApiPe._config),
+            INBOX: decoder_for(InBoxJob, ApiPe._config),
+        }
+
+    def close(self) -> None:
+        self._db.close()
+
+    def subscribe(self, callback: Callable[[List[ScheduleChange]], None]) -> None:
+        """Call callback with the changes of every sync that changed something."""
+        self._listeners.append(callback)
+
+    # Synchronization
+
+    def full_sync(self, after: int, before: int) -> List[ScheduleChange]:
+        """Mirror everything overlapping [after, before) and the inbox."""
+        return self._sync(after, before)
+
+    def refresh(self, now: Optional[int] = None) -> List[ScheduleChange]:
+        """Re-fetch the window around now and the inbox, and apply the differences."""
+        if now is None:
+            now = int(time.time() * 1000)
+        return self._sync(now - self.trailing, now + self.lookahead)
+
+    def _sync(self, after: int, before: int) -> List[ScheduleChange]:
+        scope = f'kind IN (?, ?) AND {_OVERLAPS}'
+        scope_args = (JOB, STOPPAGE, before, after)
+        scheduled = self._scheduled(self.client.jobs_and_stoppages(after, before, job_props=self.job_props))
+        inbox = [(INBOX, job) for group in self.client.inbox_jobs() for job in (group.jobs or [])]
+        in_inbox = {id_to_string(job.id) for _, job in inbox}
+        with self._lock:
+            missing = set(self._db.execute(f'SELECT kind, key FROM items WHERE {scope}', scope_args))
+        missing -= {(kind, id_to_string(item.id)) for kind, item in scheduled}
+        missing -= {(JOB, key) for key in in_inbox}
+        if missing:
+            scheduled += self._find(missing, after, before)
+        with self._lock:
+            changes = self._apply(scheduled, scope, scope_args)
+            changes = [ScheduleChange('moved', c.kind, c.key) if c.action == 'delete' and c.kind == JOB
+                       and c.key in in_inbox else c for c in changes]
+            changes += self._apply(inbox, 'kind = ?', (INBOX,))
+            self._db.commit()
+        if changes:
+            for listener in self._listeners:
+                listener(changes)
+        return changes
+
+    def _find(self, missing: Set[Tuple[str, str]], after: int, before: int) -> List[Tuple[str, ScheduleItem]]:
+        """Rows that left [after, before) but are still scheduled elsewhere."""
+        found = []
+        for span in ((after - self.lookahead, after), (before, before + self.lookahead)):
+            for kind, item in self._scheduled(self.client.jobs_and_stoppages(*span, job_props=self.job_props)):
+                if (kind, id_to_string(item.id)) in missing:
+                    missing.discard((kind, id_to_string(item.id)))
+                    found.append((kind, item))
+        for kind, key in sorted(missing):
+            if kind != JOB:
+                continue
+            # Moved further than lookahead, search only finds jobs
+            for item in self.client.search(key):
+                if id_to_string(item.id) == key and item_is_job(item) is not None:
+                    found.append((JOB, item))
+                    break
+        return found
+
+    @staticmethod
+    def _scheduled(items: List[Union[Job, Stoppage]]) -> List[Tuple[str, ScheduleItem]]:
+        return [(STOPPAGE if is_stoppage(item) else JOB, item) for item in items]
+
+    def _apply(self, items: List[Tuple[str, ScheduleItem]], scope: str,
+               scope_args: Tuple[Any, ...]) -> List[ScheduleChange]:
+        """Upsert items and delete rows within scope that are no longer present."""
+        existing = {(kind, key): data for kind, key, data in
+                    self._db.execute(f'SELECT kind, key, data FROM items WHERE {scope}', scope_args)}
+        changes = []
+        rows = []
+        for kind, item in items:
+            key = id_to_string(item.id)
+            data = json.dumps(dataclasses.asdict(item), sort_keys=True, separators=(',', ':'))
+            old = existing.pop((kind, key), None)
+            if old == data:
+                continue
+            if old is None and self._db.execute('SELECT 1 FROM items WHERE kind = ? AND key = ?',
+                                                (kind, key)).fetchone() is None:
+                changes.append(ScheduleChange('insert', kind, key, item))
+            else:
+                changes.append(ScheduleChange('update', kind, key, item))
+            rows.append((kind, key, item.resource, getattr(item, 'start', None), getattr(item, 'end', None),
+                         _flag(getattr(item, 'committed', None)), _flag(getattr(item, 'blocked', None)), data))
+        self._db.executemany('INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        deleted = list(existing)
+        self._db.executemany('DELETE FROM items WHERE kind = ? AND key = ?', deleted)
+        changes += [ScheduleChange('delete', kind, key) for kind, key in deleted]
+        return changes
+
+    # Queries
+
+    def _query(self, where: str, args: Iterable[Any]) -> List[ScheduleItem]:
+        with self._lock:
+            rows = self._db.execute(f'SELECT kind, data FROM items WHERE {where} ORDER BY start, key',
+                                    tuple(args)).fetchall()
+        return [self._decoders[kind](json.loads(data)) for kind, data in rows]
+
+    def get(self, job_id: Any, kind: str = JOB) -> Optional[ScheduleItem]:
+        """Look up one item by id."""
+        items = self._query('kind = ? AND key = ?', (kind, id_to_string(job_id)))
+        return items[0] if items else None
+
+    def by_resource(self, resource: str, after: Optional[int] = None,
+                    before: Optional[int] = None) -> List[Union[Job, Stoppage]]:
+        """Jobs and stoppages on a resource, optionally overlapping [after, before)."""
+        where = 'kind IN (?, ?) AND resource = ?'
+        args: List[Any] = [JOB, STOPPAGE, resource]
+        if before is not None:
+            where += ' AND (start < ? OR start IS NULL)'
+            args.append(before)
+        if after is not None:
+            where += ' AND ("end" >= ? OR "end" IS NULL)'
+            args.append(after)
+        return self._query(where, args)
+
+    def in_range(self, after: int, before: int) -> List[Union[Job, Stoppage]]:
+        """Jobs and stoppages overlapping [after, before), including those without a start or end."""
+        return self._query(f'kind IN (?, ?) AND {_OVERLAPS}', (JOB, STOPPAGE, before, after))
+
+    def committed(self, committed: bool = True) -> List[Job]:
+        """Scheduled jobs by committed flag."""
+        return self._query('kind = ? AND committed = ?', (JOB, int(committed)))
+
+    def blocked(self, blocked: bool = True, inbox: bool = False) -> List[Union[Job, InBoxJob]]:
+        """Scheduled jobs, or inbox jobs when inbox is set, by blocked flag."""
+        return self._query('kind = ? AND blocked = ?', (INBOX if inbox else JOB, int(blocked)))
+
+    def inbox(self, resource: Optional[str] = None) -> List[InBoxJob]:
+        """Inbox jobs, optionally of one inbox group."""
+        if resource is None:
+            return self._query('kind = ?', (INBOX,))
+        return self._query('kind = ? AND resource = ?', (INBOX, resource))
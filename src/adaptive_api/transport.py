@@ -0,0 +1,196 @@
+import copy
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import MetricsSink
+
+# Connect and read timeouts in seconds
+Timeout = Tuple[float, float]
+
+# Keyed by "<api>/<path>", so the PE jobs timeout does not apply to Live jobs
+DEFAULT_TIMEOUTS: Dict[str, Timeout] = {
+    "pe/history": (3.05, 60.0),
+    "pe/jobs": (3.05, 30.0),
+    "pe/resourceEvents": (3.05, 30.0),
+}
+
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without contacting the server while its circuit breaker is open."""
+
+class CircuitBreaker:
+    """Fail fast after repeated failures, then let a single trial request through.
+
+    The breaker opens after failure_threshold consecutive failures. Requests
+    fail immediately until reset_timeout seconds have passed. After that one
+    request is let through, and it closes the breaker if it succeeds.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def before_request(self) -> None:
+        """Raise CircuitOpenError if the request may not be sent."""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if self._trial or time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError("circuit breaker is open")
+            self._trial = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+class Transport:
+    """HTTP settings shared by the clients: pooling, timeouts, retries, breakers.
+
+    Share one Transport between ApiLive and ApiPe to share their per-server
+    circuit breakers. Only GET requests are retried, with full-jitter
+    exponential backoff, on connection errors, timeouts and 429/502/503/504.
+    deadline bounds a whole request, retries included, in seconds: the
+    timeouts of each attempt are cut to the time left and no attempt starts
+    after it.
+    """
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 32,
+                 connect_timeout: float = 3.05, read_timeout: float = 10.0,
+                 timeouts: Optional[Dict[str, Timeout]] = None,
+                 retries: int = 2, backoff: float = 0.2, max_backoff: float = 5.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 deadline: Optional[float] = None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.default_timeout = (connect_timeout, read_timeout)
+        self.timeouts = dict(DEFAULT_TIMEOUTS if timeouts is None else timeouts)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.deadline = deadline
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def mount(self, session: requests.Session) -> None:
+        """Install connection pools sized for multi-threaded use."""
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+    def timeout(self, path: str, api: str = "") -> Timeout:
+        """Timeout of an endpoint: timeouts["<api>/<path>"], then timeouts[path], then the default."""
+        timeout = self.timeouts.get(f"{api}/{path}") if api else None
+        if timeout is None:
+            timeout = self.timeouts.get(path, self.default_timeout)
+        return timeout
+
+    def bounded(self, deadline: float) -> 'Transport':
+        """A copy with a deadline that shares this transport's circuit breakers."""
+        bounded = copy.copy(self)
+        bounded.deadline = deadline if self.deadline is None else min(deadline, self.deadline)
+        return bounded
+
+    def breaker(self, server: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(server)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._breakers[server] = breaker
+            return breaker
+
+    def _delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, session: requests.Session, server: str, method: str, url: str,
+                path: str, metrics: Optional[MetricsSink] = None, api: str = "",
+                **kwargs: Any) -> requests.Response:
+        """Send a request. The caller checks the status of the returned response."""
+        kwargs.setdefault("timeout", self.timeout(path, api))
+        if metrics is None:
+            return self._request(session, server, method, url, [0], **kwargs)
+        # Labelled like timeouts, so the PE and Live endpoints of one name stay apart
+        endpoint = f"{api}/{path}" if api else path
+        start = time.perf_counter()
+        retried = [0]
+        try:
+            response = self._request(session, server, method, url, retried, **kwargs)
+        except Exception:
+            metrics.record_request(endpoint, method, None, time.perf_counter() - start, 0, retried[0])
+            raise
+        if kwargs.get("stream"):
+            # Reading the body here would defeat streaming, trust the header instead
+            size = int(response.headers.get("Content-Length") or 0)
+        else:
+            size = len(response.content)
+        metrics.record_request(endpoint, method, response.status_code, time.perf_counter() - start,
+                               size, retried[0])
+        return response
+
+    def _request(self, session: requests.Session, server: str, method: str, url: str,
+                 retried: List[int], **kwargs: Any) -> requests.Response:
+        breaker = self.breaker(server)
+        attempts = 1 + (self.retries if method == "GET" else 0)
+        end = time.monotonic() + self.deadline if self.deadline is not None else None
+        timeout = kwargs.get("timeout")
+        for attempt in range(attempts):
+            retried[0] = attempt
+            if end is not None:
+                left = end - time.monotonic()
+                if left <= 0:
+                    raise requests.exceptions.Timeout(f"{server} did not answer within {self.deadline} s")
+                kwargs["timeout"] = _cap(timeout, left)
+            breaker.before_request()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                breaker.record_failure()
+                if attempt + 1 == attempts:
+                    raise
+            except BaseException:
+                # Any other error still ends a half-open trial, or the breaker would never close
+                breaker.record_failure()
+                raise
+            else:
+                if response.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                if response.status_code not in RETRY_STATUSES or attempt + 1 == attempts:
+                    return response
+                response.close()
+            delay = self._delay(attempt)
+            if end is not None:
+                delay = min(delay, max(0.0, end - time.monotonic()))
+            time.sleep(delay)
+        raise AssertionError("unreachable")
+
+def _cap(timeout: Any, limit: float) -> Any:
+    """A requests timeout, a number or a (connect, read) pair, with each part at most limit."""
+    if timeout is None:
+        return limit
+    if isinstance(timeout, tuple):
+        return tuple(limit if t is None else min(t, limit) for t in timeout)
+    return min(timeout, limit)
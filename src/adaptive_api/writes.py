@@ -0,0 +1,229 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .pe import ApiPe, id_to_string
+
+JOB = 'job'
+PROGRAM = 'program'
+
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+
+SENT = 'sent'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+# ApiPe method sending each kind of change, in the order they are sent within a flush
+_SENDERS = OrderedDict([
+    ((JOB, INSERT), 'insert_jobs'),
+    ((JOB, UPDATE), 'update_jobs'),
+    ((JOB, DELETE), 'delete_jobs'),
+    ((PROGRAM, INSERT), 'insert_programs'),
+    ((PROGRAM, UPDATE), 'update_programs'),
+    ((PROGRAM, DELETE), 'delete_programs'),
+])
+
+@dataclass
+class WriteResult:
+    """Outcome of one queued change.
+
+    Changes merged into another one share its outcome. An insert cancelled
+    by a later delete, and that delete, are CANCELLED without a request.
+    """
+    kind: str  # 'job' or 'program'
+    action: str  # the action that was sent: 'insert', 'update' or 'delete'
+    key: str
+    status: str  # 'sent', 'cancelled' or 'failed'
+    response: Any = None
+    error: Optional[Exception] = None
+
+class _Pending:
+    """The change that will be sent for one job or program."""
+    __slots__ = ('action', 'payload', 'futures')
+
+    def __init__(self, action: str, payload: Any, future: 'Future[WriteResult]'):
+        self.action = action
+        self.payload = payload
+        self.futures = [future]
+
+Batch = Dict[Tuple[str, str], _Pending]
+
+class WriteQueue:
+    """Buffers job and program changes and sends them in coalesced batches.
+
+    Changes are collected for window seconds after the first one. Updates
+    to the same id are merged, an update after an insert is merged into
+    the insert, and an insert followed by a delete is dropped. Each flush
+    sends one request per kind of change, split into chunks of at most
+    max_batch items sent on max_workers threads. Every change returns a
+    Future of its WriteResult.
+
+    A change that cannot be merged, such as an insert after a delete of the
+    same id, first flushes the changes before it so the order is kept.
+    """
+    def __init__(self, client: ApiPe, window: float = 0.2, max_batch: int = 500, max_workers: int = 4):
+        self.client = client
+        self.window = window
+        self.max_batch = max_batch
+        self.max_workers = max_workers
+        self._buffer: Batch = OrderedDict()
+        self._ready: List[Batch] = []
+        self._sending: List[Batch] = []
+        self._deadline: Optional[float] = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._thread = threading.Thread(target=self._run, name='adaptive-api-writes', daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> 'WriteQueue':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    # Changes
+
+    def insert_jobs(self, inserts: Iterable[Dict[str, Any]]) -> List['Future[WriteResult]']:
+        return [self.submit(JOB, INSERT, job) for job in inserts]
+
+    def update_jobs(self, updates: Iterable[Dict[str, Any]]) -> List['Future[WriteResult]']:
+        return [self.submit(JOB, UPDATE, job) for job in updates]
+
+    def delete_jobs(self, ids: Iterable[Any]) -> List['Future[WriteResult]']:
+        return [self.submit(JOB, DELETE, job_id) for job_id in ids]
+
+    def insert_programs(self, inserts: Iterable[Dict[str, Any]]) -> List['Future[WriteResult]']:
+        return [self.submit(PROGRAM, INSERT, program) for program in inserts]
+
+    def update_programs(self, updates: Iterable[Dict[str, Any]]) -> List['Future[WriteResult]']:
+        return [self.submit(PROGRAM, UPDATE, program) for program in updates]
+
+    def delete_programs(self, ids: Iterable[Dict[str, str]]) -> List['Future[WriteResult]']:
+        return [self.submit(PROGRAM, DELETE, program) for program in ids]
+
+    def submit(self, kind: str, action: str, payload: Any) -> 'Future[WriteResult]':
+        """Queue one change. Job payloads are dicts with an 'id', or the id for deletes."""
+        if (kind, action) not in _SENDERS:
+            raise ValueError(f"Unknown change {kind} {action}")
+        key = (kind, _key(kind, action, payload))
+        future: 'Future[WriteResult]' = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("WriteQueue is closed")
+            pending = self._buffer.get(key)
+            if pending is None:
+                self._add(key, action, payload, future)
+            elif not _merge(pending, action, payload, future):
+                if pending.action == INSERT and action == DELETE:
+                    del self._buffer[key]
+                    for f in pending.futures + [future]:
+                        f.set_result(WriteResult(kind, action, key[1], CANCELLED))
+                else:
+                    # Keep the order: send what is buffered, then start over with this change
+                    self._ready.append(self._buffer)
+                    self._buffer = OrderedDict()
+                    self._add(key, action, payload, future)
+                    self._cond.notify()
+            if len(self._buffer) >= self.max_batch * self.max_workers:
+                self._deadline = time.monotonic()
+                self._cond.notify()
+        return future
+
+    def _add(self, key: Tuple[str, str], action: str, payload: Any, future: 'Future[WriteResult]') -> None:
+        self._buffer[key] = _Pending(action, payload, future)
+        if self._deadline is None:
+            self._deadline = time.monotonic() + self.window
+            self._cond.notify()
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Send everything queued so far now and wait until it has been sent."""
+        with self._cond:
+            batches = self._sending + self._ready + [self._buffer]
+            futures = [f for batch in batches for p in batch.values() for f in p.futures]
+            self._deadline = time.monotonic()
+            self._cond.notify()
+        wait(futures, timeout)
+
+    def close(self) -> None:
+        """Send the remaining changes and stop the queue."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self._executor.shutdown()
+
+    # Sending
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._buffer and (self._closed or time.monotonic() >= self._deadline):
+                        self._ready.append(self._buffer)
+                        self._buffer = OrderedDict()
+                    if self._ready or self._closed:
+                        break
+                    if not self._buffer:
+                        self._deadline = None
+                    timeout = self._deadline - time.monotonic() if self._deadline is not None else None
+                    self._cond.wait(timeout)
+                batches = self._sending = self._ready
+                self._ready = []
+                if not self._buffer:
+                    self._deadline = None
+                done = self._closed and not self._buffer
+            for batch in batches:
+                self._send(batch)
+            if done:
+                return
+
+    def _send(self, batch: Batch) -> None:
+        """Send one batch, waiting for every chunk before the next batch goes out."""
+        groups: Dict[Tuple[str, str], List[Tuple[str, _Pending]]] = {kind_action: [] for kind_action in _SENDERS}
+        for (kind, key), pending in batch.items():
+            groups[(kind, pending.action)].append((key, pending))
+        futures = []
+        for (kind, action), items in groups.items():
+            send = getattr(self.client, _SENDERS[(kind, action)])
+            for start in range(0, len(items), self.max_batch):
+                chunk = items[start:start + self.max_batch]
+                futures.append(self._executor.submit(_send_chunk, send, kind, action, chunk))
+        wait(futures)
+
+def _send_chunk(send: Any, kind: str, action: str, chunk: List[Tuple[str, _Pending]]) -> None:
+    try:
+        response = send([pending.payload for _, pending in chunk])
+    except Exception as e:
+        for key, pending in chunk:
+            for f in pending.futures:
+                f.set_result(WriteResult(kind, action, key, FAILED, error=e))
+        return
+    for key, pending in chunk:
+        for f in pending.futures:
+            f.set_result(WriteResult(kind, action, key, SENT, response))
+
+def _key(kind: str, action: str, payload: Any) -> str:
+    """Identity of the job or program a change applies to."""
+    if kind == JOB:
+        return id_to_string(payload if action == DELETE else payload['id'])
+    return id_to_string([payload.get('group', ''), payload.get('number', '')])
+
+def _merge(pending: _Pending, action: str, payload: Any, future: 'Future[WriteResult]') -> bool:
+    """Fold a change into the pending change of the same id, if they combine into one."""
+    if action == UPDATE and pending.action in (INSERT, UPDATE):
+        pending.payload = {**pending.payload, **payload}
+    elif action == DELETE and pending.action in (UPDATE, DELETE):
+        pending.action = DELETE
+        pending.payload = payload
+    else:
+        return False
+    pending.futures.append(future)
+    return True
@@ -0,0 +1,50 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web  # noqa: E402
+
+from adaptive_api import aio, pe  # noqa: E402
+
+from test_history_decode import assert_same, python_history, wire_history  # noqa: E402
+
+
+async def fetch_history(monkeypatch, body):
+    threads = []
+    decode_history = pe._decode_history
+
+    def recording(*args):
+        threads.append(threading.current_thread())
+        return decode_history(*args)
+
+    monkeypatch.setattr(pe, '_decode_history', recording)
+
+    async def handler(request):
+        return web.Response(body=body, content_type='application/json')
+
+    app = web.Application()
+    app.router.add_get('/api/v1/pe/history', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        async with aio.AsyncApiPe(f'http://127.0.0.1:{port}', 'token') as client:
+            history = await client.history('R1')
+    finally:
+        await runner.cleanup()
+    assert threads and threads[0] is not threading.main_thread()
+    return history
+
+
+def test_history_is_decoded_off_the_loop(monkeypatch):
+    history = asyncio.run(fetch_history(monkeypatch, json.dumps(wire_history()).encode()))
+    assert_same(history, python_history())
+
+
+def test_empty_history(monkeypatch):
+    assert asyncio.run(fetch_history(monkeypatch, b'')) is None
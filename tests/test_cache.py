@@ -0,0 +1,61 @@
+import json
+
+from adaptive_api.cache import ResponseCache
+from adaptive_api.live import ApiLive
+
+
+class JsonResponse:
+    def __init__(self, data, status_code=200):
+        self.status_code = status_code
+        self.content = json.dumps(data).encode()
+        self.headers = {'ETag': '"v1"'}
+        self._data = data
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        pass
+
+
+class ServerSession:
+    """Answers every request with the tags of one server."""
+    def __init__(self, tag_name):
+        self.tag_name = tag_name
+        self.calls = 0
+        self.headers = {}
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        return JsonResponse({'05': [{'name': self.tag_name, 'type': 'number'}]})
+
+
+def client(server, tag_name, cache):
+    api = ApiLive(server, 'token', cache=cache)
+    api.session = ServerSession(tag_name)
+    return api
+
+
+def test_clients_of_two_servers_share_a_cache():
+    cache = ResponseCache()
+    one = client('http://plant1', 'Plant1Tag', cache)
+    two = client('http://plant2', 'Plant2Tag', cache)
+    assert one.tags('05')[0].name == 'Plant1Tag'
+    assert two.tags('05')[0].name == 'Plant2Tag'
+    assert one.tags('05')[0].name == 'Plant1Tag'
+    assert (one.session.calls, two.session.calls) == (1, 1)
+    assert cache.stats()['entries'] == 2
+
+
+def test_invalidate_one_server():
+    cache = ResponseCache()
+    one = client('http://plant1', 'Plant1Tag', cache)
+    two = client('http://plant2', 'Plant2Tag', cache)
+    one.tags('05')
+    two.tags('05')
+    cache.invalidate('tags', server='http://plant1')
+    one.tags('05')
+    two.tags('05')
+    assert (one.session.calls, two.session.calls) == (2, 1)
+    cache.invalidate('tags', {'m': ['05']})
+    assert cache.stats()['entries'] == 0
@@ -0,0 +1,103 @@
+import csv
+import gzip
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from adaptive_api.cli import _ConcatWriter, _FileWriter, _parse_time, main
+from adaptive_api.pe import AdaptiveHistory, HistoryTag
+
+
+def history(job_id, tags=('Temp',)):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return AdaptiveHistory(job_id, start, start, [0, 1000, 2000],
+                           [HistoryTag(name, 'number', elapsedIndexes=[0, 2], values=[1, 2]) for name in tags])
+
+
+def read_rows(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        return list(csv.reader(f))
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'csv.gz'])
+def test_concat_resume_drops_interrupted_job(tmp_path, fmt):
+    output = str(tmp_path / f'all.{fmt}')
+    writer = _ConcatWriter(output, fmt, restart=False)
+    writer.write('A', history('A'))
+    writer.write('B', history('B', tags=('Level', 'Temp')))
+    writer.close()
+    complete = read_rows(output)
+    assert complete[0] == ['JobId', 'ElapsedTime', 'Time', 'Temp']
+    assert [row[0] for row in complete[1:]] == ['A'] * 3 + ['B'] * 3
+
+    # Job C was appended but the process died before it was recorded as done
+    with open(output, 'ab') as f:
+        f.write(gzip.compress(b'C,0,x,1\r\n') if fmt == 'csv.gz' else b'C,0,x,1\r\nC,10')
+    with open(output + '.done', 'a', encoding='utf-8') as f:
+        f.write('C\t')
+
+    writer = _ConcatWriter(output, fmt, restart=False)
+    assert writer.done('A') and writer.done('B') and not writer.done('C')
+    writer.write('C', history('C'))
+    writer.close()
+    rows = read_rows(output)
+    assert rows[:7] == complete
+    assert [row[0] for row in rows[1:]].count('C') == 3
+
+
+def test_concat_restart_starts_over(tmp_path):
+    output = str(tmp_path / 'all.csv')
+    writer = _ConcatWriter(output, 'csv', restart=False)
+    writer.write('A', history('A'))
+    writer.close()
+    writer = _ConcatWriter(output, 'csv', restart=True)
+    assert not writer.done('A')
+    writer.write('B', history('B'))
+    writer.close()
+    assert [row[0] for row in read_rows(output)] == ['JobId', 'B', 'B', 'B']
+
+
+def test_file_writer_skips_existing_files(tmp_path):
+    writer = _FileWriter(str(tmp_path), 'csv', restart=False)
+    assert not writer.done('A@1')
+    writer.write('A@1', history('A@1'))
+    assert os.path.exists(tmp_path / 'A@1.csv')
+    assert not os.path.exists(tmp_path / 'A@1.csv.part')
+    assert writer.done('A@1')
+    assert not _FileWriter(str(tmp_path), 'csv', restart=True).done('A@1')
+
+
+def test_parse_time():
+    assert _parse_time('1735689600000') == 1735689600000
+    assert _parse_time('2025-01-01T00:00:00Z') == 1735689600000
+
+
+def test_concat_parquet_streams_every_job(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    output = str(tmp_path / 'all.parquet')
+    writer = _ConcatWriter(output, 'parquet', restart=False)
+    writer.write('A', history('A'))
+    b = history('B', tags=('Level', 'Temp'))
+    b.tags[1].values = [1.5, 2]
+    writer.write('B', b)
+    writer.close()
+    table = pq.read_table(output)
+    assert table.column_names == ['JobId', 'ElapsedTime', 'Time', 'Temp', 'Level']
+    assert table.column('JobId').to_pylist() == ['A'] * 3 + ['B'] * 3
+    # Temp is int64 for A and float64 for B, Level is missing from A
+    assert table.column('Temp').to_pylist() == [1, 1, 2, 1.5, 1.5, 2]
+    assert table.column('Level').to_pylist() == [None] * 3 + [1, 1, 2]
+    assert pq.ParquetFile(output).num_row_groups == 2
+    assert not os.path.exists(output + '.part')
+
+
+def test_malformed_id_is_a_cli_error(tmp_path, capsys):
+    ids = tmp_path / 'ids.txt'
+    ids.write_text('R1\nR2@x\n', encoding='utf-8')
+    assert main(['histories', '--server', 'http://server', '--token', 't', '--ids', str(ids),
+                 '--output-dir', str(tmp_path / 'out')]) == 2
+    err = capsys.readouterr().err
+    assert err == f"adaptive-api: not a job ID in {ids}: 'R2@x'\n"
+    assert not os.path.exists(tmp_path / 'out')
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from adaptive_api.compare import STEP, STEP_TAG, align_histories  # noqa: E402
+from adaptive_api.pe import AdaptiveHistory, HistoryTag  # noqa: E402
+
+START = datetime(2025, 1, 1)
+
+
+def history(id, length, **tags):
+    """A history lasting length ms, with tags given as name=(type, [(time, value), ...])."""
+    times = sorted({t for _, samples in tags.values() for t, _ in samples})
+    positions = {t: n for n, t in enumerate(times)}
+    return AdaptiveHistory(id, START, START + timedelta(milliseconds=length), times,
+                           [HistoryTag(name, kind, elapsedIndexes=[positions[t] for t, _ in samples],
+                                       values=[v for _, v in samples])
+                            for name, (kind, samples) in tags.items()])
+
+
+def rows(matrix):
+    return [[None if np.isnan(v) else v for v in row] for row in matrix.tolist()]
+
+
+def test_interleaved_timestamps_are_forward_filled():
+    a = history('A', 50, Temp=('number', [(0, 1.0), (20, 2.0), (40, 3.0)]))
+    b = history('B', 50, Temp=('number', [(10, 10.0), (30, 20.0), (50, 30.0)]))
+    aligned = align_histories([a, b], points=6)
+    assert aligned.grid.tolist() == [0, 10, 20, 30, 40, 50]
+    assert rows(aligned.matrices['Temp']) == [[1, 1, 2, 2, 3, 3], [None, 10, 10, 20, 20, 30]]
+    interpolated = align_histories([a, b], points=6, interpolate=True)
+    assert rows(interpolated.matrices['Temp']) == [[1, 1.5, 2, 2.5, 3, 3], [None, 10, 15, 20, 25, 30]]
+
+
+def test_non_overlapping_ranges_are_nan_outside_each_batch():
+    a = history('A', 100, Level=('number', [(0, 1), (100, 2)]))
+    b = history('B', 300, Level=('number', [(200, 5), (300, 6)]))
+    aligned = align_histories([a, b], points=4)
+    assert aligned.grid.tolist() == [0, 100, 200, 300]
+    assert rows(aligned.matrices['Level']) == [[1, 2, None, None], [None, None, 5, 6]]
+    envelope = aligned.envelope('Level', percentiles=())
+    assert envelope.count.tolist() == [1, 1, 1, 1]
+    assert envelope.mean.tolist() == [1, 2, 5, 6]
+    assert rows(align_histories([a, b], points=2, duration=100).matrices['Level']) == [[1, 2], [None, None]]
+
+
+def test_boolean_tags_become_numbers():
+    a = history('A', 30, Pump=('boolean', [(0, False), (10, True)]), Name=('string', [(0, 'x')]))
+    b = history('B', 30, Pump=('boolean', [(0, True), (20, False)]))
+    aligned = align_histories([a, b], points=4)
+    assert list(aligned.matrices) == ['Pump']
+    assert rows(aligned.matrices['Pump']) == [[0, 1, 1, 1], [1, 1, 0, 0]]
+    envelope = aligned.envelope('Pump', percentiles=(50,), golden='A')
+    assert envelope.mean.tolist() == [0.5, 1, 0.5, 0.5]
+    assert rows(envelope.deviation) == [[0, 0, 0, 0], [1, 0, -1, -1]]
+    assert envelope.rms_deviation.tolist() == [0, np.sqrt(0.75)]
+
+
+def test_steps_are_matched_by_occurrence():
+    a = history('A', 40, **{STEP_TAG: ('number', [(0, 1), (10, 2), (30, 1)]), 'Temp': ('number', [(0, 0), (10, 5)])})
+    b = history('B', 80, **{STEP_TAG: ('number', [(0, 1), (20, 2)]), 'Temp': ('number', [(0, 1), (30, 7)])})
+    aligned = align_histories([a, b], by=STEP, points_per_step=2)
+    assert aligned.by == STEP and aligned.steps == [(1, 0), (2, 0), (1, 1)]
+    assert aligned.step_starts.tolist() == [0, 2, 4]
+    assert aligned.grid.tolist() == [0, 0.5, 1, 1.5, 2, 2.5]
+    # A's second step runs 10-30 ms, B's 20-80 ms; B has no second run of step 1
+    assert rows(aligned.matrices['Temp']) == [[0, 0, 5, 5, 5, 5], [1, 1, 1, 7, None, None]]
+    with pytest.raises(ValueError):
+        align_histories([a], by='time')
+    assert aligned.batch('B') == 1 and aligned.batch(-1) == 1
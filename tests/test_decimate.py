@@ -0,0 +1,79 @@
+from datetime import datetime
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from adaptive_api.decimate import LTTB, MINMAX, decimate_history, minmax_indexes  # noqa: E402
+from adaptive_api.pe import AdaptiveHistory, HistoryTag  # noqa: E402
+
+
+def history(*tags, n=1000):
+    return AdaptiveHistory('J1', datetime(2025, 1, 1), datetime(2025, 1, 2), list(range(0, 10 * n, 10)),
+                           [HistoryTag(name, kind, elapsedIndexes=list(range(len(values))), values=values)
+                            for name, kind, values in tags])
+
+
+def samples(h, name):
+    tag = next(t for t in h.tags if t.name == name)
+    return [h.elapsedTimes[i] for i in tag.elapsedIndexes], tag.values
+
+
+@pytest.mark.parametrize('method', [MINMAX, LTTB])
+def test_endpoints_are_kept(method):
+    rng = np.random.default_rng(1)
+    values = rng.normal(size=1000).tolist()
+    reduced = decimate_history(history(('Temp', 'number', values)), points=50, method=method)
+    times, kept = samples(reduced, 'Temp')
+    assert len(kept) <= 60
+    assert (times[0], kept[0]) == (0, values[0])
+    assert (times[-1], kept[-1]) == (9990, values[-1])
+
+
+def test_extremes_of_every_bucket_are_kept():
+    rng = np.random.default_rng(2)
+    values = rng.normal(size=1000).tolist()
+    reduced = decimate_history(history(('Temp', 'number', values)), points=20)
+    times, kept = samples(reduced, 'Temp')
+    # points // 2 equal time buckets of 1000 ms, each keeps its min and max
+    for bucket in range(10):
+        inside = values[bucket * 100:(bucket + 1) * 100]
+        bucket_kept = [v for t, v in zip(times, kept) if bucket * 1000 <= t < (bucket + 1) * 1000]
+        assert min(inside) in bucket_kept and max(inside) in bucket_kept
+    assert set(kept) <= set(values)
+
+
+def test_fewer_points_than_buckets_are_all_kept():
+    values = [3, 1.5, 7, None, 2]
+    h = history(('Temp', 'number', values), ('State', 'string', ['a', 'b', 'b', 'c', 'a']), n=5)
+    for method in (MINMAX, LTTB):
+        reduced = decimate_history(h, points=100, method=method)
+        assert samples(reduced, 'Temp') == ([0, 10, 20, 30, 40], values)
+    # Repeated values of string tags are dropped, as they hold anyway
+    assert samples(reduced, 'State') == ([0, 10, 30, 40], ['a', 'b', 'c', 'a'])
+    assert minmax_indexes(np.arange(3), np.array([1.0, 2.0, 3.0]), 10).tolist() == [0, 1, 2]
+
+
+def test_range_starts_with_the_held_value():
+    values = list(range(1000))
+    reduced = decimate_history(history(('Count', 'number', values)), points=10, after=5005, before=6000)
+    times, kept = samples(reduced, 'Count')
+    assert (times[0], kept[0]) == (5005, 500)
+    assert times[-1] < 6000 and kept[-1] == 599
+
+
+def test_short_pulses_of_boolean_tags_survive():
+    values = [False] * 1000
+    values[503] = True
+    reduced = decimate_history(history(('Pump', 'boolean', values)), points=12)
+    # Four buckets of 2500 ms, the pulse ends with the last sample of its bucket
+    assert samples(reduced, 'Pump') == ([0, 5030, 7490], [False, True, False])
+
+
+def test_gap_edges_are_kept():
+    values = [float(v) for v in range(1000)]
+    values[400:600] = [None] * 200
+    reduced = decimate_history(history(('Temp', 'number', values)), points=10)
+    times, kept = samples(reduced, 'Temp')
+    assert (3990, 399.0) in zip(times, kept) and (4000, None) in zip(times, kept)
+    assert (5990, None) in zip(times, kept) and (6000, 600.0) in zip(times, kept)
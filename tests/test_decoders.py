@@ -0,0 +1,94 @@
+import copy
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import pytest
+from dacite import Config, from_dict
+from dacite.exceptions import MissingValueError, UnexpectedDataError, WrongTypeError
+
+from adaptive_api import live
+from adaptive_api.decoders import decode, decoder_for
+from adaptive_api.pe import (AdaptiveHistory, ApiPe, DailyJobCount, HistoryTag, Tag, _decode_history,
+                             _fix_history_python)
+
+from test_history_decode import assert_same, python_history, wire_history
+
+
+@dataclass
+class Node:
+    name: str
+    weight: float = 1.0
+    children: List['Node'] = field(default_factory=list)
+    parent: Optional['Node'] = None
+
+
+def test_matches_dacite():
+    data = {'name': 'a', 'weight': 2, 'children': [{'name': 'b'}, {'name': 'c', 'children': [{'name': 'd'}]}]}
+    assert decode(Node, data) == from_dict(Node, data)
+    history = wire_history()
+    assert decode(AdaptiveHistory, history, ApiPe._config) == from_dict(AdaptiveHistory, history, ApiPe._config)
+
+
+def test_self_referential_dataclass():
+    node = decode(Node, {'name': 'a', 'parent': {'name': 'p'}, 'children': [{'name': 'b'}]})
+    assert node.parent == Node('p')
+    assert node.children == [Node('b')]
+
+
+def test_decode_does_not_share_payload_lists():
+    payload = wire_history()
+    original = copy.deepcopy(payload)
+    history = decode(AdaptiveHistory, payload, ApiPe._config)
+    _fix_history_python(history)
+    assert payload == original
+    assert_same(_decode_history(payload), python_history())
+    assert payload == original
+
+
+def test_scalar_fields_are_type_checked():
+    assert decode(DailyJobCount, {'day': 1, 'count': 2}) == DailyJobCount(1, 2)
+    with pytest.raises(WrongTypeError):
+        decode(DailyJobCount, {'day': 'x', 'count': 2})
+    with pytest.raises(WrongTypeError):
+        decode(Node, {'name': None})
+    with pytest.raises(MissingValueError):
+        decode(DailyJobCount, {'day': 1})
+
+
+def test_history_tags_get_generated_decoders():
+    # Tag.type is Union[str, Dict[str, Any]], which must not fall back to dacite
+    for cls in (Tag, HistoryTag):
+        assert decoder_for(cls, ApiPe._config).__name__ == 'decode', cls
+    wire = {'name': 'T', 'type': {'kind': 'enum'}, 'elapsedIndexes': [0, 1], 'values': ['a', 'b']}
+    tag = decode(HistoryTag, wire, ApiPe._config)
+    assert tag == from_dict(HistoryTag, wire, ApiPe._config)
+    assert tag.type is not wire['type'] and tag.values is not wire['values']
+
+
+@pytest.mark.parametrize('cls, data, config', [
+    (live.Program, {'number': '1', 'modifiedTime': '2025-01-01T00:00:00'}, None),
+    (Tag, {'name': 'T', 'type': 5}, ApiPe._config),
+    (Tag, {'name': 'T', 'type': 'number', 'io': 'x'}, ApiPe._config),
+    (HistoryTag, {'name': 'T', 'type': 'number', 'elapsedIndexes': 'x'}, ApiPe._config),
+    (Node, {'name': 'a', 'parent': 'p'}, None),
+    (Node, {'name': 'a', 'weight': '1'}, None),
+    (DailyJobCount, {'day': 1.5, 'count': 2}, None),
+    (DailyJobCount, {'day': True, 'count': 2}, None),
+    (Tag, {'name': 'T', 'type': 'number', 'minimum': 1}, ApiPe._config),
+    (live.Program, {'number': '1', 'steps': 3}, None),
+])
+def test_invalid_input_matches_dacite(cls, data, config):
+    try:
+        expected = from_dict(cls, copy.deepcopy(data), config)
+    except WrongTypeError:
+        with pytest.raises(WrongTypeError):
+            decode(cls, data, config)
+    else:
+        assert decode(cls, data, config) == expected
+
+
+def test_configs_with_other_options_use_dacite():
+    config = Config(strict=True)
+    with pytest.raises(UnexpectedDataError):
+        decode(DailyJobCount, {'day': 1, 'count': 2, 'extra': 3}, config)
+    assert decode(DailyJobCount, {'day': 1, 'count': 2, 'extra': 3}) == DailyJobCount(1, 2)
@@ -0,0 +1,90 @@
+import math
+from datetime import datetime
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from adaptive_api.export import (history_to_arrays, history_to_arrow, history_to_dataframe,  # noqa: E402
+                                 write_history_parquet)
+
+from test_history_decode import python_history  # noqa: E402
+
+START_MS = 1735689600000
+
+
+def expected_columns(history):
+    """Every tag forward filled onto the global steps by hand, None before its first sample."""
+    n = len(history.elapsedTimes)
+    columns = {'ElapsedTime': list(history.elapsedTimes),
+               'Time': [START_MS + t for t in history.elapsedTimes]}
+    for tag in history.tags:
+        column, value = [], None
+        samples = dict(zip(tag.elapsedIndexes, tag.values))
+        for step in range(n):
+            value = samples.get(step, value)
+            column.append(value)
+        columns[tag.name] = column
+    return columns
+
+
+def plain(value):
+    """A cell of any export as a plain Python value, times in epoch ms."""
+    if value is None or type(value).__name__ == 'NAType':
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, np.datetime64):
+        return int(value.astype('datetime64[ms]').astype(np.int64))
+    if isinstance(value, datetime):
+        return round(value.timestamp() * 1000)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def assert_columns(columns, history):
+    expected = expected_columns(history)
+    assert list(columns) == list(expected)
+    for name, want in expected.items():
+        got = [plain(v) for v in columns[name]]
+        # Columns have one type, so mixed ints and floats compare by value
+        assert got == want, name
+        assert {type(v) is bool for v in got if v is not None} <= {name == 'Running'}, name
+
+
+def test_numpy_round_trip():
+    history = python_history()
+    arrays = history_to_arrays(history)
+    assert arrays['Count'].dtype.kind == 'i' and arrays['Flow'].dtype.kind == 'f'
+    assert arrays['Running'].dtype == bool and arrays['Step'].dtype == object
+    assert_columns(arrays, history)
+
+
+def test_pandas_round_trip():
+    pytest.importorskip('pandas')
+    history = python_history()
+    frame = history_to_dataframe(history)
+    assert str(frame.index.tz) == 'UTC' and str(frame['Count'].dtype) == 'int64'
+    columns = {'ElapsedTime': frame['ElapsedTime'].tolist(), 'Time': list(frame.index)}
+    columns.update((name, frame[name].tolist()) for name in frame.columns if name != 'ElapsedTime')
+    assert_columns(columns, history)
+
+
+def test_arrow_round_trip():
+    pa = pytest.importorskip('pyarrow')
+    history = python_history()
+    table = history_to_arrow(history)
+    assert table.schema.field('Time').type == pa.timestamp('ms', tz='UTC')
+    assert table.schema.field('Running').type == pa.bool_()
+    assert_columns({name: table.column(name).to_pylist() for name in table.column_names}, history)
+
+
+def test_parquet_round_trip(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    history = python_history()
+    path = tmp_path / 'history.parquet'
+    write_history_parquet(history, path)
+    table = pq.read_table(path)
+    assert table.schema == history_to_arrow(history).schema
+    assert_columns({name: table.column(name).to_pylist() for name in table.column_names}, history)
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from adaptive_api.fleet import FleetClient, Site
+from adaptive_api.live import LiveMachine
+from adaptive_api.pe import Stoppage
+from adaptive_api.transport import Transport
+
+
+def test_site_timeout_is_the_request_deadline():
+    shared = Transport()
+    own = Transport(read_timeout=60.0)
+    with FleetClient([Site('P1', 'http://p1', 't'), Site('P2', 'http://p2', 't', timeout=30.0, transport=own)],
+                     timeout=5.0, transport=shared) as fleet:
+        assert fleet.live['P1'].transport.deadline == 5.0
+        assert fleet.pe['P1'].transport is fleet.live['P1'].transport
+        assert fleet.pe['P2'].transport.deadline == 30.0
+        assert fleet.pe['P2'].transport.default_timeout == (3.05, 60.0)
+        assert fleet.pe['P1'].transport.breaker('http://p1') is shared.breaker('http://p1')
+
+
+class StubLive:
+    def __init__(self, machines=(), delay=0.0, error=None):
+        self._machines = list(machines)
+        self.delay = delay
+        self.error = error
+        self.calls = []
+
+    def _answer(self, value):
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return value
+
+    def machines(self):
+        return self._answer([LiveMachine(m) for m in self._machines])
+
+    def tag_values_multiple(self, machines, tags):
+        self.calls.append(machines)
+        return self._answer({m: [f'{m}.{t}' for t in tags] for m in machines})
+
+
+class StubPe:
+    def __init__(self, resource):
+        self.resource = resource
+
+    def jobs_and_stoppages(self, after=None, before=None, **kwargs):
+        return [Stoppage(start=after, end=before, resource=self.resource, stoppage='S', id='1')]
+
+
+def fleet_with(live, timeout=5.0, sites=None):
+    sites = sites or [Site(name, f'http://{name}', 't') for name in live]
+    fleet = FleetClient(sites, timeout=timeout)
+    fleet.live.update(live)
+    return fleet
+
+
+def test_results_are_merged_with_qualified_names():
+    with fleet_with({'P1': StubLive(['01', '02']), 'P2': StubLive(['01'])}) as fleet:
+        result = fleet.machines()
+        assert [m.machine for m in result.value] == ['P1/01', 'P1/02', 'P2/01']
+        assert result.errors == {}
+        fleet.pe.update({'P1': StubPe('05'), 'P2': StubPe('07')})
+        items = fleet.jobs_and_stoppages(10, 20).value
+        assert sorted(i.resource for i in items) == ['P1/05', 'P2/07']
+        assert all((i.start, i.end) == (10, 20) for i in items)
+
+
+def test_machines_are_routed_to_their_site():
+    live = {'P1': StubLive(), 'P2': StubLive(), 'P3': StubLive()}
+    with fleet_with(live) as fleet:
+        result = fleet.tag_values_multiple(['P1/01', 'P2/03', 'P1/02'], ['Temp'])
+    assert result.value == {'P1/01': ['01.Temp'], 'P1/02': ['02.Temp'], 'P2/03': ['03.Temp']}
+    assert live['P1'].calls == [['01', '02']] and live['P2'].calls == [['03']]
+    assert live['P3'].calls == []
+    with pytest.raises(ValueError):
+        fleet.split('P9/01')
+
+
+def test_failing_site_is_reported():
+    error = ConnectionError('down')
+    with fleet_with({'P1': StubLive(['01']), 'P2': StubLive(error=error)}) as fleet:
+        result = fleet.machines()
+    assert [m.machine for m in result.value] == ['P1/01']
+    assert result.errors == {'P2': error}
+
+
+def test_slow_site_times_out_alone():
+    sites = [Site('P1', 'http://p1', 't'), Site('P2', 'http://p2', 't', timeout=0.1)]
+    with fleet_with({'P1': StubLive(['01'], delay=0.3), 'P2': StubLive(['01'], delay=2.0)},
+                    timeout=5.0, sites=sites) as fleet:
+        start = time.monotonic()
+        result = fleet.machines()
+        elapsed = time.monotonic() - start
+    # P1 is slower than P2's timeout but within its own, P2 is abandoned
+    assert [m.machine for m in result.value] == ['P1/01']
+    assert list(result.errors) == ['P2'] and isinstance(result.errors['P2'], TimeoutError)
+    assert elapsed < 1.5
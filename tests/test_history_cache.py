@@ -0,0 +1,131 @@
+import os
+import threading
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from adaptive_api import history_cache  # noqa: E402
+from adaptive_api.history_cache import HistoryCache  # noqa: E402
+
+from test_history_decode import assert_same, python_history, wire_history  # noqa: E402
+from adaptive_api.pe import _decode_history  # noqa: E402
+
+
+def test_put_and_get(tmp_path):
+    cache = HistoryCache(str(tmp_path))
+    assert cache.get('srv', 'R1') is None
+    assert cache.put('srv', 'R1', None, None, python_history())
+    assert_same(cache.get('srv', 'R1'), python_history())
+    subset = cache.get('srv', 'R1', tags=['Level'])
+    assert [t.name for t in subset.tags] == ['Level']
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1
+
+
+def test_replace_existing_entry(tmp_path):
+    cache = HistoryCache(str(tmp_path))
+    cache.put('srv', 'R1', None, None, python_history())
+    size = cache.stats()['bytes']
+    assert cache.put('srv', 'R1', None, None, python_history())
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'entries': 1, 'bytes': size}
+    assert_same(cache.get('srv', 'R1'), python_history())
+
+
+def test_failed_delete_stays_accounted(tmp_path, monkeypatch):
+    cache = HistoryCache(str(tmp_path))
+    cache.put('srv', 'R1', None, None, python_history())
+    size = cache.stats()['bytes']
+    # Simulate array files that cannot be deleted, as when memory-mapped on Windows
+    monkeypatch.setattr(history_cache.shutil, 'rmtree', lambda path, ignore_errors=False: None)
+    cache.max_bytes = size
+    cache.put('srv', 'R2', None, None, python_history())
+    stats = cache.stats()
+    assert stats['entries'] == 2
+    assert stats['bytes'] > size
+    # The entry is no longer served, and is retried once deleting works again
+    assert cache.get('srv', 'R1') is None
+    monkeypatch.undo()
+    cache.put('srv', 'R3', None, None, python_history())
+    assert cache.stats()['entries'] == 1
+    assert cache.stats()['bytes'] == size
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_replace_keeps_entry_that_cannot_be_deleted(tmp_path, monkeypatch):
+    cache = HistoryCache(str(tmp_path))
+    cache.put('srv', 'R1', None, None, python_history())
+    real_remove = os.remove
+
+    def locked(path):
+        if path.endswith(history_cache._META):
+            raise PermissionError(path)
+        real_remove(path)
+
+    monkeypatch.setattr(history_cache.os, 'remove', locked)
+    assert cache.put('srv', 'R1', None, None, python_history())
+    monkeypatch.undo()
+    assert cache.stats()['entries'] == 1
+    assert_same(cache.get('srv', 'R1'), python_history())
+    job_dir = os.path.join(tmp_path, os.listdir(tmp_path)[0])
+    assert len(os.listdir(job_dir)) == 1
+
+
+def test_counters_are_thread_safe(tmp_path):
+    cache = HistoryCache(str(tmp_path))
+
+    def lookups():
+        for _ in range(200):
+            cache.get('srv', 'R1')
+
+    threads = [threading.Thread(target=lookups) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cache.stats()['misses'] == 800
+
+
+def test_mixed_ints_and_floats_match_a_fetch(tmp_path):
+    fetched = _decode_history(wire_history())
+    cache = HistoryCache(str(tmp_path))
+    cache.put('srv', 'R1', None, None, fetched)
+    hit = cache.get('srv', 'R1')
+    assert_same(hit, python_history())
+    assert type(hit.tags[1].values[0]) is int and type(hit.tags[1].values[1]) is float
+    level = cache.get('srv', 'R1', tags=['Flow', 'Level']).tags[1]
+    assert level.values == python_history().tags[1].values
+    assert [type(v) for v in level.values] == [int, float, float, float]
+
+
+def test_filter_without_tags_needs_an_unrestricted_entry(tmp_path):
+    cache = HistoryCache(str(tmp_path))
+    cache.put('srv', 'R1', 'Temp*', ['Level'], python_history())
+    assert cache.get('srv', 'R1', 'Temp*') is None
+    assert cache.get('srv', 'R1', 'Temp*', ['Level']) is not None
+    cache.put('srv', 'R1', 'Temp*', None, python_history())
+    assert len(cache.get('srv', 'R1', 'Temp*').tags) == len(python_history().tags)
+
+
+def test_entry_evicted_while_read_is_a_miss(tmp_path, monkeypatch):
+    cache = HistoryCache(str(tmp_path))
+    cache.put('srv', 'R1', None, None, python_history())
+    read_meta = HistoryCache._read_meta
+    meta_read = threading.Event()
+    evicted = threading.Event()
+
+    def pausing(path):
+        meta = read_meta(path)
+        meta_read.set()
+        evicted.wait(5)
+        return meta
+
+    monkeypatch.setattr(HistoryCache, '_read_meta', staticmethod(pausing))
+    results = []
+    reader = threading.Thread(target=lambda: results.append(cache.get('srv', 'R1')))
+    reader.start()
+    assert meta_read.wait(5)
+    cache.clear()
+    evicted.set()
+    reader.join()
+    assert results == [None]
+    assert cache.stats()['misses'] == 1 and cache.stats()['hits'] == 0
@@ -0,0 +1,119 @@
+import io
+
+import pytest
+
+from adaptive_api.decoders import decode
+from adaptive_api.pe import (AdaptiveHistory, ApiPe, BooleanValues, _decode_history, _fix_history,
+                             _fix_history_python, write_history_csv)
+
+
+def wire_history():
+    """A history in the delta encoded form the server sends."""
+    return {
+        'id': 'R1',
+        'start': '2025-01-01T00:00:00.000Z',
+        'end': '2025-01-01T00:10:00.000Z',
+        'elapsedTimes': [0, 1000, 0, 0, 500, -500, 0],
+        'tags': [
+            {'name': 'Count', 'type': 'number', 'elapsedIndexes': [0, 2, 3], 'values': [1, 2, -1]},
+            {'name': 'Level', 'type': 'number', 'elapsedIndexes': [0, 1, 1, 1], 'values': [1, 0.5, 1, 2]},
+            {'name': 'Flow', 'type': 'number', 'elapsedIndexes': [1, 2], 'values': [0.25, 0.5]},
+            {'name': 'Since', 'type': 'date', 'elapsedIndexes': [0, 4], 'values': [1735689600000, 60000]},
+            {'name': 'Running', 'type': 'boolean', 'elapsedIndexes': [0, 2, 1, 3], 'values': [True]},
+            {'name': 'Step', 'type': 'string', 'elapsedIndexes': [0, 5], 'values': ['Fill', 'Heat']},
+            {'name': 'Empty', 'type': 'number', 'elapsedIndexes': [], 'values': []},
+        ],
+    }
+
+
+def python_history():
+    history = decode(AdaptiveHistory, wire_history(), ApiPe._config)
+    _fix_history_python(history)
+    return history
+
+
+def csv_text(history):
+    out = io.StringIO()
+    write_history_csv(history, out)
+    return out.getvalue()
+
+
+def assert_same(history, expected):
+    assert list(history.elapsedTimes) == expected.elapsedTimes
+    assert [t.name for t in history.tags] == [t.name for t in expected.tags]
+    for tag, want in zip(history.tags, expected.tags):
+        assert list(tag.elapsedIndexes) == want.elapsedIndexes, tag.name
+        assert list(tag.values) == want.values, tag.name
+        assert [type(v) for v in tag.values] == [type(v) for v in want.values], tag.name
+
+
+def test_python_decode():
+    history = python_history()
+    assert history.elapsedTimes == [0, 1000, 2000, 3000, 4500, 5500, 6500]
+    assert history.tags[1].values == [1, 1.5, 2.5, 4.5]
+    assert history.tags[4].values == [True, False, True, False]
+
+
+def test_numpy_decode_matches_python():
+    pytest.importorskip('numpy')
+    history = decode(AdaptiveHistory, wire_history(), ApiPe._config)
+    _fix_history(history)
+    assert_same(history, python_history())
+    assert csv_text(history) == csv_text(python_history())
+
+
+def test_numpy_arrays_match_python():
+    np = pytest.importorskip('numpy')
+    history = decode(AdaptiveHistory, wire_history(), ApiPe._config)
+    _fix_history(history, as_arrays=True)
+    expected = python_history()
+    assert isinstance(history.elapsedTimes, np.ndarray)
+    assert history.elapsedTimes.tolist() == expected.elapsedTimes
+    for tag, want in zip(history.tags, expected.tags):
+        assert np.asarray(tag.values).tolist() == want.values
+    assert history.tags[0].values.dtype == np.int64
+
+
+def test_mixed_number_deltas_keep_ints():
+    pytest.importorskip('numpy')
+    history = _decode_history(wire_history())
+    assert history.tags[1].values == [1, 1.5, 2.5, 4.5]
+    assert type(history.tags[1].values[0]) is int
+    assert '\n0,2025-01-01T00:00:00.000Z,1,1,' in csv_text(history)
+
+
+def test_without_numpy_matches_python(monkeypatch):
+    monkeypatch.setattr('adaptive_api.pe.np', None)
+    assert_same(_decode_history(wire_history()), python_history())
+
+
+def test_compact_matches_python():
+    history = _decode_history(wire_history(), compact=True)
+    expected = python_history()
+    assert list(history.elapsedTimes) == expected.elapsedTimes
+    for tag, want in zip(history.tags, expected.tags):
+        assert list(tag.elapsedIndexes) == want.elapsedIndexes, tag.name
+        assert list(tag.values) == want.values, tag.name
+    assert history.tags[0].values.typecode == 'q'
+    assert history.tags[2].values.typecode == 'd'
+    assert isinstance(history.tags[4].values, BooleanValues)
+
+
+def test_lazy_matches_python():
+    payload = wire_history()
+    history = _decode_history(payload, lazy=True)
+    assert not any(tag.decoded for tag in history.tags)
+    assert history.tags[1].values == [1, 1.5, 2.5, 4.5]
+    assert history.tags[1].decoded and not history.tags[0].decoded
+    assert_same(history, python_history())
+    assert csv_text(history) == csv_text(python_history())
+    assert payload == wire_history()
+
+
+def test_lazy_compact_matches_compact():
+    lazy = _decode_history(wire_history(), compact=True, lazy=True)
+    compact = _decode_history(wire_history(), compact=True)
+    assert list(lazy.elapsedTimes) == list(compact.elapsedTimes)
+    for tag, want in zip(lazy.tags, compact.tags):
+        assert list(tag.elapsedIndexes) == list(want.elapsedIndexes), tag.name
+        assert list(tag.values) == list(want.values), tag.name
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from adaptive_api.pe import ApiPe
+
+
+class Histories:
+    """Stands in for ApiPe.history, failing the ids in fail and delaying those in delays."""
+    def __init__(self, fail=(), delays=None):
+        self.fail = set(fail)
+        self.delays = delays or {}
+        self.calls = []
+        self.running = 0
+        self.most_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, job_id, tags_filter=None, tags=None):
+        with self._lock:
+            self.calls.append((job_id, tags_filter, tags))
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        try:
+            time.sleep(self.delays.get(job_id, 0.001))
+            if job_id in self.fail:
+                raise requests.HTTPError(f'404 for {job_id}')
+            return f'history of {job_id}'
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def client(histories):
+    pe = ApiPe('http://server', 'token')
+    pe.history = histories
+    return pe
+
+
+def test_failed_ids_are_reported_in_their_result():
+    histories = Histories(fail={'B', 'D'})
+    results = {r.job_id: r for r in client(histories).history_many('ABCDE', 'Temp*', ['Level'])}
+    assert sorted(results) == list('ABCDE')
+    assert {job_id for job_id, r in results.items() if r.error is not None} == {'B', 'D'}
+    assert isinstance(results['B'].error, requests.HTTPError) and results['B'].history is None
+    assert results['A'].history == 'history of A' and results['A'].error is None
+    assert sorted(histories.calls) == [(job_id, 'Temp*', ['Level']) for job_id in 'ABCDE']
+
+
+def test_ordered_results_follow_the_input():
+    histories = Histories(delays={'A': 0.2})
+    pe = client(histories)
+    assert [r.job_id for r in pe.history_many('ABC', max_workers=3, ordered=True)] == list('ABC')
+    assert [r.job_id for r in pe.history_many('ABC', max_workers=3)][-1] == 'A'
+
+
+def test_ids_are_consumed_as_results_are_yielded():
+    histories = Histories()
+    consumed = []
+
+    def ids():
+        for n in range(100):
+            consumed.append(n)
+            yield n
+
+    results = client(histories).history_many(ids(), max_workers=2)
+    next(results)
+    # Two results per worker are in flight, plus the one that replaced the first
+    assert len(consumed) <= 5
+    assert len(list(results)) == 99
+    assert histories.most_running <= 2
+
+
+def test_closing_early_cancels_the_rest():
+    histories = Histories(delays={n: 0.05 for n in range(50)})
+    results = client(histories).history_many(range(50), max_workers=2)
+    next(results)
+    results.close()
+    time.sleep(0.2)
+    assert len(histories.calls) < 10
+    with pytest.raises(StopIteration):
+        next(results)
@@ -0,0 +1,34 @@
+from adaptive_api.intervals import ALARM, DELAY, OTHER, RUNNING, STOPPED, IntervalIndex, event_category
+from adaptive_api.pe import AlarmEvent, DelayEvent, ResourceJobEvent, Stoppage, _decode_resource_events
+
+
+def resource_events_json():
+    return [
+        {'resource': '01', 'start': '2025-01-01T00:00:00.000Z', 'end': '2025-01-01T01:00:00.000Z', 'job': 'R1'},
+        {'resource': '01', 'start': '2025-01-01T01:00:00.000Z', 'end': '2025-01-01T01:10:00.000Z', 'alarm': 'Low level'},
+        {'resource': '01', 'start': '2025-01-01T01:10:00.000Z', 'end': '2025-01-01T01:20:00.000Z', 'delay': 'Operator'},
+        {'resource': '01', 'start': '2025-01-01T01:20:00.000Z', 'end': '2025-01-01T02:00:00.000Z',
+         'stoppage': 'Maintenance', 'id': 'S1'},
+        {'resource': '01', 'start': '2025-01-01T02:00:00.000Z', 'end': '2025-01-01T03:00:00.000Z'},
+    ]
+
+
+def test_resource_events_decode_to_subclasses():
+    events = _decode_resource_events(resource_events_json())
+    assert [type(e) for e in events[:4]] == [ResourceJobEvent, AlarmEvent, DelayEvent, Stoppage]
+    assert events[1].alarm == 'Low level'
+    assert events[0].start == 1735689600000
+
+
+def test_event_category_of_decoded_json():
+    events = _decode_resource_events(resource_events_json())
+    assert [event_category(e) for e in events] == [RUNNING, ALARM, DELAY, STOPPED, OTHER]
+
+
+def test_utilization_of_decoded_events():
+    events = _decode_resource_events(resource_events_json())
+    start = events[0].start
+    usage = IntervalIndex(events).utilization(start, start + 3 * 3600000, 3 * 3600000)
+    assert usage.get('01', RUNNING).tolist() == [3600000]
+    assert usage.get('01', ALARM).tolist() == [600000]
+    assert usage.get('01', DELAY).tolist() == [600000]
@@ -0,0 +1,76 @@
+from adaptive_api.metrics import Histogram, HistogramCollector, StageTimer
+
+from test_transport import FakeResponse, FakeSession, transport
+
+
+def test_histogram_buckets_include_their_upper_bound():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.count == 4 and histogram.sum == 5.65
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1.0) == float('inf')
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_prometheus_exposition():
+    collector = HistogramCollector(buckets=(0.1, 1.0))
+    collector.record_request('pe/jobs', 'GET', 200, 0.05, 100, 0)
+    collector.record_request('pe/jobs', 'GET', 200, 0.5, 50, 1)
+    collector.record_request('pe/jobs', 'GET', None, 2.0, 0, 2)
+    collector.record_stage('history', 'decode', 0.2)
+    assert collector.to_prometheus('test') == '''\
+# HELP test_request_duration_seconds Request latency including retries.
+# TYPE test_request_duration_seconds histogram
+test_request_duration_seconds_bucket{endpoint="pe/jobs",method="GET",le="0.1"} 1
+test_request_duration_seconds_bucket{endpoint="pe/jobs",method="GET",le="1.0"} 2
+test_request_duration_seconds_bucket{endpoint="pe/jobs",method="GET",le="+Inf"} 3
+test_request_duration_seconds_sum{endpoint="pe/jobs",method="GET"} 2.55
+test_request_duration_seconds_count{endpoint="pe/jobs",method="GET"} 3
+# HELP test_requests_total Requests by response status.
+# TYPE test_requests_total counter
+test_requests_total{endpoint="pe/jobs",method="GET",status="200"} 2
+test_requests_total{endpoint="pe/jobs",method="GET",status="error"} 1
+# HELP test_response_bytes_total Response body bytes received.
+# TYPE test_response_bytes_total counter
+test_response_bytes_total{endpoint="pe/jobs",method="GET"} 150
+# HELP test_retries_total Retried request attempts.
+# TYPE test_retries_total counter
+test_retries_total{endpoint="pe/jobs",method="GET"} 3
+# HELP test_stage_duration_seconds Duration of pipeline stages.
+# TYPE test_stage_duration_seconds histogram
+test_stage_duration_seconds_bucket{pipeline="history",stage="decode",le="0.1"} 0
+test_stage_duration_seconds_bucket{pipeline="history",stage="decode",le="1.0"} 1
+test_stage_duration_seconds_bucket{pipeline="history",stage="decode",le="+Inf"} 1
+test_stage_duration_seconds_sum{pipeline="history",stage="decode"} 0.2
+test_stage_duration_seconds_count{pipeline="history",stage="decode"} 1
+'''
+
+
+def test_label_values_are_escaped():
+    collector = HistogramCollector(buckets=(1.0,))
+    collector.record_stage('a"b', 'c\\d\ne', 0.5)
+    assert 'pipeline="a\\"b",stage="c\\\\d\\ne"' in collector.to_prometheus()
+
+
+def test_stage_timer():
+    collector = HistogramCollector()
+    timer = StageTimer(collector, 'history')
+    with timer('fetch'):
+        pass
+    with timer('decode'):
+        pass
+    assert sorted(collector.stages) == [('history', 'decode'), ('history', 'fetch')]
+
+
+def test_requests_are_labelled_with_api_and_path():
+    collector = HistogramCollector()
+    session = FakeSession(FakeResponse(), FakeResponse(), FakeResponse(500))
+    t = transport(retries=0)
+    t.request(session, 'http://s', 'GET', 'http://s/api/v1/pe/jobs', 'jobs', collector, 'pe')
+    t.request(session, 'http://s', 'GET', 'http://s/api/v1/live/jobs', 'jobs', collector, 'live')
+    t.request(session, 'http://s', 'GET', 'http://s/jobs', 'jobs', collector)
+    assert sorted(collector.requests) == [('jobs', 'GET'), ('live/jobs', 'GET'), ('pe/jobs', 'GET')]
+    assert collector.statuses[('jobs', 'GET', '500')] == 1
@@ -0,0 +1,59 @@
+import pytest
+
+from adaptive_api.recorder import TagRecorder
+
+
+def recorder(**kwargs):
+    return TagRecorder(None, **kwargs)
+
+
+def tag_types(rec, machine='M1'):
+    return {tag.name: tag.type for tag in rec.history(machine).tags}
+
+
+def test_changes_are_recorded():
+    rec = recorder(segment_size=3)
+    for t, value in enumerate([1, 1, 2, 2.5, 2.5, None, 3]):
+        rec.add('M1', {'Level': value}, timestamp=1000 + t)
+    assert rec.range('M1', 'Level') == ([1000, 1002, 1003, 1005, 1006], [1, 2, 2.5, None, 3])
+    assert rec.latest('M1', 'Level', 2) == [(1005, None), (1006, 3)]
+    assert rec.range('M1', 'Level', 1002, 1005) == ([1002, 1003], [2, 2.5])
+
+
+@pytest.mark.parametrize('values, expected', [
+    ([1, 2.5, 3], 'number'),
+    ([None, 1, None], 'number'),
+    ([True, False], 'boolean'),
+    ([1, 2, 'fault'], 'string'),
+    ([False, 1], 'string'),
+    (['a', 1], 'string'),
+    ([None], 'string'),
+])
+def test_tag_type_covers_every_value(values, expected):
+    rec = recorder(segment_size=2)
+    for t, value in enumerate(values):
+        rec.add('M1', {'T': value}, timestamp=t)
+    history = rec.history('M1')
+    assert history.tags[0].type == expected
+    assert history.tags[0].values == values
+
+
+def test_tag_type_survives_a_restart(tmp_path):
+    with recorder(directory=str(tmp_path), segment_size=2) as rec:
+        for t, value in enumerate([1, 2, 3, 4, 'fault']):
+            rec.add('M1', {'State': value, 'Level': float(t)}, timestamp=t)
+    rec = recorder(directory=str(tmp_path))
+    assert tag_types(rec) == {'State': 'string', 'Level': 'number'}
+    assert rec.range('M1', 'State') == ([0, 1, 2, 3, 4], [1, 2, 3, 4, 'fault'])
+    rec.add('M1', {'Level': True}, timestamp=10)
+    assert tag_types(rec)['Level'] == 'string'
+
+
+def test_history_starts_with_held_values():
+    rec = recorder()
+    rec.add('M1', {'A': 1, 'B': 'x'}, timestamp=1000)
+    rec.add('M1', {'A': 2}, timestamp=2000)
+    history = rec.history('M1', after=1500)
+    assert history.elapsedTimes == [0, 500]
+    assert [(t.elapsedIndexes, t.values) for t in history.tags] == [([0, 1], [1, 2]), ([0], ['x'])]
+    assert rec.history('M2') is None
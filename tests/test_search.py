@@ -0,0 +1,30 @@
+from adaptive_api.pe import InBoxJob, Job
+from adaptive_api.search import SearchIndex
+
+
+def make_index():
+    index = SearchIndex(client=None, fallback=False)
+    index.update([
+        InBoxJob(id='B@2@0', resource='R1', notes='String id with a trailing zero'),
+        Job(id=['A', 1, 0], resource='R2', start=0, end=1),
+        Job(id='A@12', resource='R2', start=0, end=1),
+    ])
+    return index
+
+
+def test_exact_id_ignores_trailing_zero():
+    index = make_index()
+    assert index.search_local('B@2@0')[0].id == 'B@2@0'
+    assert index.search_local('b@2')[0].id == 'B@2@0'
+    assert index.search_local(['B', 2])[0].id == 'B@2@0'
+    assert [job.id for job in index.search_local('B@2@0@0')] == ['B@2@0']
+
+
+def test_exact_id_of_list_id_comes_first():
+    index = make_index()
+    assert index.search_local('A@1@0')[0].id == ['A', 1, 0]
+    assert [job.id for job in index.search_local('a@1')] == [['A', 1, 0], 'A@12']
+
+
+def test_substring_match():
+    assert [job.id for job in make_index().search_local('trailing')] == ['B@2@0']
@@ -0,0 +1,78 @@
+import copy
+
+import pytest
+
+from adaptive_api.pe import ApiPe, _decode_history
+from adaptive_api.streaming import decode_history_events, decode_history_json
+
+from test_history_decode import assert_same, python_history, wire_history
+
+
+def parse_events(value, prefix=''):
+    """(prefix, event, value) events as ijson.parse(..., use_float=True) yields them."""
+    if isinstance(value, dict):
+        yield prefix, 'start_map', None
+        for key, item in value.items():
+            yield prefix, 'map_key', key
+            yield from parse_events(item, f'{prefix}.{key}' if prefix else key)
+        yield prefix, 'end_map', None
+    elif isinstance(value, list):
+        yield prefix, 'start_array', None
+        for item in value:
+            yield from parse_events(item, f'{prefix}.item' if prefix else 'item')
+        yield prefix, 'end_array', None
+    elif value is None:
+        yield prefix, 'null', None
+    elif isinstance(value, bool):
+        yield prefix, 'boolean', value
+    elif isinstance(value, (int, float)):
+        yield prefix, 'number', value
+    else:
+        yield prefix, 'string', value
+
+
+def with_commands(history):
+    history['commands'] = [{'id': 1, 'name': 'Fill', 'values': [1, 2]}]
+    return history
+
+
+def test_events_match_decode():
+    assert_same(decode_history_events(parse_events(wire_history())), python_history())
+
+
+def test_events_with_values_before_type():
+    history = wire_history()
+    history['tags'] = [{'values': t['values'], 'elapsedIndexes': t['elapsedIndexes'], 'name': t['name'],
+                        'type': t['type']} for t in history['tags']]
+    assert_same(decode_history_events(parse_events(history)), python_history())
+
+
+def test_events_keep_other_fields():
+    data = with_commands(wire_history())
+    streamed = decode_history_events(parse_events(data))
+    assert streamed.commands == _decode_history(copy.deepcopy(data)).commands
+    assert (streamed.id, streamed.start, streamed.end) == ('R1', python_history().start, python_history().end)
+
+
+def test_events_compact_match_decode():
+    pytest.importorskip('numpy')
+    streamed = decode_history_events(parse_events(wire_history()), compact=True)
+    expected = _decode_history(wire_history(), compact=True)
+    assert list(streamed.elapsedTimes) == list(expected.elapsedTimes)
+    for tag, want in zip(streamed.tags, expected.tags):
+        assert list(tag.elapsedIndexes) == list(want.elapsedIndexes), tag.name
+        assert list(tag.values) == list(want.values), tag.name
+
+
+def test_empty_response():
+    assert decode_history_events(parse_events(None)) is None
+    assert decode_history_json(None) is None
+
+
+def test_json_matches_decode():
+    assert_same(decode_history_json(wire_history()), python_history())
+
+
+def test_stream_and_lazy_cannot_be_combined():
+    with pytest.raises(ValueError):
+        ApiPe('http://server', 'token', lazy_history=True, stream_history=True)
@@ -0,0 +1,84 @@
+import pytest
+
+from adaptive_api.subscriptions import RUNNING_TAG, TagSubscriptions
+
+
+class FakeLive:
+    """Serves tag values from {machine: {tag: value}}."""
+    def __init__(self, values):
+        self.values = values
+        self.calls = []
+
+    def tag_values_multiple(self, machines, tags):
+        self.calls.append((machines, tags))
+        return {m: [self.values[m].get(t) for t in tags] for m in machines if m in self.values}
+
+
+def recorder():
+    seen = []
+    return seen, lambda machine, values: seen.append((machine, values))
+
+
+def test_merged_request_and_notification_on_change():
+    live = FakeLive({'01': {'Temp': 20, RUNNING_TAG: 2}, '02': {'Temp': 30, 'Level': 1, RUNNING_TAG: 2}})
+    subs = TagSubscriptions(live)
+    seen1, cb1 = recorder()
+    seen2, cb2 = recorder()
+    subs.subscribe('01', ['Temp'], 1.0, cb1)
+    subs.subscribe('02', ['Temp', 'Level'], 1.0, cb2)
+    assert subs.poll(now=0.0) == 1.0
+    assert live.calls == [(['01', '02'], ['Temp', 'Level', RUNNING_TAG])]
+    assert seen1 == [('01', {'Temp': 20})]
+    assert seen2 == [('02', {'Temp': 30, 'Level': 1})]
+
+    live.values['02']['Level'] = 2
+    subs.poll(now=1.0)
+    assert seen1 == [('01', {'Temp': 20})]  # unchanged, not notified again
+    assert seen2[-1] == ('02', {'Temp': 30, 'Level': 2})
+
+
+def test_only_due_subscriptions_are_polled_and_idle_machines_slow_down():
+    live = FakeLive({'01': {'Temp': 20, RUNNING_TAG: 0}, '02': {'Temp': 30, RUNNING_TAG: 2}})
+    subs = TagSubscriptions(live, idle_factor=5.0)
+    subs.subscribe('01', ['Temp'], 1.0, lambda *a: None)
+    subs.subscribe('02', ['Temp'], 1.0, lambda *a: None)
+    subs.poll(now=0.0)
+    subs.poll(now=1.0)
+    assert live.calls[-1][0] == ['02']  # 01 is not running, next due at 5
+
+
+def test_failing_callback_does_not_block_others():
+    live = FakeLive({'01': {'Temp': 20, RUNNING_TAG: 2}})
+    errors = []
+    subs = TagSubscriptions(live, on_error=errors.append)
+    seen, cb = recorder()
+
+    def failing(machine, values):
+        raise RuntimeError('boom')
+
+    subs.subscribe('01', ['Temp'], 1.0, failing)
+    subs.subscribe('01', ['Temp'], 1.0, cb)
+    subs.poll(now=0.0)
+    assert seen == [('01', {'Temp': 20})]
+    assert [str(e) for e in errors] == ['boom']
+
+
+def test_failing_callback_without_on_error_raises_after_notifying_all():
+    live = FakeLive({'01': {'Temp': 20, RUNNING_TAG: 2}})
+    subs = TagSubscriptions(live)
+    seen, cb = recorder()
+    subs.subscribe('01', ['Temp'], 1.0, lambda m, v: 1 / 0)
+    subs.subscribe('01', ['Temp'], 1.0, cb)
+    with pytest.raises(ZeroDivisionError):
+        subs.poll(now=0.0)
+    assert seen == [('01', {'Temp': 20})]
+
+
+def test_unsubscribe():
+    live = FakeLive({'01': {'Temp': 20, RUNNING_TAG: 2}})
+    subs = TagSubscriptions(live)
+    seen, cb = recorder()
+    subscription = subs.subscribe('01', ['Temp'], 1.0, cb)
+    subs.unsubscribe(subscription)
+    subs.poll(now=0.0)
+    assert seen == [] and live.calls == []
@@ -0,0 +1,114 @@
+from adaptive_api.pe import InBoxGroupAndJobs, InBoxJob, Job, Stoppage
+from adaptive_api.sync import HOUR, INBOX, JOB, ScheduleMirror
+
+
+class FakeClient:
+    """Serves a schedule held in a list, like ApiPe.jobs_and_stoppages."""
+    def __init__(self):
+        self.items = []
+        self.inbox = []
+        self.calls = []
+
+    def jobs_and_stoppages(self, after=None, before=None, job_props=None):
+        self.calls.append((after, before))
+        return [item for item in self.items
+                if (before is None or item.start is None or item.start < before)
+                and (after is None or item.end is None or item.end >= after)]
+
+    def search(self, text, limit=None):
+        self.calls.append(('search', text))
+        return [item for item in self.items + self.inbox if text in item.id]
+
+    def inbox_jobs(self):
+        return [InBoxGroupAndJobs('Group', ['01'], list(self.inbox))]
+
+
+def job(job_id, start, end=None):
+    return Job(job_id, '01', start=start, end=start + HOUR if end is None else end)
+
+
+def actions(changes):
+    return sorted((c.action, c.kind, c.key) for c in changes)
+
+
+def test_refresh_inserts_updates_and_deletes():
+    client = FakeClient()
+    client.items = [job('A', 0), job('B', HOUR), Stoppage(2 * HOUR, 3 * HOUR, '01', 'Clean', 'S1')]
+    mirror = ScheduleMirror(client, trailing=HOUR, lookahead=10 * HOUR)
+    assert actions(mirror.refresh(now=0)) == [('insert', 'job', 'A'), ('insert', 'job', 'B'),
+                                              ('insert', 'stoppage', 'S1')]
+    assert mirror.refresh(now=0) == []
+
+    client.items[1] = job('B', HOUR, 2 * HOUR + 1)
+    del client.items[0]
+    assert actions(mirror.refresh(now=0)) == [('delete', 'job', 'A'), ('update', 'job', 'B')]
+    assert mirror.get('A') is None
+    assert mirror.get('B').end == 2 * HOUR + 1
+    assert [item.id for item in mirror.in_range(0, 10 * HOUR)] == ['B', 'S1']
+
+
+def test_job_rescheduled_past_the_window_is_updated_not_deleted():
+    client = FakeClient()
+    client.items = [job('A', HOUR), Stoppage(2 * HOUR, 3 * HOUR, '01', 'Clean', 'S1')]
+    mirror = ScheduleMirror(client, trailing=HOUR, lookahead=10 * HOUR)
+    mirror.refresh(now=0)
+    client.items = [job('A', 15 * HOUR), Stoppage(12 * HOUR, 13 * HOUR, '01', 'Clean', 'S1')]
+    changes = mirror.refresh(now=0)
+    assert actions(changes) == [('update', 'job', 'A'), ('update', 'stoppage', 'S1')]
+    assert mirror.get('A').start == 15 * HOUR
+    # The lookups after the window are bounded by the lookahead
+    assert client.calls[-2:] == [(-11 * HOUR, -HOUR), (10 * HOUR, 20 * HOUR)]
+
+
+def test_job_rescheduled_far_away_is_found_by_id():
+    client = FakeClient()
+    client.items = [job('A', HOUR), job('AB', 2 * HOUR)]
+    mirror = ScheduleMirror(client, trailing=HOUR, lookahead=10 * HOUR)
+    mirror.refresh(now=0)
+    client.items = [job('A', 100 * HOUR), job('AB', -100 * HOUR)]
+    changes = mirror.refresh(now=0)
+    assert actions(changes) == [('update', 'job', 'A'), ('update', 'job', 'AB')]
+    assert mirror.get('A').start == 100 * HOUR
+    assert mirror.get('AB').start == -100 * HOUR
+
+
+def test_job_rescheduled_earlier_is_updated():
+    client = FakeClient()
+    client.items = [job('A', HOUR)]
+    mirror = ScheduleMirror(client, trailing=HOUR, lookahead=10 * HOUR)
+    mirror.refresh(now=0)
+    client.items = [job('A', -5 * HOUR)]
+    assert actions(mirror.refresh(now=0)) == [('update', 'job', 'A')]
+    assert ('search', 'A') not in client.calls
+
+
+def test_open_ended_rows_are_in_scope():
+    client = FakeClient()
+    client.items = [Job('A', '01', start=0, end=None), Job('B', '01', start=None, end=None)]
+    mirror = ScheduleMirror(client, trailing=HOUR, lookahead=10 * HOUR)
+    mirror.refresh(now=0)
+    assert [item.id for item in mirror.in_range(0, HOUR)] == ['B', 'A']
+    client.items = []
+    assert actions(mirror.refresh(now=0)) == [('delete', 'job', 'A'), ('delete', 'job', 'B')]
+    assert mirror.in_range(0, HOUR) == []
+
+
+def test_job_moved_to_inbox():
+    client = FakeClient()
+    client.items = [job('A', HOUR)]
+    mirror = ScheduleMirror(client, trailing=HOUR, lookahead=10 * HOUR)
+    mirror.refresh(now=0)
+    client.items = []
+    client.inbox = [InBoxJob('A', 'Group')]
+    assert actions(mirror.refresh(now=0)) == [('insert', INBOX, 'A'), ('moved', JOB, 'A')]
+    assert mirror.get('A') is None
+    assert mirror.get('A', INBOX).id == 'A'
+
+
+def test_unchanged_window_does_not_fetch_further():
+    client = FakeClient()
+    client.items = [job('A', HOUR)]
+    mirror = ScheduleMirror(client, trailing=HOUR, lookahead=10 * HOUR)
+    mirror.refresh(now=0)
+    mirror.refresh(now=0)
+    assert client.calls == [(-HOUR, 10 * HOUR), (-HOUR, 10 * HOUR)]
@@ -0,0 +1,118 @@
+import pytest
+import requests
+
+from adaptive_api.transport import CircuitBreaker, CircuitOpenError, Transport
+
+
+class FakeResponse:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.content = b'{}'
+        self.headers = {}
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """Answers requests from a list of responses or exceptions."""
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def transport(**kwargs):
+    kwargs.setdefault('backoff', 0.0)
+    return Transport(**kwargs)
+
+
+def test_breaker_opens_and_closes_after_trial(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr('adaptive_api.transport.time.monotonic', lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0)
+    breaker.before_request()
+    breaker.record_failure()
+    breaker.before_request()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    now[0] = 11.0
+    breaker.before_request()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()  # only one trial at a time
+    breaker.record_success()
+    breaker.before_request()
+    assert not breaker.is_open
+
+
+def test_unexpected_error_ends_trial(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr('adaptive_api.transport.time.monotonic', lambda: now[0])
+    t = transport(failure_threshold=1, reset_timeout=10.0, retries=0)
+    session = FakeSession(requests.exceptions.ConnectionError(),
+                          requests.exceptions.ChunkedEncodingError(),
+                          FakeResponse(200))
+    with pytest.raises(requests.exceptions.ConnectionError):
+        t.request(session, 'http://s', 'GET', 'http://s/x', 'x')
+    now[0] = 11.0
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        t.request(session, 'http://s', 'GET', 'http://s/x', 'x')
+    with pytest.raises(CircuitOpenError):
+        t.request(session, 'http://s', 'GET', 'http://s/x', 'x')
+    now[0] = 22.0
+    assert t.request(session, 'http://s', 'GET', 'http://s/x', 'x').status_code == 200
+    assert not t.breaker('http://s').is_open
+
+
+def test_get_is_retried_and_post_is_not(monkeypatch):
+    monkeypatch.setattr('adaptive_api.transport.time.sleep', lambda s: None)
+    t = transport(retries=2)
+    session = FakeSession(FakeResponse(503), requests.exceptions.Timeout(), FakeResponse(200))
+    assert t.request(session, 'http://s', 'GET', 'http://s/x', 'x').status_code == 200
+    assert len(session.calls) == 3
+    session = FakeSession(FakeResponse(503), FakeResponse(200))
+    assert t.request(session, 'http://s', 'POST', 'http://s/x', 'x').status_code == 503
+    assert len(session.calls) == 1
+
+
+def test_timeouts_are_keyed_by_api():
+    t = transport(read_timeout=5.0, timeouts={'pe/jobs': (1.0, 30.0), 'tags': (1.0, 2.0)})
+    assert t.timeout('jobs', 'pe') == (1.0, 30.0)
+    assert t.timeout('jobs', 'live') == (3.05, 5.0)
+    assert t.timeout('tags', 'live') == (1.0, 2.0)
+    session = FakeSession(FakeResponse(200), FakeResponse(200))
+    t.request(session, 'http://s', 'GET', 'http://s/jobs', 'jobs', api='live')
+    t.request(session, 'http://s', 'GET', 'http://s/jobs', 'jobs', api='pe')
+    assert [kwargs['timeout'] for _, _, kwargs in session.calls] == [(3.05, 5.0), (1.0, 30.0)]
+
+
+def test_deadline_caps_attempts(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr('adaptive_api.transport.time.monotonic', lambda: now[0])
+    monkeypatch.setattr('adaptive_api.transport.time.sleep', lambda s: now.__setitem__(0, now[0] + s))
+    t = transport(read_timeout=30.0, retries=5, deadline=4.0)
+
+    class SlowSession(FakeSession):
+        def request(self, method, url, **kwargs):
+            now[0] += 2.5
+            return super().request(method, url, **kwargs)
+
+    session = SlowSession(*[requests.exceptions.Timeout()] * 6)
+    with pytest.raises(requests.exceptions.Timeout):
+        t.request(session, 'http://s', 'GET', 'http://s/x', 'x')
+    assert [kwargs['timeout'] for _, _, kwargs in session.calls] == [(3.05, 4.0), (1.5, 1.5)]
+
+
+def test_bounded_shares_breakers():
+    t = transport()
+    bounded = t.bounded(2.0)
+    assert bounded.deadline == 2.0 and t.deadline is None
+    assert bounded.breaker('http://s') is t.breaker('http://s')
+    assert bounded.bounded(5.0).deadline == 2.0
@@ -0,0 +1,19 @@
+from adaptive_api.pe import Job, _iter_windows
+
+
+def run(items, after=0, before=30, window=10):
+    def fetch(span):
+        return [job for job in items if (job.start is None or job.start < span[1])
+                and (job.end is None or job.end >= span[0])]
+
+    return [job.id for job in _iter_windows(fetch, lambda job: job.id, after, before, window, 2)]
+
+
+def test_spanning_items_are_yielded_once():
+    items = [Job('A', 'R', start=0, end=5), Job('B', 'R', start=5, end=25), Job('C', 'R', start=12, end=14)]
+    assert run(items) == ['A', 'B', 'C']
+
+
+def test_items_without_end_are_yielded_once():
+    items = [Job('A', 'R', start=2, end=None), Job('B', 'R', start=None, end=None), Job('C', 'R', start=21, end=22)]
+    assert sorted(run(items)) == ['A', 'B', 'C']
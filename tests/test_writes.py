@@ -0,0 +1,96 @@
+import threading
+
+from adaptive_api.writes import CANCELLED, DELETE, FAILED, INSERT, JOB, SENT, UPDATE, WriteQueue
+
+
+class FakeClient:
+    """Records the batches sent by each ApiPe change method."""
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = set(fail)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        def send(items):
+            with self._lock:
+                self.calls.append((name, list(items)))
+            if name in self.fail:
+                raise RuntimeError(f'{name} failed')
+            return {'ok': len(items)}
+        return send
+
+
+def results(futures):
+    return [f.result(5) for f in futures]
+
+
+def test_updates_are_merged():
+    client = FakeClient()
+    with WriteQueue(client, window=60) as queue:
+        futures = queue.update_jobs([{'id': 'A', 'notes': 'x'}, {'id': 'A', 'color': 'red'}])
+        futures += queue.insert_jobs([{'id': 'B', 'resource': '01'}])
+        futures += queue.update_jobs([{'id': 'B', 'notes': 'y'}])
+        queue.flush()
+    assert client.calls == [('insert_jobs', [{'id': 'B', 'resource': '01', 'notes': 'y'}]),
+                            ('update_jobs', [{'id': 'A', 'notes': 'x', 'color': 'red'}])]
+    assert [(r.action, r.key, r.status) for r in results(futures)] == [
+        (UPDATE, 'A', SENT), (UPDATE, 'A', SENT), (INSERT, 'B', SENT), (INSERT, 'B', SENT)]
+
+
+def test_insert_then_delete_cancels_both():
+    client = FakeClient()
+    with WriteQueue(client, window=60) as queue:
+        futures = queue.insert_jobs([{'id': 'A'}]) + queue.delete_jobs(['A'])
+        queue.flush()
+    assert client.calls == []
+    assert [r.status for r in results(futures)] == [CANCELLED, CANCELLED]
+
+
+def test_update_then_delete_sends_the_delete():
+    client = FakeClient()
+    with WriteQueue(client, window=60) as queue:
+        futures = queue.update_jobs([{'id': 'A'}]) + queue.delete_jobs(['A'])
+        queue.flush()
+    assert client.calls == [('delete_jobs', ['A'])]
+    assert [(r.action, r.status) for r in results(futures)] == [(DELETE, SENT), (DELETE, SENT)]
+
+
+def test_unmergeable_change_keeps_order():
+    client = FakeClient()
+    with WriteQueue(client, window=60) as queue:
+        queue.delete_jobs(['A'])
+        queue.insert_jobs([{'id': 'A', 'resource': '02'}])
+        queue.flush()
+    assert client.calls == [('delete_jobs', ['A']), ('insert_jobs', [{'id': 'A', 'resource': '02'}])]
+
+
+def test_chunks_keep_the_order_of_changes():
+    client = FakeClient()
+    ids = [f'J{n}' for n in range(5)]
+    with WriteQueue(client, window=60, max_batch=2, max_workers=1) as queue:
+        futures = queue.update_jobs([{'id': i} for i in ids])
+        queue.flush()
+    assert [len(items) for _, items in client.calls] == [2, 2, 1]
+    assert [item['id'] for _, items in client.calls for item in items] == ids
+    assert all(r.status == SENT for r in results(futures))
+
+
+def test_failed_chunk_is_reported():
+    client = FakeClient(fail={'update_jobs'})
+    with WriteQueue(client, window=60) as queue:
+        failed = queue.update_jobs([{'id': 'A'}])
+        sent = queue.insert_jobs([{'id': 'B'}])
+        queue.flush()
+    (result,) = results(failed)
+    assert result.status == FAILED and str(result.error) == 'update_jobs failed'
+    assert results(sent)[0].status == SENT
+    assert results(sent)[0].kind == JOB
+
+
+def test_close_sends_the_rest():
+    client = FakeClient()
+    queue = WriteQueue(client, window=60)
+    future = queue.delete_programs([{'group': 'G', 'number': '1'}])[0]
+    queue.close()
+    assert future.result(5).status == SENT
+    assert client.calls == [('delete_programs', [{'group': 'G', 'number': '1'}])]